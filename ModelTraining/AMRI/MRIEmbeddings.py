@@ -0,0 +1,250 @@
+"""
+Frozen-backbone embedding cache and head-only training for AMRI.
+
+The ImageNet ResNet50V2 backbone is run once over the Combined Dataset and
+its globally pooled 2048-d embeddings are stored in a memory-mapped
+embeddings.npy, with index.json mapping each image's SHA-256 to its row.
+Images already in the cache (including duplicates and files that moved
+between splits) are never run through the backbone again, so after the
+first pass only new images cost a forward pass.
+
+train_head fits only the dense AMRI head (add_head, shared with TrainMRI.py)
+on the cached features, which takes seconds on CPU. The head is then
+stacked on the backbone to give a complete model with the same
+128x128x3 [0, 1] input ModelAPI serves, and an optional fine-tune stage
+unfreezes the backbone and trains end to end on the MRIShards pipeline.
+
+    python MRIEmbeddings.py                      # head only
+    python MRIEmbeddings.py --finetune-epochs 5  # head, then full fine-tune
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import regularizers
+from tensorflow.keras.applications import ResNet50V2
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.layers import Dense, Dropout, Rescaling
+
+from MRIShards import INPUT_SCALE, ShardReader, build_shards, list_images, make_dataset
+
+# Anything that changes the embeddings must change this key
+BACKBONE_KEY = 'ResNet50V2/imagenet/avg/rescaled'
+EMBEDDING_DIM = 2048
+NUM_CLASSES = 4
+EMBEDDINGS_NAME = 'embeddings.npy'
+INDEX_NAME = 'index.json'
+
+
+def add_head(model):
+    """Append the AMRI classification head to a Sequential model"""
+    for _ in range(4):
+        model.add(Dense(32, activation='selu', kernel_regularizer=regularizers.l2(0.0005)))
+        model.add(Dropout(0.2))
+    model.add(Dense(NUM_CLASSES, activation='softmax'))
+    return model
+
+
+def build_backbone(image_size):
+    """
+    ResNet50V2 feature extractor with global average pooling
+
+    Takes the [0, 1] images MRIShards yields and ModelAPI serves; the
+    ImageNet weights expect resnet_v2 preprocess_input's [-1, 1] range, so
+    the rescaling is part of the backbone (and of the saved model).
+    """
+    return keras.Sequential([
+        keras.Input(shape=(*image_size, 3)),
+        Rescaling(2.0, offset=-1.0),
+        ResNet50V2(include_top=False, weights='imagenet', input_shape=(*image_size, 3), pooling='avg'),
+    ], name='backbone')
+
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of backbone embeddings
+
+    embeddings.npy is opened memory-mapped; index.json holds the row of
+    every image hash plus the backbone key and image size the rows were
+    computed with. A mismatch on either discards the cache.
+    """
+
+    def __init__(self, cache_dir, image_size):
+        self.cache_dir = cache_dir
+        self.image_size = list(image_size)
+        self.rows = {}
+        self.embeddings = None
+        index_path = os.path.join(cache_dir, INDEX_NAME)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if index['backbone'] == BACKBONE_KEY and index['image_size'] == self.image_size:
+                self.rows = index['rows']
+                self.embeddings = np.load(os.path.join(cache_dir, EMBEDDINGS_NAME), mmap_mode='r')
+
+    def missing(self, hashes):
+        """Distinct hashes that have no cached row yet"""
+        return list(dict.fromkeys(h for h in hashes if h not in self.rows))
+
+    def add(self, new_hashes, new_embeddings):
+        """
+        Append embeddings for new hashes
+
+        The array is rewritten under a temporary name and the index last,
+        so an interrupted update leaves the previous cache intact.
+        """
+        if not new_hashes:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        old_count = 0 if self.embeddings is None else len(self.embeddings)
+        path = os.path.join(self.cache_dir, EMBEDDINGS_NAME)
+        merged = np.lib.format.open_memmap(
+            path + '.tmp', mode='w+', dtype=np.float32, shape=(old_count + len(new_hashes), EMBEDDING_DIM)
+        )
+        if old_count:
+            merged[:old_count] = self.embeddings
+        merged[old_count:] = new_embeddings
+        merged.flush()
+        del merged
+        self.embeddings = None
+        os.replace(path + '.tmp', path)
+        self.rows.update({h: old_count + i for i, h in enumerate(new_hashes)})
+        index_path = os.path.join(self.cache_dir, INDEX_NAME)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump({'backbone': BACKBONE_KEY, 'image_size': self.image_size, 'rows': self.rows}, f)
+        os.replace(index_path + '.tmp', index_path)
+        self.embeddings = np.load(path, mmap_mode='r')
+
+    def lookup(self, hashes):
+        """(len(hashes), EMBEDDING_DIM) float32 array in the order given"""
+        return np.asarray(self.embeddings[[self.rows[h] for h in hashes]])
+
+
+def embed_split(source_dir, shard_dir, cache, backbone=None, batch_size=64):
+    """
+    Embeddings and labels for every image of a split
+
+    Images are read already decoded from the split's shard cache (built if
+    needed); only those whose hash is not cached go through the backbone.
+
+    Args:
+        source_dir: Split directory with one sub-directory per class
+        shard_dir: MRIShards cache directory for the split
+        cache: EmbeddingCache shared by all splits
+        backbone: Feature extractor, built on first use when None
+        batch_size: Images per backbone forward pass
+
+    Returns:
+        (features, labels, class_names, backbone)
+    """
+    manifest = build_shards(source_dir, shard_dir)
+    _, files = list_images(source_dir)
+    hashes = [hash_file(path) for path, _ in files]
+    missing = set(cache.missing(hashes))
+    if missing:
+        backbone = backbone or build_backbone(manifest['image_size'])
+        extract = tf.function(lambda images: backbone(tf.cast(images, tf.float32) * INPUT_SCALE, training=False))
+        reader = ShardReader(shard_dir, manifest)
+        new_hashes, new_embeddings, offset = [], [], 0
+        started = time.perf_counter()
+        for shard, entry in enumerate(manifest['shards']):
+            images, _ = reader.read(shard, 0, entry['count'])
+            # First occurrence of each uncached hash in this shard
+            todo = []
+            for i in range(entry['count']):
+                h = hashes[offset + i]
+                if h in missing:
+                    missing.discard(h)
+                    todo.append(i)
+                    new_hashes.append(h)
+            for start in range(0, len(todo), batch_size):
+                new_embeddings.append(extract(images[todo[start:start + batch_size]]).numpy())
+            offset += entry['count']
+        cache.add(new_hashes, np.concatenate(new_embeddings))
+        elapsed = time.perf_counter() - started
+        print(f"Embedded {len(new_hashes)} images from {source_dir} in {elapsed:.1f}s")
+    labels = np.array([label for _, label in files], dtype=np.int32)
+    return cache.lookup(hashes), labels, manifest['class_names'], backbone
+
+
+def train_head(train_features, train_labels, val_features, val_labels, epochs=200, batch_size=32,
+               learning_rate=0.001, seed=42):
+    """
+    Fit the dense head on cached embeddings
+
+    The backbone is out of the loop, so an epoch is a pass over a
+    (N, 2048) array. The head uses Adam rather than the fine-tuning SGD
+    rate, which would need hundreds of epochs from a random start.
+
+    Returns:
+        (head, history)
+    """
+    keras.utils.set_random_seed(seed)
+    head = add_head(keras.Sequential([keras.Input(shape=(EMBEDDING_DIM,))]))
+    head.compile(optimizer=keras.optimizers.Adam(learning_rate), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    ES = EarlyStopping(monitor='val_loss', min_delta=0.001, patience=10, verbose=1, restore_best_weights=True)
+    history = head.fit(
+        train_features, train_labels, batch_size=batch_size, epochs=epochs,
+        validation_data=(val_features, val_labels), callbacks=[ES], verbose=2
+    )
+    return head, history
+
+
+def assemble_model(backbone, head):
+    """Backbone + trained head as one model taking [0, 1] 128x128x3 images"""
+    return keras.Sequential([keras.Input(shape=backbone.input_shape[1:]), backbone, head])
+
+
+def finetune(model, train, test, epochs, learning_rate=0.00015):
+    """Unfreeze the backbone and train end to end, as TrainMRI.py does"""
+    model.layers[0].trainable = True
+    model.compile(
+        optimizer=tf.keras.optimizers.SGD(learning_rate=learning_rate),
+        loss='sparse_categorical_crossentropy', metrics=['accuracy']
+    )
+    ES = EarlyStopping(monitor='val_loss', min_delta=0.01, patience=10, verbose=1, restore_best_weights=True)
+    return model.fit(train, epochs=epochs, validation_data=test, callbacks=[ES])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the AMRI head on cached ResNet50V2 embeddings')
+    parser.add_argument('--data-dir', default='./data/Combined Dataset')
+    parser.add_argument('--shard-dir', default='./data/shards')
+    parser.add_argument('--cache-dir', default='./data/embeddings')
+    parser.add_argument('--epochs', type=int, default=200, help='Head epochs (early stopping on val_loss)')
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--finetune-epochs', type=int, default=0, help='Full fine-tune epochs after the head; 0 skips it')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='./weights/AMRIGENETV1.keras')
+    args = parser.parse_args()
+
+    train_dir, test_dir = os.path.join(args.data_dir, 'train'), os.path.join(args.data_dir, 'test')
+    train_shards, test_shards = os.path.join(args.shard_dir, 'train'), os.path.join(args.shard_dir, 'test')
+    cache = EmbeddingCache(args.cache_dir, build_shards(train_dir, train_shards)['image_size'])
+    x_train, y_train, class_names, backbone = embed_split(train_dir, train_shards, cache)
+    x_test, y_test, _, backbone = embed_split(test_dir, test_shards, cache, backbone)
+    print(f"Classes: {class_names}; {len(x_train)} train / {len(x_test)} test embeddings")
+
+    started = time.perf_counter()
+    head, _ = train_head(x_train, y_train, x_test, y_test, epochs=args.epochs,
+                         learning_rate=args.learning_rate, seed=args.seed)
+    print(f"Head trained in {time.perf_counter() - started:.1f}s")
+
+    model = assemble_model(backbone or build_backbone(cache.image_size), head)
+    if args.finetune_epochs:
+        train, _ = make_dataset(train_shards, training=True, seed=args.seed)
+        test, _ = make_dataset(test_shards, training=False)
+        finetune(model, train, test, args.finetune_epochs)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    model.save(args.output)
+    print(f"Saved {args.output}")
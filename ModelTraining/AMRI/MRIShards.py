@@ -0,0 +1,259 @@
+"""
+Decoded-image shard cache and tf.data input pipeline for AMRI training.
+
+image_dataset_from_directory decodes every JPEG of the Combined Dataset again
+on every epoch. build_shards decodes a split once into fixed-size shards of
+uint8 images stored as .npy files (images-00000.npy, labels-00000.npy, ...)
+next to a manifest.json. make_dataset then memory-maps the shards and reads
+them with a parallel, deterministic interleave over shards, a parallel
+vectorized map per batch and autotuned prefetching, so an epoch costs page
+cache reads instead of JPEG decodes.
+
+Images are resized like ModelAPI.preprocess_image and scaled to [0, 1] like
+the serving path (MRI_INPUT_SCALE), so training sees the inputs the API will
+send. Class indices follow the sorted class directory names, the same order
+image_dataset_from_directory used.
+
+Build the cache ahead of time (TrainMRI.py also builds it on first use):
+
+    python MRIShards.py "./data/Combined Dataset/train" ./data/shards/train
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+IMAGE_SIZE = (128, 128)
+SHARD_SIZE = 2048
+# Records are read from a shard in chunks of this many images
+READ_CHUNK_SIZE = 256
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+MANIFEST_NAME = 'manifest.json'
+INPUT_SCALE = 1.0 / 255.0
+
+
+def list_images(source_dir):
+    """
+    Image files of a class-per-directory split
+
+    Returns:
+        (class_names, [(path, label), ...]) in a stable order
+    """
+    class_names = sorted(
+        name for name in os.listdir(source_dir)
+        if os.path.isdir(os.path.join(source_dir, name))
+    )
+    files = []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(source_dir, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                files.append((os.path.join(class_dir, filename), label))
+    return class_names, files
+
+
+def source_fingerprint(files):
+    """Hash of every file's path, size and mtime; a changed split invalidates the cache"""
+    digest = hashlib.sha256()
+    for path, label in files:
+        stat = os.stat(path)
+        digest.update(f"{path}\0{label}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def decode_image(path, image_size=IMAGE_SIZE):
+    """Decode one image to a (height, width, 3) uint8 array, as ModelAPI.preprocess_image does"""
+    with Image.open(path) as image:
+        if image.format == 'JPEG':
+            image.draft('RGB', image_size)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != image_size:
+            image = image.resize(image_size)
+        return np.asarray(image, dtype=np.uint8)
+
+
+def read_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_shards(source_dir, cache_dir, shard_size=SHARD_SIZE, image_size=IMAGE_SIZE, workers=None, force=False):
+    """
+    Decode a split once into memory-mappable shards
+
+    The cache is reused as long as the source files, shard size and image
+    size are unchanged. Shards are written under temporary names and the
+    manifest last, so an interrupted build is never mistaken for a cache.
+
+    Args:
+        source_dir: Split directory with one sub-directory per class
+        cache_dir: Output directory for the shards and manifest
+        shard_size: Images per shard file
+        image_size: (height, width) the images are resized to
+        workers: Decoding threads (PIL releases the GIL while decoding)
+        force: Rebuild even if a matching cache exists
+
+    Returns:
+        The manifest dict
+    """
+    class_names, files = list_images(source_dir)
+    if not files:
+        raise ValueError(f"No images found under {source_dir}")
+    fingerprint = source_fingerprint(files)
+    manifest = read_manifest(cache_dir)
+    if (not force and manifest is not None and manifest['source_fingerprint'] == fingerprint
+            and manifest['shard_size'] == shard_size and tuple(manifest['image_size']) == tuple(image_size)):
+        return manifest
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    shards = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, start in enumerate(range(0, len(files), shard_size)):
+            chunk = files[start:start + shard_size]
+            images_name, labels_name = f"images-{index:05d}.npy", f"labels-{index:05d}.npy"
+            images_tmp = os.path.join(cache_dir, images_name + '.tmp')
+            images = np.lib.format.open_memmap(
+                images_tmp, mode='w+', dtype=np.uint8, shape=(len(chunk), *image_size, 3)
+            )
+            for i, pixels in enumerate(executor.map(lambda item: decode_image(item[0], image_size), chunk)):
+                images[i] = pixels
+            images.flush()
+            del images
+            os.replace(images_tmp, os.path.join(cache_dir, images_name))
+            np.save(os.path.join(cache_dir, labels_name), np.array([label for _, label in chunk], dtype=np.int32))
+            shards.append({'images': images_name, 'labels': labels_name, 'count': len(chunk)})
+            print(f"Decoded shard {index + 1}/{-(-len(files) // shard_size)} ({start + len(chunk)}/{len(files)} images)")
+
+    manifest = {
+        'class_names': class_names,
+        'image_size': list(image_size),
+        'shard_size': shard_size,
+        'num_examples': len(files),
+        'source_fingerprint': fingerprint,
+        'shards': shards,
+    }
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+class ShardReader:
+    """Memory-maps shards lazily and serves contiguous record chunks from them"""
+
+    def __init__(self, cache_dir, manifest):
+        self.cache_dir = cache_dir
+        self.shards = manifest['shards']
+        self._images = {}
+        self._labels = {}
+
+    def _open(self, shard):
+        if shard not in self._images:
+            entry = self.shards[shard]
+            self._images[shard] = np.load(os.path.join(self.cache_dir, entry['images']), mmap_mode='r')
+            self._labels[shard] = np.load(os.path.join(self.cache_dir, entry['labels']))
+        return self._images[shard], self._labels[shard]
+
+    def read(self, shard, start, count):
+        images, labels = self._open(int(shard))
+        return np.ascontiguousarray(images[start:start + count]), labels[start:start + count]
+
+
+def chunk_table(manifest, chunk_size=READ_CHUNK_SIZE):
+    """(shard, start, count) rows covering every record once"""
+    rows = [
+        (shard, start, min(chunk_size, entry['count'] - start))
+        for shard, entry in enumerate(manifest['shards'])
+        for start in range(0, entry['count'], chunk_size)
+    ]
+    return np.array(rows, dtype=np.int64)
+
+
+def scale_batch(images, labels):
+    """uint8 batch -> float32 in [0, 1], the same scaling ModelAPI applies before the model"""
+    return tf.cast(images, tf.float32) * INPUT_SCALE, labels
+
+
+def make_dataset(cache_dir, batch_size=32, training=True, seed=42, shuffle_buffer=4096,
+                 chunk_size=READ_CHUNK_SIZE, cycle_length=4):
+    """
+    tf.data pipeline over a shard cache built by build_shards
+
+    Training order is shuffled at two levels: the order of record chunks
+    (reshuffled every epoch) and a record-level shuffle buffer. Both are
+    seeded and the pipeline keeps deterministic ordering, so a given seed
+    gives the same sequence of batches on every run.
+
+    Args:
+        cache_dir: Directory holding manifest.json and the shards
+        batch_size: Examples per batch
+        training: Shuffle and repeat-friendly ordering when True, file order otherwise
+        seed: Seed for both shuffles
+        shuffle_buffer: Record-level shuffle buffer size
+        chunk_size: Records read from a shard per interleave element
+        cycle_length: Chunks read concurrently by the interleave
+
+    Returns:
+        (dataset, manifest) where dataset yields (float32 images, int32 labels)
+    """
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No shard cache in {cache_dir}; run build_shards first")
+    reader = ShardReader(cache_dir, manifest)
+    height, width = manifest['image_size']
+    autotune = tf.data.AUTOTUNE
+
+    def load_chunk(row):
+        images, labels = tf.numpy_function(reader.read, [row[0], row[1], row[2]], [tf.uint8, tf.int32])
+        images.set_shape([None, height, width, 3])
+        labels.set_shape([None])
+        return tf.data.Dataset.from_tensor_slices((images, labels))
+
+    chunks = tf.data.Dataset.from_tensor_slices(chunk_table(manifest, chunk_size))
+    if training:
+        chunks = chunks.shuffle(len(chunks), seed=seed, reshuffle_each_iteration=True)
+    dataset = chunks.interleave(
+        load_chunk, cycle_length=cycle_length, block_length=1,
+        num_parallel_calls=autotune, deterministic=True
+    )
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = (
+        dataset.batch(batch_size)
+        .map(scale_batch, num_parallel_calls=autotune, deterministic=True)
+        .prefetch(autotune)
+    )
+    options = tf.data.Options()
+    options.deterministic = True
+    options.experimental_optimization.map_parallelization = True
+    return dataset.with_options(options), manifest
+
+
+def load_split(source_dir, cache_dir, batch_size=32, training=True, seed=42):
+    """build_shards (a no-op when the cache is current) followed by make_dataset"""
+    build_shards(source_dir, cache_dir)
+    return make_dataset(cache_dir, batch_size=batch_size, training=training, seed=seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Decode an AMRI image split into a shard cache')
+    parser.add_argument('source_dir', help="Split directory, e.g. './data/Combined Dataset/train'")
+    parser.add_argument('cache_dir', help='Output directory for shards and manifest.json')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the cache is current')
+    args = parser.parse_args()
+    result = build_shards(args.source_dir, args.cache_dir, shard_size=args.shard_size, force=args.force)
+    print(f"{result['num_examples']} images in {len(result['shards'])} shards: {', '.join(result['class_names'])}")
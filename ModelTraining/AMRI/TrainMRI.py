@@ -3,16 +3,9 @@
 @author: elamr
 """
 import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import models
-from tensorflow.keras.layers import Dense, Dropout, Flatten
 from tensorflow.keras.callbacks import EarlyStopping
-from tensorflow.keras.applications import ResNet50V2
-from tensorflow.keras import regularizers
-import matplotlib.pyplot as plt
-import numpy as np
-import os
-import pandas as pd
+from MRIShards import load_split
+from MRIEmbeddings import EMBEDDING_DIM, add_head, assemble_model, build_backbone
 #kaggle
 #import kaggle
 #from kaggle.api.kaggle_api_extended import KaggleApi
@@ -21,54 +14,28 @@ import pandas as pd
 #path = api.dataset_download_files("lukechugh/best-alzheimer-mri-dataset-99-accuracy", path='./ModelTraining/AMRI/data/', unzip=True)
 print("Done downloading dataset")
 
-train_data = keras.utils.image_dataset_from_directory(
-    directory='./data/Combined Dataset/train',
-    labels='inferred',
-    label_mode='int',
-    batch_size=32,
-    image_size=(128, 128),
-    color_mode='rgb',
-    shuffle=True,
-    verbose=True
+# Each split is decoded once into a shard cache (rebuilt only when the images
+# change) and streamed through a parallel, prefetching tf.data pipeline.
+# Images arrive scaled to [0, 1], the same inputs ModelAPI feeds the model.
+train, train_manifest = load_split(
+    './data/Combined Dataset/train', './data/shards/train',
+    batch_size=32, training=True, seed=42
 )
-
-test_data = keras.utils.image_dataset_from_directory(
-    directory='./data/Combined Dataset/test',
-    labels='inferred',
-    label_mode='int',
-    batch_size=32,
-    image_size=(128, 128),
-    color_mode='rgb',
-    shuffle=True,
-    verbose=True
-)
-
-def process(image, label):
-    image = preprocess_input(image)
-    return image, label
-train = train_data.map(process)
-test = test_data.map(process)
-
-EXTmodel = ResNet50V2(
-    include_top=False,
-    weights="imagenet",
-    input_shape=(128, 128, 3),
-    classes=4 
+test, test_manifest = load_split(
+    './data/Combined Dataset/test', './data/shards/test',
+    batch_size=32, training=False
 )
+print(f"Classes: {train_manifest['class_names']}")
+
+# The same architecture MRIEmbeddings.py produces: ResNet50V2 with in-graph
+# Rescaling to the [-1, 1] range its ImageNet weights expect, global average
+# pooling, and the AMRI head on the 2048 pooled features. Either script's
+# ./weights/AMRIGENETV1.keras therefore takes [0, 1] images and can be served
+# (or a head trained on cached features fine-tuned) interchangeably.
+EXTmodel = build_backbone(tuple(train_manifest['image_size']))
 EXTmodel.trainable = True
-
-model = tf.keras.Sequential()
-model.add(EXTmodel)
-model.add(Flatten())
-model.add(Dense(32, activation='selu',  kernel_regularizer=regularizers.l2(0.0005)))
-model.add(Dropout(0.2))
-model.add(Dense(32, activation='selu',  kernel_regularizer=regularizers.l2(0.0005)))
-model.add(Dropout(0.2))
-model.add(Dense(32, activation='selu',  kernel_regularizer=regularizers.l2(0.0005)))
-model.add(Dropout(0.2))
-model.add(Dense(32, activation='selu',  kernel_regularizer=regularizers.l2(0.0005)))
-model.add(Dropout(0.2))
-model.add(Dense(4, activation='softmax',))
+head = add_head(tf.keras.Sequential([tf.keras.Input(shape=(EMBEDDING_DIM,))]))
+model = assemble_model(EXTmodel, head)
 
 ES = EarlyStopping(
     monitor="val_loss",
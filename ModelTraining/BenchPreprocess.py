@@ -0,0 +1,93 @@
+"""
+Microbenchmark of /amri image preprocessing, before and after the fast path.
+
+"before" reproduces the original pipeline: read the upload into bytes,
+decode at full resolution, convert and resize, build a float32 array, divide
+into another copy, then compute min/max/mean/std once for the debug prints
+and again for debug_info (console I/O itself is not timed). "after" is
+ModelAPI.preprocess_image (draft-mode JPEG decoding, uint8 output) followed by
+the single-pass ModelAPI.image_statistics.
+
+Reports per-image CPU time (time.process_time) for each image. Run from the
+ModelTraining directory:
+
+    python BenchPreprocess.py
+    python BenchPreprocess.py --images "AMRI/data/Combined Dataset/test/*/*.jpg" --repeats 20
+"""
+import argparse
+import glob
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from ModelAPI import image_statistics, preprocess_image
+
+
+def legacy_preprocess(image_file):
+    """The original preprocess_image plus the /amri debug_info statistics"""
+    image = Image.open(io.BytesIO(image_file.read()))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize((128, 128))
+    image_array = np.array(image, dtype=np.float32)
+    image_array = image_array / 255.0
+    image_array = np.expand_dims(image_array, axis=0)
+    # Statistics printed in preprocess_image ...
+    np.min(image_array), np.max(image_array), np.mean(image_array), np.std(image_array)
+    # ... and recomputed for debug_info in /amri
+    stats = {
+        'mean': float(np.mean(image_array)),
+        'std': float(np.std(image_array)),
+        'min': float(np.min(image_array)),
+        'max': float(np.max(image_array))
+    }
+    return image_array, stats
+
+
+def fast_preprocess(image_file):
+    image_array = preprocess_image(image_file)
+    return image_array, image_statistics(image_array)
+
+
+def cpu_time_per_image(pipeline, payload, repeats):
+    start = time.process_time()
+    for _ in range(repeats):
+        pipeline(io.BytesIO(payload))
+    return (time.process_time() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /amri image preprocessing")
+    parser.add_argument("--images", default="AMRI/DemoIMG/*.jpg", help="Glob of images to benchmark")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.images))
+    if not paths:
+        raise SystemExit(f"No images match {args.images}")
+
+    print(f"{'image':<40}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    before_total = after_total = 0.0
+    for path in paths:
+        with open(path, "rb") as image_file:
+            payload = image_file.read()
+
+        # Same statistics either way, up to float32 rounding
+        _, legacy_stats = legacy_preprocess(io.BytesIO(payload))
+        _, fast_stats = fast_preprocess(io.BytesIO(payload))
+        assert abs(legacy_stats['mean'] - fast_stats['mean']) < 1e-3, (legacy_stats, fast_stats)
+
+        before = cpu_time_per_image(legacy_preprocess, payload, args.repeats)
+        after = cpu_time_per_image(fast_preprocess, payload, args.repeats)
+        before_total += before
+        after_total += after
+        print(f"{path[-40:]:<40}{before * 1e6:>12.1f}{after * 1e6:>12.1f}{before / after:>9.2f}x")
+
+    print(f"{'mean':<40}{before_total / len(paths) * 1e6:>12.1f}{after_total / len(paths) * 1e6:>12.1f}"
+          f"{before_total / after_total:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Export the AMRI and BIOFM models as CPU-optimized TFLite artifacts.
+
+For each model this writes one .tflite file per variant next to its .keras
+weights (see TFLiteRuntime.tflite_artifact_path):
+
+    float32  plain conversion, no quantization
+    float16  float16 weights
+    dynamic  dynamic-range quantization (int8 weights, float activations)
+    int8     full integer quantization, calibrated on representative data
+
+Calibration uses AMRI/DemoIMG plus a sample of the AMRI training images, and
+the rows of BIOFM/data/clean_oasis.csv. Every variant is then compared with
+the Keras model: top-1 agreement, mean absolute output difference, batch-1
+latency, batched throughput and resident memory. The report is printed and
+saved as <model>_tflite_report.json next to the weights.
+
+Run from the ModelTraining directory after training:
+
+    python ExportTFLite.py
+    python ExportTFLite.py --models amri --variants dynamic int8
+
+Serve an exported variant with MODEL_RUNTIME=tflite TFLITE_VARIANT=<variant>.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ModelAPI import (
+    BIO_INPUT_SIGNATURE, BIO_MODEL_PATH, MRI_INPUT_SCALE, MRI_INPUT_SIGNATURE, MRI_MODEL_PATH,
+    make_inference_fn, preprocess_image
+)
+from TFLiteRuntime import TFLITE_VARIANTS, TFLiteModel, tflite_artifact_path
+
+AMRI_DEMO_DIR = "./AMRI/DemoIMG"
+AMRI_TRAIN_DIR = "./AMRI/data/Combined Dataset/train"
+AMRI_TEST_DIR = "./AMRI/data/Combined Dataset/test"
+BIO_CLEAN_CSV = "./BIOFM/data/clean_oasis.csv"
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def sample_images(directory, per_class):
+    """Deterministically pick up to per_class images from each class folder"""
+    paths = []
+    for class_dir in sorted(glob.glob(os.path.join(directory, "*"))):
+        images = sorted(glob.glob(os.path.join(class_dir, "*.jpg")))
+        if images:
+            step = max(1, len(images) // per_class)
+            paths.extend(images[::step][:per_class])
+    return paths
+
+
+def load_images(paths):
+    """Preprocess images exactly as ModelAPI does for /amri (uint8 batch)"""
+    batch = []
+    for path in paths:
+        with open(path, "rb") as image_file:
+            batch.append(preprocess_image(image_file)[0])
+    return np.stack(batch)
+
+
+def load_bio_rows():
+    """Feature rows from clean_oasis.csv (CDR label column dropped)"""
+    df = pd.read_csv(BIO_CLEAN_CSV, header=None)
+    return df.drop(columns=5).to_numpy(dtype=np.float32)
+
+
+def amri_data(calibration_samples, eval_samples):
+    demo = sorted(glob.glob(os.path.join(AMRI_DEMO_DIR, "*.jpg")))
+    calibration = demo + sample_images(AMRI_TRAIN_DIR, max(1, calibration_samples // 4))
+    evaluation = sample_images(AMRI_TEST_DIR, max(1, eval_samples // 4))
+    return load_images(calibration), load_images(evaluation)
+
+
+def bio_data(calibration_samples, eval_samples):
+    rows = load_bio_rows()
+    # clean_oasis.csv is small, so it serves as both calibration and evaluation data
+    return rows[:calibration_samples], rows[:eval_samples]
+
+
+# name: (keras path, API input signature, input scale, data loader)
+MODELS = {
+    "amri": (MRI_MODEL_PATH, MRI_INPUT_SIGNATURE, MRI_INPUT_SCALE, amri_data),
+    "biofm": (BIO_MODEL_PATH, BIO_INPUT_SIGNATURE, None, bio_data),
+}
+
+
+def scaled(batch, input_scale):
+    """Convert API inputs to the float32 tensors the Keras/TFLite graphs take"""
+    if input_scale is None:
+        return batch
+    return np.multiply(batch, input_scale, dtype=np.float32)
+
+
+def convert(model, variant, calibration):
+    """Convert a Keras model to a TFLite flatbuffer for one variant"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == "int8":
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    return converter.convert()
+
+
+def measure(infer, evaluation, latency_runs, throughput_batch):
+    """Latency (batch 1) and throughput (batched) of an inference callable"""
+    single = evaluation[:1]
+    infer(single)
+    timings = []
+    for _ in range(latency_runs):
+        start = time.perf_counter()
+        infer(single)
+        timings.append((time.perf_counter() - start) * 1000.0)
+
+    batch = evaluation[:throughput_batch]
+    infer(batch)
+    start = time.perf_counter()
+    runs = max(1, latency_runs // 10)
+    for _ in range(runs):
+        infer(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "latency_ms_p50": float(np.percentile(timings, 50)),
+        "latency_ms_p95": float(np.percentile(timings, 95)),
+        "throughput_samples_per_s": len(batch) * runs / elapsed,
+    }
+
+
+def predict_all(infer, evaluation, batch_size=64):
+    return np.concatenate([infer(evaluation[i:i + batch_size]) for i in range(0, len(evaluation), batch_size)])
+
+
+def export_model(name, variants, args):
+    keras_path, input_signature, input_scale, load_data = MODELS[name]
+    if not os.path.exists(keras_path):
+        raise FileNotFoundError(f"Model file not found: {keras_path}. Train the model first.")
+
+    print(f"=== {name}: loading calibration and evaluation data ===")
+    calibration, evaluation = load_data(args.calibration_samples, args.eval_samples)
+    print(f"{len(calibration)} calibration samples, {len(evaluation)} evaluation samples")
+
+    rss_before = current_rss_bytes()
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    keras_infer = make_inference_fn(model, input_signature, input_scale)
+    reference = predict_all(keras_infer, evaluation)
+    rss_after = current_rss_bytes()
+    reference_top1 = np.argmax(reference, axis=1)
+
+    report = {
+        "model": name,
+        "keras_path": keras_path,
+        "calibration_samples": len(calibration),
+        "evaluation_samples": len(evaluation),
+        "variants": {
+            "keras": {
+                "path": keras_path,
+                "size_bytes": os.path.getsize(keras_path),
+                "rss_delta_bytes": rss_after - rss_before if rss_before is not None else None,
+                "top1_agreement": 1.0,
+                "mean_abs_diff": 0.0,
+                **measure(keras_infer, evaluation, args.latency_runs, args.throughput_batch),
+            }
+        },
+    }
+
+    for variant in variants:
+        print(f"=== {name}: converting {variant} ===")
+        artifact_path = tflite_artifact_path(keras_path, variant)
+        with open(artifact_path, "wb") as artifact:
+            artifact.write(convert(model, variant, scaled(calibration, input_scale)))
+
+        rss_before = current_rss_bytes()
+        tflite_model = TFLiteModel(artifact_path, num_threads=args.num_threads)
+        tflite_infer = lambda batch: tflite_model(scaled(batch, input_scale))
+        outputs = predict_all(tflite_infer, evaluation)
+        rss_after = current_rss_bytes()
+
+        report["variants"][variant] = {
+            "path": artifact_path,
+            "size_bytes": os.path.getsize(artifact_path),
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None else None,
+            "top1_agreement": float(np.mean(np.argmax(outputs, axis=1) == reference_top1)),
+            "mean_abs_diff": float(np.mean(np.abs(outputs - reference))),
+            **measure(tflite_infer, evaluation, args.latency_runs, args.throughput_batch),
+        }
+
+    report_path = os.path.splitext(keras_path)[0] + "_tflite_report.json"
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print_report(report)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['model']}: parity against Keras on {report['evaluation_samples']} samples")
+    print(f"{'variant':<10}{'size MB':>10}{'RSS +MB':>10}{'top-1':>9}{'|diff|':>10}{'p50 ms':>9}{'p95 ms':>9}{'samples/s':>12}")
+    for variant, row in report["variants"].items():
+        rss = f"{row['rss_delta_bytes'] / 2**20:.1f}" if row["rss_delta_bytes"] is not None else "n/a"
+        print(f"{variant:<10}{row['size_bytes'] / 2**20:>10.2f}{rss:>10}{row['top1_agreement']:>9.3f}"
+              f"{row['mean_abs_diff']:>10.4f}{row['latency_ms_p50']:>9.2f}{row['latency_ms_p95']:>9.2f}"
+              f"{row['throughput_samples_per_s']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export AMRI/BIOFM models to TFLite and report parity")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument("--variants", nargs="+", choices=TFLITE_VARIANTS, default=TFLITE_VARIANTS)
+    parser.add_argument("--calibration-samples", type=int, default=200)
+    parser.add_argument("--eval-samples", type=int, default=400)
+    parser.add_argument("--latency-runs", type=int, default=100)
+    parser.add_argument("--throughput-batch", type=int, default=32)
+    parser.add_argument("--num-threads", type=int, default=None)
+    args = parser.parse_args()
+
+    for name in args.models:
+        export_model(name, args.variants, args)
+
+
+if __name__ == "__main__":
+    main()
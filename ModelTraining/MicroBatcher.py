@@ -0,0 +1,114 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent requests submit single inputs; a background thread collects them
+until either max_batch_size items are waiting or max_wait_ms has passed since
+the first one arrived, stacks them into one array, runs a single forward pass
+and hands each caller its own row of the output.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Batches single-sample inference requests into one forward pass
+
+    Args:
+        predict_fn: Callable taking a stacked (N, ...) array and returning an
+            (N, ...) array of predictions
+        max_batch_size: Largest batch handed to predict_fn
+        max_wait_ms: How long the first queued item may wait for others
+        name: Used for the worker thread name and in stats
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, name="batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._items = 0
+        self._batches = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"{name}-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, sample):
+        """
+        Queue one sample for prediction
+
+        Args:
+            sample: Array for a single input, without the batch dimension
+
+        Returns:
+            Future resolving to that sample's row of the model output
+        """
+        future = Future()
+        self._queue.put((sample, future))
+        return future
+
+    def predict(self, sample, timeout=None):
+        """Submit one sample and block until its prediction is ready"""
+        return self.submit(sample).result(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or timed out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch]
+            try:
+                inputs = np.stack([sample for sample, _ in batch])
+                outputs = self.predict_fn(inputs)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, row in zip(futures, outputs):
+                future.set_result(row)
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._items += len(batch)
+                self._batches += 1
+
+    def stats(self):
+        """Return the achieved batch-size distribution and configuration"""
+        with self._stats_lock:
+            distribution = dict(sorted(self._batch_sizes.items()))
+            items = self._items
+            batches = self._batches
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "total_items": items,
+            "total_batches": batches,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_distribution": {str(size): count for size, count in distribution.items()},
+        }
@@ -1,40 +1,228 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+from werkzeug.formparser import parse_form_data
 import os
+import json
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import Future
 import numpy as np
+import pandas as pd
 import tensorflow as tf
 from tensorflow import keras
 from PIL import Image
 import io
+import tempfile
+import threading
+from MicroBatcher import MicroBatcher
+from TFLiteRuntime import TFLITE_VARIANTS, TFLiteModel, tflite_artifact_path
+from PredictionCache import PredictionCache, content_key
+from Telemetry import BATCH_SIZE_BUCKETS, MetricsRegistry, configure_logging
+from VolumeIngest import (
+    VolumeFormatError, aggregate_slice_predictions, dicom_pixels, read_dicom_series_slices,
+    read_nifti_slices, slices_to_model_batch, volume_extension
+)
 
 app = Flask(__name__)
 CORS(app)
+logger = logging.getLogger("ModelAPI")
+# Structured logging: LOG_LEVEL gates verbosity (per-request detail is DEBUG),
+# LOG_FORMAT is "json" (one object per line) or "text"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
 BIOModel = None
 MRIModel = None
+# Graph-compiled, fixed-signature forward passes built in load_*_model
+BIOInfer = None
+MRIInfer = None
+MRIBatcher = None
+MODELS_READY = False
+# Identify the loaded weights; part of every prediction cache key
+BIO_MODEL_VERSION = None
+MRI_MODEL_VERSION = None
+_mri_batcher_lock = threading.Lock()
+
+BIO_MODEL_PATH = "./BIOFM/weights/BIOFMGENETV1.keras"
+MRI_MODEL_PATH = "./AMRI/weights/AMRIGENETV1.keras"
+
+# Serving runtime: "keras" (compiled TensorFlow graph) or "tflite" (artifacts
+# written by ExportTFLite.py, quantization variant picked by TFLITE_VARIANT)
+MODEL_RUNTIME = os.environ.get("MODEL_RUNTIME", "keras")
+TFLITE_VARIANT = os.environ.get("TFLITE_VARIANT", "dynamic")
+TFLITE_NUM_THREADS = int(os.environ["TFLITE_NUM_THREADS"]) if os.environ.get("TFLITE_NUM_THREADS") else None
+if MODEL_RUNTIME not in ("keras", "tflite"):
+    raise ValueError(f"MODEL_RUNTIME must be 'keras' or 'tflite', got '{MODEL_RUNTIME}'")
+if TFLITE_VARIANT not in TFLITE_VARIANTS:
+    raise ValueError(f"TFLITE_VARIANT must be one of {', '.join(TFLITE_VARIANTS)}, got '{TFLITE_VARIANT}'")
+
+# Prediction caches (see PredictionCache.py): /amri keyed by SHA-256 of the
+# upload, /biofm by the validated feature tuple, both plus the model version
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 1024))
+PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", 3600))
+MRICache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS, name="amri")
+BIOCache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS, name="biofm")
+
+# Micro-batching of concurrent /amri requests (see MicroBatcher.py)
+AMRI_MAX_BATCH_SIZE = int(os.environ.get("AMRI_MAX_BATCH_SIZE", 32))
+AMRI_MAX_WAIT_MS = float(os.environ.get("AMRI_MAX_WAIT_MS", 5))
+# Images decoded ahead of the oldest unfinished prediction in /amri/batch
+AMRI_BATCH_WINDOW = int(os.environ.get("AMRI_BATCH_WINDOW", 2 * AMRI_MAX_BATCH_SIZE))
+
+# Prometheus metrics served at /metrics (see Telemetry.py)
+METRICS = MetricsRegistry()
+STAGE_SECONDS = METRICS.histogram(
+    "model_api_stage_seconds",
+    "Time per request stage: decode, preprocess, forward, decision, serialize",
+    ["endpoint", "stage", "model_version"]
+)
+INFERENCE_SECONDS = METRICS.histogram(
+    "model_api_inference_seconds",
+    "Duration of one model forward pass",
+    ["model", "model_version"]
+)
+INFERENCE_BATCH_SIZE = METRICS.histogram(
+    "model_api_inference_batch_size",
+    "Rows per model forward pass",
+    ["model", "model_version"],
+    buckets=BATCH_SIZE_BUCKETS
+)
+REQUESTS_TOTAL = METRICS.counter(
+    "model_api_requests_total",
+    "Responses by endpoint and HTTP status",
+    ["endpoint", "status"]
+)
+ERRORS_TOTAL = METRICS.counter(
+    "model_api_errors_total",
+    "Failed requests (and failed items of streamed batches) by endpoint and model version",
+    ["endpoint", "model_version", "kind"]
+)
+
+# MRI impairment classification labels
+IMPAIRMENT_LABELS = [
+    "Mild Impairment",
+    "Moderate Impairment",
+    "No Impairment",
+    "Very Mild Impairment"
+]
+ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.dcm'}
+
+# BIO model features, in the column order TrainBIO.py trains on
+BIO_FEATURE_COLUMNS = ['M/F', 'Age', 'EDUC', 'SES', 'MMSE', 'eTIV', 'nWBV', 'ASF']
+# CDR classification labels
+CDR_LABELS = [
+    "CDR 0 (No Dementia)",
+    "CDR 0.5 (Very Mild Dementia)",
+    "CDR 1 (Mild Dementia)",
+    "CDR 2 (Moderate Dementia)"
+]
+# Rows per forward pass when scoring a cohort through /biofm/batch
+BIOFM_PREDICT_BATCH_SIZE = int(os.environ.get("BIOFM_PREDICT_BATCH_SIZE", 4096))
+
+BIO_INPUT_SIGNATURE = tf.TensorSpec(shape=[None, len(BIO_FEATURE_COLUMNS)], dtype=tf.float32)
+# MRI images stay uint8 until they reach the model; the cast and scaling to
+# [0, 1] happen inside the compiled forward pass
+MRI_IMAGE_SIZE = (128, 128)
+MRI_INPUT_SIGNATURE = tf.TensorSpec(shape=[None, *MRI_IMAGE_SIZE, 3], dtype=tf.uint8)
+MRI_INPUT_SCALE = 1.0 / 255.0
+
+# /amri/volume: axial slices sampled from the central band of each study
+VOLUME_MAX_SLICES = int(os.environ.get("VOLUME_MAX_SLICES", 32))
+VOLUME_SLICE_BAND = (
+    float(os.environ.get("VOLUME_SLICE_BAND_LOW", 0.4)),
+    float(os.environ.get("VOLUME_SLICE_BAND_HIGH", 0.6))
+)
+
+def make_inference_fn(model, input_signature, input_scale=None):
+    """
+    Trace a model's forward pass once as a graph with a fixed input signature
+    
+    The batch dimension is left open, so every batch size reuses the same
+    concrete function instead of going through Model.predict per call.
+    Inputs are cast to float32 (and multiplied by input_scale) inside the graph.
+    
+    Returns:
+        Function mapping a batch to a NumPy array of predictions
+    """
+    @tf.function(input_signature=[input_signature])
+    def infer(inputs):
+        inputs = tf.cast(inputs, tf.float32)
+        if input_scale is not None:
+            inputs = inputs * input_scale
+        return model(inputs, training=False)
+    
+    concrete_fn = infer.get_concrete_function()
+    return lambda inputs: concrete_fn(tf.convert_to_tensor(inputs, dtype=input_signature.dtype)).numpy()
+
+def load_inference_model(keras_path, input_signature, input_scale=None):
+    """
+    Load a model for serving with the configured MODEL_RUNTIME
+    
+    Args:
+        keras_path: Path to the trained .keras model
+        input_signature: tf.TensorSpec of the inputs the API passes in
+        input_scale: Optional factor applied after casting inputs to float32
+    
+    Returns:
+        (model, infer, version) where infer maps a batch to a NumPy array
+        and version identifies the loaded artifact
+    """
+    if MODEL_RUNTIME == "tflite":
+        artifact_path = tflite_artifact_path(keras_path, TFLITE_VARIANT)
+        model = TFLiteModel(artifact_path, num_threads=TFLITE_NUM_THREADS)
+        if input_scale is None:
+            return model, model, model_version(artifact_path)
+        return model, lambda inputs: model(np.multiply(inputs, input_scale, dtype=np.float32)), model_version(artifact_path)
+    
+    if not os.path.exists(keras_path):
+        raise FileNotFoundError(f"Model file not found: {keras_path}")
+    # Inference only, so skip restoring the optimizer and compile state
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    return model, make_inference_fn(model, input_signature, input_scale), model_version(keras_path)
+
+def instrument_inference(infer, model_name, version):
+    """Wrap an inference function so every forward pass records its duration and batch size"""
+    def timed_infer(inputs):
+        with INFERENCE_SECONDS.time(model=model_name, model_version=version):
+            outputs = infer(inputs)
+        INFERENCE_BATCH_SIZE.observe(len(inputs), model=model_name, model_version=version)
+        return outputs
+    return timed_infer
+
+def endpoint_model_version(endpoint):
+    """Version of the model an endpoint serves, used as a metrics label"""
+    if endpoint and endpoint.startswith('/amri'):
+        return MRI_MODEL_VERSION or ""
+    if endpoint and endpoint.startswith('/biofm'):
+        return BIO_MODEL_VERSION or ""
+    return ""
+
+def stage_timer(endpoint, stage):
+    """Context manager recording one request stage in model_api_stage_seconds"""
+    return STAGE_SECONDS.time(endpoint=endpoint, stage=stage, model_version=endpoint_model_version(endpoint))
+
+def model_version(artifact_path):
+    """Version string for a model file: name, size and modification time"""
+    stat = os.stat(artifact_path)
+    return f"{os.path.basename(artifact_path)}:{stat.st_size}:{stat.st_mtime_ns}"
 
 def load_bio_model():
     """Load the BIO model for CDR prediction"""
-    global BIOModel
+    global BIOModel, BIOInfer, BIO_MODEL_VERSION
     if BIOModel is None:
         try:
-            model_path = "./BIOFM/weights/BIOFMGENETV1.keras"
-            print(f"Attempting to load model from: {model_path}")
-            
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found: {model_path}")
-            
-            # Use the correct API for loading models
-            BIOModel = tf.keras.models.load_model(model_path)
+            logger.info("Loading BIO model", extra={'path': BIO_MODEL_PATH, 'runtime': MODEL_RUNTIME})
             
-            # Optional: recompile if needed
-            optimizer = tf.keras.optimizers.Adam(learning_rate=0.001)
-            BIOModel.compile(optimizer=optimizer, loss='categorical_crossentropy', metrics=['accuracy'])
-            print("BIO model loaded successfully")
+            model, infer, version = load_inference_model(BIO_MODEL_PATH, BIO_INPUT_SIGNATURE)
+            BIOInfer = instrument_inference(infer, "biofm", version)
+            if version != BIO_MODEL_VERSION:
+                BIOCache.clear()
+            BIO_MODEL_VERSION = version
+            BIOModel = model
+            logger.info("BIO model loaded", extra={'model_version': version})
             return True
-        except Exception as e:
-            print(f"Error loading BIO model: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error loading BIO model")
             return False
     return True
 
@@ -48,106 +236,250 @@ def predict_bio_cdr(features):
     Returns:
         Raw model predictions as numpy array
     """
+    # Reshape features for model input
+    features_array = np.array(features, dtype=np.float32).reshape(1, -1)
+    
+    return predict_bio_cdr_batch(features_array)[0]  # Return first (and only) prediction
+
+def predict_bio_cdr_batch(features_matrix):
+    """
+    Predict CDR levels for a whole cohort in one batched forward pass
+    
+    Args:
+        features_matrix: (N, 8) float32 array of biomarker rows
+    
+    Returns:
+        (N, 4) array of raw model predictions (logits)
+    """
     if not load_bio_model():
         raise Exception("BIO model not available")
     
-    # Reshape features for model input
-    features_array = np.array(features).reshape(1, -1)
+    features_matrix = np.asarray(features_matrix, dtype=np.float32)
+    return np.concatenate([
+        BIOInfer(features_matrix[start:start + BIOFM_PREDICT_BATCH_SIZE])
+        for start in range(0, len(features_matrix), BIOFM_PREDICT_BATCH_SIZE)
+    ])
+
+def softmax_rows(logits):
+    """Row-wise, numerically stable softmax over an (N, C) array"""
+    exp_preds = np.exp(logits - np.max(logits, axis=1, keepdims=True))
+    return exp_preds / np.sum(exp_preds, axis=1, keepdims=True)
+
+def validate_bio_matrix(rows):
+    """
+    Validate a cohort of biomarker rows as a single NumPy array
+    
+    Args:
+        rows: Nested list or array-like of shape (N, 8)
+    
+    Returns:
+        (N, 8) float32 array
+    
+    Raises:
+        ValueError: If the rows are not an N x 8 matrix of finite numbers
+    """
+    try:
+        matrix = np.asarray(rows, dtype=np.float32)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid data types in features: {str(e)}')
+    
+    if matrix.ndim != 2 or matrix.shape[0] == 0 or matrix.shape[1] != len(BIO_FEATURE_COLUMNS):
+        raise ValueError(f'Invalid features. Expected an N x 8 matrix of numerical values: [{", ".join(BIO_FEATURE_COLUMNS)}], got shape {matrix.shape}')
+    
+    bad_rows = np.flatnonzero(~np.isfinite(matrix).all(axis=1))
+    if bad_rows.size:
+        raise ValueError(f'Missing or non-finite values in rows: {bad_rows[:10].tolist()}')
     
-    # Get raw predictions (logits)
-    predictions = BIOModel.predict(features_array, verbose=0)
+    return matrix
+
+def read_bio_csv(csv_file):
+    """
+    Read a cohort CSV into an (N, 8) feature matrix
+    
+    Accepts either a header row naming the BIO_FEATURE_COLUMNS (extra columns
+    such as those in oasis_longitudinal.csv are ignored, 'M'/'F' is mapped the
+    same way TrainBIO.py does), or a headerless file with 8 feature columns or
+    the 9 columns of clean_oasis.csv (CDR in the sixth column, dropped here).
+    """
+    df = pd.read_csv(csv_file, header=None, dtype=str, skipinitialspace=True)
+    header = [str(value).strip() for value in df.iloc[0]]
     
-    return predictions[0]  # Return first (and only) prediction
+    if set(BIO_FEATURE_COLUMNS).issubset(header):
+        df.columns = header
+        df = df.iloc[1:][BIO_FEATURE_COLUMNS]
+    elif df.shape[1] == len(BIO_FEATURE_COLUMNS) + 1:
+        df = df.drop(columns=5)
+    elif df.shape[1] != len(BIO_FEATURE_COLUMNS):
+        raise ValueError(f'Expected {len(BIO_FEATURE_COLUMNS)} feature columns or a header naming {", ".join(BIO_FEATURE_COLUMNS)}, got {df.shape[1]} columns')
+    
+    df = df.replace({'F': '0', 'M': '1'})
+    try:
+        return df.to_numpy(dtype=np.float32)
+    except ValueError as e:
+        raise ValueError(f'Invalid data types in features: {str(e)}')
 
 def load_mri_model():
     """Load the MRI model for impairment prediction"""
-    global MRIModel
+    global MRIModel, MRIInfer, MRI_MODEL_VERSION
     if MRIModel is None:
         try:
-            model_path = "./AMRI/weights/AMRIGENETV1.keras"
-            print(f"Attempting to load MRI model from: {model_path}")
-            
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"MRI Model file not found: {model_path}")
+            logger.info("Loading MRI model", extra={'path': MRI_MODEL_PATH, 'runtime': MODEL_RUNTIME})
             
-            MRIModel = tf.keras.models.load_model(model_path)
-            
-            # Optional: recompile if needed
-            optimizer = tf.keras.optimizers.SGD(learning_rate=0.00015)
-            MRIModel.compile(optimizer=optimizer, loss='categorical_crossentropy', metrics=['accuracy'])
-            print("MRI model loaded successfully")
-            print(f"Model input shape: {MRIModel.input_shape}")
-            print(f"Model output shape: {MRIModel.output_shape}")
+            model, infer, version = load_inference_model(MRI_MODEL_PATH, MRI_INPUT_SIGNATURE, MRI_INPUT_SCALE)
+            MRIInfer = instrument_inference(infer, "amri", version)
+            if version != MRI_MODEL_VERSION:
+                MRICache.clear()
+            MRI_MODEL_VERSION = version
+            MRIModel = model
+            logger.info("MRI model loaded", extra={
+                'model_version': version,
+                'input_shape': str(MRIModel.input_shape),
+                'output_shape': str(MRIModel.output_shape)
+            })
             return True
-        except Exception as e:
-            print(f"Error loading MRI model: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error loading MRI model")
             return False
     return True
 
-def preprocess_image(image_file):
+def preprocess_image(image_file, file_ext=None):
     """
     Preprocess uploaded image for MRI model prediction
     
+    The file is decoded straight from its stream. JPEGs use draft mode, so
+    libjpeg scales them down in the DCT domain instead of decoding at full
+    resolution. DICOM (.dcm) files are decoded with pydicom and windowed
+    like a one-slice volume. The result stays uint8; scaling to [0, 1]
+    happens inside the model's compiled forward pass.
+    
     Args:
-        image_file: Uploaded image file
+        image_file: Uploaded image file (any binary file-like object)
+        file_ext: Lower-case extension of the upload, e.g. '.dcm'
     
     Returns:
-        Preprocessed image array ready for model input
+        (1, 128, 128, 3) uint8 image array ready for model input
     """
     try:
-        # Read image
-        image = Image.open(io.BytesIO(image_file.read()))
+        if file_ext == '.dcm':
+            return slices_to_model_batch(dicom_pixels(image_file)[np.newaxis], MRI_IMAGE_SIZE)
+        
+        image = Image.open(image_file)
+        
+        # Let the JPEG decoder downscale to the nearest size >= 128x128
+        if image.format == 'JPEG':
+            image.draft('RGB', MRI_IMAGE_SIZE)
         
         # Convert to RGB if necessary
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Resize to model's expected input size (128x128 based on the error message)
-        image = image.resize((128, 128))
-        
-        # Convert to numpy array and normalize
-        image_array = np.array(image, dtype=np.float32)
-        image_array = image_array / 255.0  # Normalize to [0, 1]
+        # Resize to model's expected input size
+        if image.size != MRI_IMAGE_SIZE:
+            image = image.resize(MRI_IMAGE_SIZE)
         
         # Add batch dimension
-        image_array = np.expand_dims(image_array, axis=0)
-        
-        # Debug: Print image statistics
-        print(f"Preprocessed image shape: {image_array.shape}")
-        print(f"Image min value: {np.min(image_array):.4f}")
-        print(f"Image max value: {np.max(image_array):.4f}")
-        print(f"Image mean: {np.mean(image_array):.4f}")
-        print(f"Image std: {np.std(image_array):.4f}")
-        
-        return image_array
+        return np.asarray(image, dtype=np.uint8)[np.newaxis]
         
     except Exception as e:
         raise Exception(f"Image preprocessing failed: {str(e)}")
 
+def image_statistics(image_array):
+    """
+    Summary statistics of a preprocessed uint8 image, reported in /amri debug_info
+    
+    A single pass builds a 256-bin histogram, from which min, max, mean and
+    std are derived exactly, on the model's [0, 1] input scale.
+    """
+    counts = np.bincount(image_array.ravel(), minlength=256)
+    levels = np.arange(256) * MRI_INPUT_SCALE
+    total = counts.sum()
+    mean = counts @ levels / total
+    variance = max(counts @ (levels * levels) / total - mean * mean, 0.0)
+    present = np.flatnonzero(counts)
+    return {
+        'mean': float(mean),
+        'std': float(np.sqrt(variance)),
+        'min': float(levels[present[0]]),
+        'max': float(levels[present[-1]])
+    }
+
+def get_mri_batcher():
+    """Return the shared MRI micro-batcher, creating it once the model is loaded"""
+    global MRIBatcher
+    if MRIBatcher is None:
+        if not load_mri_model():
+            raise Exception("MRI model not available")
+        with _mri_batcher_lock:
+            if MRIBatcher is None:
+                MRIBatcher = MicroBatcher(
+                    MRIInfer,
+                    max_batch_size=AMRI_MAX_BATCH_SIZE,
+                    max_wait_ms=AMRI_MAX_WAIT_MS,
+                    name="amri"
+                )
+    return MRIBatcher
+
 def predict_mri_impairment(image_array):
     """
     Predict impairment levels from MRI scan
     
+    Concurrent callers are grouped by the MRI micro-batcher so several
+    requests share a single forward pass.
+    
     Args:
-        image_array: Preprocessed image array
+        image_array: Preprocessed image array with a batch dimension of 1
     
     Returns:
         Raw model predictions as numpy array
     """
+    # Get raw predictions for this image's row of the batch
+    return get_mri_batcher().predict(image_array[0])
+
+def predict_mri_volume(slice_batch):
+    """
+    Predict impairment levels for every slice of a study
+    
+    The slices go straight to the compiled forward pass as one batch (split
+    only if larger than AMRI_MAX_BATCH_SIZE, the size the model was warmed
+    up with) rather than one by one through the micro-batcher.
+    
+    Args:
+        slice_batch: (S, 128, 128, 3) uint8 slices
+    
+    Returns:
+        (S, 4) raw model predictions
+    """
     if not load_mri_model():
         raise Exception("MRI model not available")
+    return np.concatenate([
+        MRIInfer(slice_batch[start:start + AMRI_MAX_BATCH_SIZE])
+        for start in range(0, len(slice_batch), AMRI_MAX_BATCH_SIZE)
+    ])
+
+def warmup_models():
+    """
+    Load both models and run warmup batches through their compiled paths
     
-    print(f"Making prediction with input shape: {image_array.shape}")
+    Runs once at startup so the first clinician request does not pay for
+    model loading, graph tracing or first-call kernel setup. The API only
+    reports ready (see /ready) after this has completed.
     
-    # Get raw predictions
-    predictions = MRIModel.predict(image_array, verbose=0)
+    Returns:
+        True if both models are loaded and warm
+    """
+    global MODELS_READY
+    if not (load_bio_model() and load_mri_model()):
+        return False
     
-    print(f"Raw model output: {predictions}")
-    print(f"Output shape: {predictions.shape}")
+    for batch_size in sorted({1, BIOFM_PREDICT_BATCH_SIZE}):
+        BIOInfer(np.zeros([batch_size, len(BIO_FEATURE_COLUMNS)], dtype=np.float32))
+    for batch_size in sorted({1, AMRI_MAX_BATCH_SIZE}):
+        MRIInfer(np.zeros([batch_size, *MRI_IMAGE_SIZE, 3], dtype=np.uint8))
+    get_mri_batcher()
     
-    return predictions[0]  # Return first (and only) prediction   
+    MODELS_READY = True
+    logger.info("Models loaded and warmed up")
+    return True
 
 def compare_predictions_and_decide(raw_predictions, labels):
     """
@@ -252,14 +584,11 @@ def generate_recommendations(sorted_predictions, confidence_margin):
         else:
             recommendations.extend([
                 "Monitor cognitive function closely",
-        # Read image
-        image_bytes = image_file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        image_file.seek(0)  # Reset stream position for future reads
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+                "Follow-up cognitive screening in 6-12 months"
+            ])
+
+    elif "Very Mild Impairment" in primary["label"]:
+        recommendations.extend([
             "Neuropsychological assessment recommended",
             "Monitor progression with regular follow-ups",
             "Consider cognitive training programs",
@@ -292,6 +621,43 @@ def generate_recommendations(sorted_predictions, confidence_margin):
     
     return recommendations
 
+@app.after_request
+def record_request_metrics(response):
+    """Count every response, and failed ones per endpoint and model version"""
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        kind = 'server' if response.status_code >= 500 else 'client'
+        ERRORS_TOTAL.inc(endpoint=endpoint, model_version=endpoint_model_version(endpoint), kind=kind)
+    return response
+
+def collect_component_metrics():
+    """Scrape-time metrics read from the prediction caches and the MRI micro-batcher"""
+    caches = [(MRICache, MRI_MODEL_VERSION), (BIOCache, BIO_MODEL_VERSION)]
+    cache_stats = [({'cache': cache.name, 'model_version': version or ""}, cache.stats()) for cache, version in caches]
+    for field in ('hits', 'misses', 'evictions', 'expirations'):
+        yield (f"model_api_cache_{field}_total", "counter", f"Prediction cache {field}",
+               [(labels, stats[field]) for labels, stats in cache_stats])
+    yield ("model_api_cache_hit_ratio", "gauge", "Prediction cache hits / lookups",
+           [(labels, stats['hit_rate']) for labels, stats in cache_stats])
+    yield ("model_api_cache_entries", "gauge", "Entries held in the prediction cache",
+           [(labels, stats['entries']) for labels, stats in cache_stats])
+    if MRIBatcher is not None:
+        batcher_stats = MRIBatcher.stats()
+        yield ("model_api_microbatch_queue_depth", "gauge", "Samples waiting in the MRI micro-batcher",
+               [({'model_version': MRI_MODEL_VERSION}, batcher_stats['queue_depth'])])
+        yield ("model_api_microbatch_mean_size", "gauge", "Mean batch size achieved by the MRI micro-batcher",
+               [({'model_version': MRI_MODEL_VERSION}, batcher_stats['mean_batch_size'])])
+    yield ("model_api_models_ready", "gauge", "1 once both models are loaded and warmed up",
+           [({}, int(MODELS_READY))])
+
+METRICS.add_collector(collect_component_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(METRICS.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
 @app.route('/')
 def home():
     return "Flask is working!"
@@ -304,6 +670,39 @@ def test():
 def status():
     return {"status": "API is running smoothly"}
 
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once warmup_models() has loaded and warmed both models"""
+    body = {
+        "ready": MODELS_READY,
+        "bio_model_loaded": BIOModel is not None,
+        "mri_model_loaded": MRIModel is not None
+    }
+    return jsonify(body), 200 if MODELS_READY else 503
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/eviction counters of the /amri and /biofm prediction caches"""
+    return jsonify({
+        'amri': {**MRICache.stats(), 'model_version': MRI_MODEL_VERSION},
+        'biofm': {**BIOCache.stats(), 'model_version': BIO_MODEL_VERSION},
+        'status': 'success'
+    })
+
+@app.route('/amri/batching-stats', methods=['GET'])
+def amri_batching_stats():
+    """Report the achieved batch-size distribution of the /amri micro-batcher"""
+    if MRIBatcher is None:
+        return jsonify({
+            'max_batch_size': AMRI_MAX_BATCH_SIZE,
+            'max_wait_ms': AMRI_MAX_WAIT_MS,
+            'total_items': 0,
+            'total_batches': 0,
+            'batch_size_distribution': {},
+            'status': 'idle'
+        })
+    return jsonify({**MRIBatcher.stats(), 'status': 'success'})
+
 # Add a debug endpoint to check TensorFlow/Keras versions
 @app.route('/debug-versions', methods=['GET'])
 def debug_versions():
@@ -311,8 +710,10 @@ def debug_versions():
         'tensorflow_version': tf.__version__,
         'keras_version': tf.keras.__version__,
         'current_directory': os.getcwd(),
-        'bio_model_file_exists': os.path.exists("./BIOFM/weights/BIOFMGENETV1.keras"),
-        'mri_model_file_exists': os.path.exists("./AMRI/weights/AMRIGENETV1.keras")
+        'model_runtime': MODEL_RUNTIME,
+        'tflite_variant': TFLITE_VARIANT if MODEL_RUNTIME == "tflite" else None,
+        'bio_model_file_exists': os.path.exists(BIO_MODEL_PATH),
+        'mri_model_file_exists': os.path.exists(MRI_MODEL_PATH)
     })
 
 # Add a test endpoint to verify model variability
@@ -321,16 +722,16 @@ def test_model_variability():
     """Test endpoint to verify model gives different outputs for different inputs"""
     try:
         # Create different test inputs
-        test_input_1 = np.zeros((1, 128, 128, 3))  # All black image
-        test_input_2 = np.ones((1, 128, 128, 3))   # All white image
-        test_input_3 = np.random.random((1, 128, 128, 3))  # Random noise
+        test_input_1 = np.zeros((1, 128, 128, 3), dtype=np.uint8)  # All black image
+        test_input_2 = np.full((1, 128, 128, 3), 255, dtype=np.uint8)   # All white image
+        test_input_3 = np.random.randint(0, 256, (1, 128, 128, 3), dtype=np.uint8)  # Random noise
         
         if not load_mri_model():
             return jsonify({"error": "MRI model not available"}), 500
         
-        pred1 = MRIModel.predict(test_input_1, verbose=0)
-        pred2 = MRIModel.predict(test_input_2, verbose=0)
-        pred3 = MRIModel.predict(test_input_3, verbose=0)
+        pred1 = MRIInfer(test_input_1)
+        pred2 = MRIInfer(test_input_2)
+        pred3 = MRIInfer(test_input_3)
         
         # Show detailed comparison
         labels = ["Mild Impairment", "Moderate Impairment", "No Impairment", "Very Mild Impairment"]
@@ -371,7 +772,8 @@ def biofm():
     """
     try:
         # Get input data
-        data = request.get_json()
+        with stage_timer('/biofm', 'decode'):
+            data = request.get_json()
         if not data or 'features' not in data:
             return jsonify({
                 'error': 'No features provided. Expected JSON with "features" key.',
@@ -405,30 +807,32 @@ def biofm():
                 'status': 'error'
             }), 400
         
-        # Make prediction
-        raw_predictions = predict_bio_cdr(validated_features)
-        
-        # CDR classification labels
-        cdr_labels = [
-            "CDR 0 (No Dementia)",
-            "CDR 0.5 (Very Mild Dementia)", 
-            "CDR 1 (Mild Dementia)",
-            "CDR 2 (Moderate Dementia)"
-        ]
+        # Make prediction, reusing a cached result for identical features
+        if not load_bio_model():
+            raise Exception("BIO model not available")
+        cache_key = (BIO_MODEL_VERSION, tuple(validated_features))
+        raw_predictions = BIOCache.get(cache_key)
+        if raw_predictions is None:
+            with stage_timer('/biofm', 'forward'):
+                raw_predictions = predict_bio_cdr(validated_features)
+            BIOCache.put(cache_key, raw_predictions)
         
-        # Apply softmax to convert raw predictions to probabilities
-        exp_preds = np.exp(raw_predictions - np.max(raw_predictions))  # Numerical stability
-        probabilities = exp_preds / np.sum(exp_preds)
+        cdr_labels = CDR_LABELS
         
-        # Create interpretation with percentages
-        interpretation = {}
-        for i, label in enumerate(cdr_labels):
-            interpretation[label] = f"{probabilities[i] * 100:.1f}%"
-        
-        # Find predicted class (highest probability)
-        predicted_class_index = np.argmax(probabilities)
-        predicted_class = cdr_labels[predicted_class_index]
-        max_confidence = f"{probabilities[predicted_class_index] * 100:.1f}%"
+        with stage_timer('/biofm', 'decision'):
+            # Apply softmax to convert raw predictions to probabilities
+            exp_preds = np.exp(raw_predictions - np.max(raw_predictions))  # Numerical stability
+            probabilities = exp_preds / np.sum(exp_preds)
+            
+            # Create interpretation with percentages
+            interpretation = {}
+            for i, label in enumerate(cdr_labels):
+                interpretation[label] = f"{probabilities[i] * 100:.1f}%"
+            
+            # Find predicted class (highest probability)
+            predicted_class_index = np.argmax(probabilities)
+            predicted_class = cdr_labels[predicted_class_index]
+            max_confidence = f"{probabilities[predicted_class_index] * 100:.1f}%"
         
         # Prepare response
         response = {
@@ -441,9 +845,65 @@ def biofm():
             'status': 'success'
         }
         
-        return jsonify(response), 200
+        with stage_timer('/biofm', 'serialize'):
+            return jsonify(response), 200
+
+    except Exception as e:
+        logger.exception("BIO prediction failed")
+        return jsonify({
+            'error': f'Prediction failed: {str(e)}',
+            'status': 'error'
+        }), 500
+
+@app.route('/biofm/batch', methods=['POST'])
+def biofm_batch():
+    """
+    Endpoint for scoring a whole cohort with the BioFM model.
+    Expects either JSON {"features": [[M/F, Age, EDUC, SES, MMSE, eTIV, nWBV, ASF], ...]}
+    or multipart/form-data with a CSV "file" (see read_bio_csv).
+    The matrix is validated once, scored in one batched forward pass and
+    softmax/argmax are applied across all rows at once.
+    """
+    try:
+        try:
+            with stage_timer('/biofm/batch', 'decode'):
+                if 'file' in request.files:
+                    features_matrix = validate_bio_matrix(read_bio_csv(request.files['file']))
+                else:
+                    data = request.get_json(silent=True)
+                    if not data or 'features' not in data:
+                        return jsonify({
+                            'error': 'No features provided. Expected JSON with a "features" matrix or a CSV "file" upload.',
+                            'status': 'error'
+                        }), 400
+                    features_matrix = validate_bio_matrix(data['features'])
+        except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            return jsonify({
+                'error': str(e),
+                'status': 'error'
+            }), 400
+        
+        with stage_timer('/biofm/batch', 'forward'):
+            raw_predictions = predict_bio_cdr_batch(features_matrix)
+        with stage_timer('/biofm/batch', 'decision'):
+            probabilities = softmax_rows(raw_predictions)
+            predicted_indices = np.argmax(probabilities, axis=1)
+            max_confidences = probabilities[np.arange(len(probabilities)), predicted_indices]
+        
+        with stage_timer('/biofm/batch', 'serialize'):
+            return jsonify({
+                'rows': int(features_matrix.shape[0]),
+                'cdr_labels': CDR_LABELS,
+                'raw_predictions': raw_predictions.tolist(),
+                'probabilities': np.round(probabilities, 6).tolist(),
+                'predicted_class_index': predicted_indices.tolist(),
+                'predicted_class': np.asarray(CDR_LABELS)[predicted_indices].tolist(),
+                'max_confidence': np.round(max_confidences, 6).tolist(),
+                'status': 'success'
+            }), 200
 
     except Exception as e:
+        logger.exception("BIO batch prediction failed")
         return jsonify({
             'error': f'Prediction failed: {str(e)}',
             'status': 'error'
@@ -473,72 +933,304 @@ def amri():
             }), 400
         
         # Validate file type
-        allowed_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.dcm'}
         file_ext = os.path.splitext(file.filename.lower())[1]
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_IMAGE_EXTENSIONS:
             return jsonify({
-                'error': f'Invalid file type. Supported formats: {", ".join(allowed_extensions)}',
+                'error': f'Invalid file type. Supported formats: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}',
                 'status': 'error'
             }), 400
         
-        print(f"Processing file: {file.filename}")
+        # Re-uploads of the same scan skip preprocessing and prediction
+        if not load_mri_model():
+            raise Exception("MRI model not available")
+        with stage_timer('/amri', 'decode'):
+            image_bytes = file.read()
+            cache_key = content_key(MRI_MODEL_VERSION, image_bytes)
+        cached = MRICache.get(cache_key)
+        if cached is not None:
+            raw_predictions, image_stats = cached
+        else:
+            # Preprocess the image
+            with stage_timer('/amri', 'preprocess'):
+                image_array = preprocess_image(io.BytesIO(image_bytes), file_ext)
+                image_stats = image_statistics(image_array)
+            
+            # Make prediction
+            with stage_timer('/amri', 'forward'):
+                raw_predictions = predict_mri_impairment(image_array)
+            MRICache.put(cache_key, (raw_predictions, image_stats))
         
-        # Preprocess the image
-        image_array = preprocess_image(file)
+        # Perform detailed comparison of all 4 prediction values
+        with stage_timer('/amri', 'decision'):
+            decision_analysis = compare_predictions_and_decide(raw_predictions, IMPAIRMENT_LABELS)
         
-        # Make prediction
-        raw_predictions = predict_mri_impairment(image_array)
+        logger.debug("MRI analysis", extra={
+            'upload': file.filename,
+            'cache': 'hit' if cached is not None else 'miss',
+            'raw_predictions': raw_predictions.tolist(),
+            'primary_finding': decision_analysis['primary_finding'],
+            'primary_confidence': decision_analysis['primary_confidence'],
+            'decision_confidence': decision_analysis['decision_confidence'],
+            'margin': decision_analysis['margin_analysis']['1st_vs_2nd_margin']
+        })
         
-        # MRI impairment classification labels
-        impairment_labels = [
-            "Mild Impairment",
-            "Moderate Impairment", 
-            "No Impairment",
-            "Very Mild Impairment"
-        ]
+        # Prepare enhanced response
+        response = {
+            'raw_predictions': raw_predictions.tolist(),
+            'impairment_labels': IMPAIRMENT_LABELS,
+            'predicted_class': decision_analysis['primary_finding'],
+            'max_confidence': decision_analysis['primary_confidence'],
+            'decision_analysis': decision_analysis,
+            'debug_info': {
+                'filename': file.filename,
+                'image_stats': image_stats,
+                'cache': 'hit' if cached is not None else 'miss'
+            },
+            'status': 'success'
+        }
         
-        # Perform detailed comparison of all 4 prediction values
-        decision_analysis = compare_predictions_and_decide(raw_predictions, impairment_labels)
-        
-        # Enhanced console output showing comparison
-        print(f"=== MRI Analysis Results for {file.filename} ===")
-        print(f"Raw predictions: {raw_predictions}")
-        print(f"Detailed comparison:")
-        for item in decision_analysis["full_comparison"]:
-            print(f"  Rank {item['rank']}: {item['label']} = {item['percentage']} (prob: {item['probability']:.4f})")
-        print(f"Primary Finding: {decision_analysis['primary_finding']} ({decision_analysis['primary_confidence']})")
-        print(f"Secondary Finding: {decision_analysis['secondary_finding']} ({decision_analysis['secondary_confidence']})")
-        print(f"Confidence Level: {decision_analysis['decision_confidence']}")
-        print(f"Decision: {decision_analysis['decision_rationale']}")
-        print(f"Margin Analysis: 1st vs 2nd = {decision_analysis['margin_analysis']['1st_vs_2nd_margin']}")
+        with stage_timer('/amri', 'serialize'):
+            return jsonify(response), 200
+
+    except Exception as e:
+        logger.exception("MRI analysis failed")
+        return jsonify({
+            'error': f'MRI analysis failed: {str(e)}',
+            'status': 'error'
+        }), 500
+
+@app.route('/amri/volume', methods=['POST'])
+def amri_volume():
+    """
+    Endpoint for predicting impairment levels from a whole MRI study.
+    Expects a file upload with a NIfTI volume (.nii / .nii.gz) or a .zip
+    archive of one DICOM series.
+    Samples up to VOLUME_MAX_SLICES axial slices from the central band of
+    the volume, scores them in one batch and returns the study-level
+    analysis (mean of the slice predictions) plus a per-slice breakdown.
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({
+                'error': 'No file provided. Expected multipart/form-data with "file" field.',
+                'status': 'error'
+            }), 400
+        
+        file = request.files['file']
+        file_ext = volume_extension(file.filename)
+        if file_ext is None:
+            return jsonify({
+                'error': 'Invalid file type. Supported formats: .nii, .nii.gz, .zip (DICOM series)',
+                'status': 'error'
+            }), 400
+        
+        with stage_timer('/amri/volume', 'decode'):
+            if file_ext == '.zip':
+                slices, slice_indices = read_dicom_series_slices(file.stream, VOLUME_MAX_SLICES, VOLUME_SLICE_BAND)
+            else:
+                # nibabel memory-maps from a path, so spool the upload to disk in chunks
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    volume_path = os.path.join(temp_dir, 'volume' + file_ext)
+                    file.save(volume_path)
+                    slices, slice_indices = read_nifti_slices(volume_path, VOLUME_MAX_SLICES, VOLUME_SLICE_BAND)
+        
+        with stage_timer('/amri/volume', 'preprocess'):
+            slice_batch = slices_to_model_batch(slices, MRI_IMAGE_SIZE)
+        with stage_timer('/amri/volume', 'forward'):
+            slice_predictions = predict_mri_volume(slice_batch)
+        with stage_timer('/amri/volume', 'decision'):
+            raw_predictions, votes = aggregate_slice_predictions(slice_predictions)
+            decision_analysis = compare_predictions_and_decide(raw_predictions, IMPAIRMENT_LABELS)
+        
+        logger.debug("MRI volume analysis", extra={
+            'upload': file.filename,
+            'slices': len(slice_indices),
+            'primary_finding': decision_analysis['primary_finding'],
+            'primary_confidence': decision_analysis['primary_confidence']
+        })
         
-        # Prepare enhanced response
         response = {
             'raw_predictions': raw_predictions.tolist(),
-            'impairment_labels': impairment_labels,
+            'impairment_labels': IMPAIRMENT_LABELS,
             'predicted_class': decision_analysis['primary_finding'],
             'max_confidence': decision_analysis['primary_confidence'],
             'decision_analysis': decision_analysis,
+            'slices': {
+                'count': len(slice_indices),
+                'indices': slice_indices.tolist(),
+                'votes': dict(zip(IMPAIRMENT_LABELS, votes.tolist())),
+                'predicted_classes': [IMPAIRMENT_LABELS[i] for i in np.argmax(slice_predictions, axis=1)]
+            },
             'debug_info': {
                 'filename': file.filename,
-                'image_stats': {
-                    'mean': float(np.mean(image_array)),
-                    'std': float(np.std(image_array)),
-                    'min': float(np.min(image_array)),
-                    'max': float(np.max(image_array))
-                }
+                'format': 'dicom' if file_ext == '.zip' else 'nifti'
             },
             'status': 'success'
         }
         
-        return jsonify(response), 200
+        with stage_timer('/amri/volume', 'serialize'):
+            return jsonify(response), 200
+    
+    except VolumeFormatError as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 400
+    except Exception as e:
+        logger.exception("MRI volume analysis failed")
+        return jsonify({
+            'error': f'MRI volume analysis failed: {str(e)}',
+            'status': 'error'
+        }), 500
 
+def iter_batch_uploads(uploads):
+    """
+    Yield (filename, file-like) pairs for every image in a batch upload
+    
+    Zip archives are expanded member by member so the archive is never
+    extracted or read into memory as a whole.
+    
+    Args:
+        uploads: List of uploaded files (images and/or .zip archives)
+    """
+    for upload in uploads:
+        if upload.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(upload.stream) as archive:
+                for member in archive.infolist():
+                    name = member.filename
+                    if member.is_dir() or os.path.basename(name).startswith('.') or '__MACOSX' in name:
+                        continue
+                    with archive.open(member) as member_file:
+                        yield name, member_file
+        else:
+            yield upload.filename, upload
+
+def cache_mri_prediction(cache_key, image_array):
+    """Future callback storing a batched /amri prediction in the MRI cache"""
+    image_stats = image_statistics(image_array)
+    
+    def store(future):
+        if future.exception() is None:
+            MRICache.put(cache_key, (future.result(), image_stats))
+    
+    return store
+
+def summarize_mri_prediction(filename, raw_predictions):
+    """Build the per-image record returned by /amri/batch"""
+    with stage_timer('/amri/batch', 'decision'):
+        decision_analysis = compare_predictions_and_decide(raw_predictions, IMPAIRMENT_LABELS)
+    return {
+        'filename': filename,
+        'raw_predictions': raw_predictions.tolist(),
+        'predicted_class': decision_analysis['primary_finding'],
+        'max_confidence': decision_analysis['primary_confidence'],
+        'decision_analysis': decision_analysis,
+        'status': 'success'
+    }
+
+@app.route('/amri/batch', methods=['POST'])
+def amri_batch():
+    """
+    Endpoint for predicting impairment levels for many MRI scans at once.
+    Expects multipart/form-data with one or more "files" fields, each an
+    image or a .zip archive of images.
+    Streams back one NDJSON line per image, in upload order. Images are
+    decoded while earlier ones are still being predicted by the MRI
+    micro-batcher, and at most AMRI_BATCH_WINDOW images are held at once.
+    """
+    # Parse the form ourselves: request.files is closed as soon as this view
+    # returns, before the streamed response body has been generated
+    _, _, files = parse_form_data(request.environ)
+    uploads = files.getlist('files')
+    if not uploads or all(upload.filename == '' for upload in uploads):
+        return jsonify({
+            'error': 'No files provided. Expected multipart/form-data with one or more "files" fields.',
+            'status': 'error'
+        }), 400
+
+    try:
+        batcher = get_mri_batcher()
     except Exception as e:
+        for upload in uploads:
+            upload.close()
         return jsonify({
             'error': f'MRI analysis failed: {str(e)}',
             'status': 'error'
         }), 500
 
+    def error_line(filename, message):
+        ERRORS_TOTAL.inc(endpoint='/amri/batch', model_version=MRI_MODEL_VERSION, kind='item')
+        return json.dumps({'filename': filename, 'error': message, 'status': 'error'}) + '\n'
+
+    def generate():
+        pending = deque()
+
+        def queue_error(filename, message):
+            # Errors wait their turn behind earlier predictions to keep upload order
+            future = Future()
+            future.set_result(None)
+            pending.append((filename, future, error_line(filename, message)))
+
+        def drain_oldest():
+            filename, future, error = pending.popleft()
+            if error is not None:
+                # Never reached the model, so it stays out of the forward-stage timings
+                return error
+            try:
+                # Time spent blocked on the micro-batcher, not the whole queue residency
+                with stage_timer('/amri/batch', 'forward'):
+                    raw_predictions = future.result()
+                record = summarize_mri_prediction(filename, raw_predictions)
+                with stage_timer('/amri/batch', 'serialize'):
+                    return json.dumps(record) + '\n'
+            except Exception as e:
+                return error_line(filename, f'MRI analysis failed: {str(e)}')
+
+        try:
+            for filename, image_file in iter_batch_uploads(uploads):
+                file_ext = os.path.splitext(filename.lower())[1]
+                if file_ext not in ALLOWED_IMAGE_EXTENSIONS:
+                    queue_error(filename, f'Invalid file type. Supported formats: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}')
+                    continue
+                with stage_timer('/amri/batch', 'decode'):
+                    image_bytes = image_file.read()
+                    cache_key = content_key(MRI_MODEL_VERSION, image_bytes)
+                cached = MRICache.get(cache_key)
+                if cached is not None:
+                    future = Future()
+                    future.set_result(cached[0])
+                    pending.append((filename, future, None))
+                else:
+                    try:
+                        with stage_timer('/amri/batch', 'preprocess'):
+                            image_array = preprocess_image(io.BytesIO(image_bytes), file_ext)
+                    except Exception as e:
+                        queue_error(filename, str(e))
+                        continue
+                    future = batcher.submit(image_array[0])
+                    future.add_done_callback(cache_mri_prediction(cache_key, image_array))
+                    pending.append((filename, future, None))
+
+                # Only block on the oldest prediction once the window is full
+                while len(pending) >= AMRI_BATCH_WINDOW or (pending and pending[0][1].done()):
+                    yield drain_oldest()
+        except zipfile.BadZipFile as e:
+            queue_error(None, f'Invalid zip archive: {str(e)}')
+        finally:
+            for upload in uploads:
+                upload.close()
+
+        while pending:
+            yield drain_oldest()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
-    print("Starting Flask API server...")
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    configure_logging(LOG_LEVEL, LOG_FORMAT)
+    logger.info("Starting Flask API server")
+    # The debug reloader re-runs this script in a child process that does the
+    # actual serving; only warm the models up there
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warmup_models()
+    # threaded=True lets concurrent /amri requests reach the micro-batcher together
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
@@ -0,0 +1,87 @@
+"""
+Bounded LRU + TTL cache for model predictions.
+
+Keys are built by the caller (content hash or feature tuple) and always
+include the model version, so results from a previous model can never be
+served after a swap; ModelAPI.py also clears the cache when a model loads.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(model_version, payload):
+    """Cache key for raw uploaded bytes: (model version, SHA-256 of the bytes)"""
+    return model_version, hashlib.sha256(payload).hexdigest()
+
+
+class PredictionCache:
+    """
+    Thread-safe least-recently-used cache whose entries expire after a TTL
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        ttl_seconds: Age after which an entry is treated as a miss
+        name: Used in stats
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0, name="cache"):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,290 @@
+"""
+Pre-fork production server for ModelAPI.
+
+The parent process binds the listening socket, loads and warms the models,
+then forks --workers processes that accept connections on the shared socket.
+Each worker serves ModelAPI's Flask app with a threaded WSGI server (so its
+requests still meet in the /amri micro-batcher) and runs TensorFlow / TFLite
+with explicit intra-op and inter-op thread counts, so workers x threads can be
+matched to the cores instead of every worker spawning one thread per core.
+Workers that die are restarted; SIGTERM or Ctrl-C stops them all.
+
+Model sharing depends on MODEL_RUNTIME:
+
+    tflite  Interpreters are created and warmed in the parent; workers
+            inherit them and the weight pages stay shared copy-on-write.
+    keras   The TensorFlow runtime cannot be used across fork() (its thread
+            pools do not survive it and the first op in a child deadlocks),
+            so each worker loads and warms its own copy after forking.
+
+Run from the ModelTraining directory:
+
+    MODEL_RUNTIME=tflite python ServeAPI.py --workers 4 --intra-op-threads 1
+    python ServeAPI.py --benchmark --endpoint amri --duration 20
+
+--benchmark starts the server once per workers x threads combination,
+drives it with concurrent clients and prints throughput and latency for each.
+"""
+import argparse
+import glob
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from werkzeug.serving import make_server
+
+import ModelAPI
+from ModelAPI import app, configure_logging, logger, warmup_models
+
+
+def configure_threads(intra_op_threads, inter_op_threads):
+    """Set per-process thread pools; must run before the first TensorFlow op"""
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    ModelAPI.TFLITE_NUM_THREADS = intra_op_threads
+
+
+def run_worker(index, listen_socket, args, metrics_dir):
+    """Body of a forked worker: finish model setup, then serve until signalled"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+
+    # Threads are not copied by fork(): the parent's micro-batcher worker
+    # thread does not exist here, so build a fresh batcher in this process
+    ModelAPI.MRIBatcher = None
+    ModelAPI._mri_batcher_lock = threading.Lock()
+    if ModelAPI.MODEL_RUNTIME == "keras":
+        configure_threads(args.intra_op_threads, args.inter_op_threads)
+    if not warmup_models():
+        logger.error("Worker failed to load models", extra={'worker': index})
+        os._exit(1)
+    ModelAPI.METRICS.start_snapshots(metrics_dir, index)
+
+    server = make_server(args.host, args.port, app, threaded=True, fd=listen_socket.fileno())
+    logger.info("Worker serving", extra={'worker': index, 'pid': os.getpid()})
+    server.serve_forever()
+    os._exit(0)
+
+
+def serve(args):
+    configure_logging(ModelAPI.LOG_LEVEL, ModelAPI.LOG_FORMAT)
+
+    listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listen_socket.bind((args.host, args.port))
+    listen_socket.listen(1024)
+    listen_socket.set_inheritable(True)
+
+    if ModelAPI.MODEL_RUNTIME == "tflite":
+        # Load once here so the workers share the weights copy-on-write
+        configure_threads(args.intra_op_threads, args.inter_op_threads)
+        if not warmup_models():
+            raise SystemExit("Failed to load models")
+
+    metrics_dir = tempfile.mkdtemp(prefix="modelapi-metrics-")
+    workers = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(index, listen_socket, args, metrics_dir)
+        workers[pid] = index
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info("Starting pre-fork server", extra={
+        'host': args.host,
+        'port': args.port,
+        'workers': args.workers,
+        'intra_op_threads': args.intra_op_threads,
+        'inter_op_threads': args.inter_op_threads,
+        'runtime': ModelAPI.MODEL_RUNTIME
+    })
+    for index in range(args.workers):
+        spawn(index)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning("Worker exited, restarting", extra={'worker': index, 'exit_status': status})
+            time.sleep(1.0)
+            spawn(index)
+
+    listen_socket.close()
+    for snapshot in glob.glob(os.path.join(metrics_dir, "*")):
+        os.remove(snapshot)
+    os.rmdir(metrics_dir)
+
+
+def request_factory(endpoint):
+    """Return (path, body, headers) for one benchmark request to endpoint"""
+    if endpoint == "biofm":
+        body = json.dumps({"features": [0, 75, 12, 2.0, 18.0, 1479, 0.657, 1.187]}).encode()
+        return "/biofm", body, {"Content-Type": "application/json"}
+
+    images = sorted(glob.glob("./AMRI/DemoIMG/*.jpg"))
+    if not images:
+        raise SystemExit("No images in AMRI/DemoIMG to benchmark /amri with")
+    with open(images[0], "rb") as image_file:
+        payload = image_file.read()
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"scan.jpg\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return "/amri", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def wait_until_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def drive(port, request, concurrency, duration):
+    """Send requests from `concurrency` client threads for `duration` seconds"""
+    path, body, headers = request
+    deadline = time.monotonic() + duration
+
+    def client():
+        latencies, errors = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                if response.status != 200:
+                    errors += 1
+                    continue
+            except OSError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    latencies = np.array([latency for result in results for latency in result[0]])
+    return latencies, sum(result[1] for result in results)
+
+
+def benchmark(args):
+    """Measure throughput for each workers x threads combination"""
+    cores = os.cpu_count() or 1
+    worker_counts = args.bench_workers or sorted({1, 2, max(1, cores // 2), cores})
+    thread_counts = args.bench_threads or sorted({1, 2, cores})
+    concurrency = args.concurrency or 4 * cores
+    request = request_factory(args.endpoint)
+    # Every request must reach the model, not the prediction cache
+    env = {**os.environ, "PREDICTION_CACHE_SIZE": "0", "LOG_LEVEL": "WARNING"}
+
+    print(f"host: {cores} cores, endpoint /{args.endpoint}, {concurrency} concurrent clients, "
+          f"{args.duration:.0f}s per run, runtime {ModelAPI.MODEL_RUNTIME}")
+    print(f"{'workers':>8}{'threads':>9}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    rows = []
+    for workers in worker_counts:
+        for threads in thread_counts:
+            command = [sys.executable, os.path.abspath(__file__), "--workers", str(workers),
+                       "--intra-op-threads", str(threads), "--inter-op-threads", "1",
+                       "--host", "127.0.0.1", "--port", str(args.port)]
+            server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not wait_until_ready(args.port, timeout=300):
+                    print(f"{workers:>8}{threads:>9}  server did not become ready")
+                    continue
+                drive(args.port, request, concurrency, args.warmup)
+                latencies, errors = drive(args.port, request, concurrency, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+
+            row = {
+                "workers": workers,
+                "threads": threads,
+                "requests_per_s": len(latencies) / args.duration,
+                "latency_ms_p50": float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+                "latency_ms_p95": float(np.percentile(latencies, 95) * 1000) if len(latencies) else None,
+                "latency_ms_p99": float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+                "errors": errors,
+            }
+            rows.append(row)
+            if len(latencies):
+                print(f"{workers:>8}{threads:>9}{row['requests_per_s']:>10.1f}{row['latency_ms_p50']:>9.1f}"
+                      f"{row['latency_ms_p95']:>9.1f}{row['latency_ms_p99']:>9.1f}{errors:>8}")
+            else:
+                print(f"{workers:>8}{threads:>9}{0:>10.1f}{'-':>9}{'-':>9}{'-':>9}{errors:>8}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"cores": cores, "endpoint": args.endpoint, "concurrency": concurrency, "runs": rows}, output, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Pre-fork server for the model API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=cores)
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="Threads per op in each worker (default: cores / workers)")
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark workers x threads combinations")
+    parser.add_argument("--endpoint", choices=["amri", "biofm"], default="amri")
+    parser.add_argument("--bench-workers", type=int, nargs="+")
+    parser.add_argument("--bench-threads", type=int, nargs="+")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--output", help="Write benchmark results as JSON")
+    args = parser.parse_args()
+    if args.intra_op_threads is None:
+        args.intra_op_threads = max(1, cores // args.workers)
+
+    if args.benchmark:
+        benchmark(args)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
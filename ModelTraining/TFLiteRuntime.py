@@ -0,0 +1,79 @@
+"""
+TFLite serving runtime for the exported AMRI and BIOFM artifacts.
+
+ExportTFLite.py writes one .tflite file per quantization variant next to the
+.keras weights; TFLiteModel wraps a tf.lite.Interpreter so ModelAPI.py can
+call it exactly like the compiled Keras forward pass.
+"""
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+# Quantization variants produced by ExportTFLite.py
+TFLITE_VARIANTS = ["float32", "float16", "dynamic", "int8"]
+
+
+def tflite_artifact_path(keras_path, variant):
+    """Return the .tflite path ExportTFLite.py uses for a .keras model and variant"""
+    if variant not in TFLITE_VARIANTS:
+        raise ValueError(f"Unknown TFLite variant '{variant}'. Expected one of: {', '.join(TFLITE_VARIANTS)}")
+    stem, _ = os.path.splitext(keras_path)
+    return f"{stem}_{variant}.tflite"
+
+
+class TFLiteModel:
+    """
+    Callable wrapper around a tf.lite.Interpreter
+
+    Takes a float32 (N, ...) batch and returns the (N, classes) output as a
+    NumPy array. The input tensor is resized when the batch size changes and
+    quantized inputs/outputs (full int8 variant) are converted transparently.
+
+    Args:
+        model_path: Path to a .tflite file
+        num_threads: Interpreter threads; None lets TFLite decide
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"TFLite model file not found: {model_path}. Run ExportTFLite.py first.")
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # Interpreters are not thread-safe
+        self._lock = threading.Lock()
+
+        self.input_shape = (None, *self._input["shape"][1:].tolist())
+        self.output_shape = (None, *self._output["shape"][1:].tolist())
+
+    def _resize(self, batch_size):
+        self.interpreter.resize_tensor_input(self._input["index"], [batch_size, *self.input_shape[1:]])
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def __call__(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.float32)
+        with self._lock:
+            if inputs.shape[0] != self._batch_size:
+                self._resize(inputs.shape[0])
+
+            scale, zero_point = self._input["quantization"]
+            if scale:
+                inputs = np.round(inputs / scale + zero_point)
+                info = np.iinfo(self._input["dtype"])
+                inputs = np.clip(inputs, info.min, info.max)
+            self.interpreter.set_tensor(self._input["index"], inputs.astype(self._input["dtype"]))
+            self.interpreter.invoke()
+            outputs = self.interpreter.get_tensor(self._output["index"])
+
+        scale, zero_point = self._output["quantization"]
+        if scale:
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return outputs
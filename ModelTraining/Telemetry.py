@@ -0,0 +1,290 @@
+"""
+Metrics and structured logging for the model API.
+
+MetricsRegistry keeps counters and histograms in memory and renders them in
+the Prometheus text exposition format for ModelAPI.py's /metrics endpoint.
+Recording a value is a dictionary update under a lock, so instrumenting the
+request path costs microseconds. Values that other components already track
+(prediction cache counters, micro-batcher queue depth) are not duplicated:
+collector callbacks read them when /metrics is scraped.
+
+When ServeAPI.py runs several worker processes, each worker labels its
+series with worker="<n>" and periodically writes its rendered metrics to a
+shared directory; whichever worker is scraped merges the other workers'
+latest snapshots into its response, so one scrape covers the whole server.
+
+configure_logging sets up level-gated logging that writes one JSON object
+per line, with any `extra` fields included as keys.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans sub-millisecond decode up to multi-second volume requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonically increasing count, one series per label combination
+
+    Args:
+        name: Metric name, ending in _total by convention
+        documentation: HELP text
+        labelnames: Names of the labels every inc() call must supply
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Current (labels, value) pairs"""
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self, const_labels=()):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.samples()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key, const_labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, one series per label combination
+
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labelnames: Names of the labels every observe() call must supply
+        buckets: Increasing upper bounds; +Inf is added automatically
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # labels -> [per-bucket counts (non-cumulative), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        """Current (labels, (bucket counts, sum, count)) pairs"""
+        with self._lock:
+            return [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+
+    def render(self, const_labels=()):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in sorted(self.samples()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [*const_labels, ('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key, const_labels)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Owns the API's metrics and renders them for /metrics"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        # Set per worker process by ServeAPI.py (see start_snapshots)
+        self.const_labels = {}
+        self._snapshot_dir = None
+        self._snapshot_path = None
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """
+        Register a callback evaluated at scrape time
+
+        Args:
+            collect: Callable returning an iterable of
+                (name, type, documentation, [(labels dict, value), ...])
+        """
+        self._collectors.append(collect)
+
+    def render_local(self):
+        """Exposition text for this process only"""
+        const_labels = list(self.const_labels.items())
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(const_labels))
+        for collect in self._collectors:
+            for name, metric_type, documentation, samples in collect():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values(), const_labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def render(self):
+        """Exposition text for /metrics, including other workers' latest snapshots"""
+        local = self.render_local()
+        if self._snapshot_dir is None:
+            return local
+        texts = [local]
+        for entry in sorted(os.listdir(self._snapshot_dir)):
+            path = os.path.join(self._snapshot_dir, entry)
+            if entry.endswith('.prom') and path != self._snapshot_path:
+                try:
+                    with open(path) as snapshot:
+                        texts.append(snapshot.read())
+                except OSError:
+                    continue
+        return merge_expositions(texts)
+
+    def start_snapshots(self, directory, worker, interval=5.0):
+        """
+        Label this process's series with worker=<worker> and write them to
+        directory every `interval` seconds for the other workers to merge
+        """
+        self.const_labels = {'worker': str(worker)}
+        self._snapshot_dir = directory
+        self._snapshot_path = os.path.join(directory, f'worker-{worker}.prom')
+
+        def write_snapshots():
+            while True:
+                temp_path = f'{self._snapshot_path}.{os.getpid()}.tmp'
+                with open(temp_path, 'w') as snapshot:
+                    snapshot.write(self.render_local())
+                os.replace(temp_path, self._snapshot_path)
+                time.sleep(interval)
+
+        threading.Thread(target=write_snapshots, name='metrics-snapshots', daemon=True).start()
+
+
+def merge_expositions(texts):
+    """Merge Prometheus text expositions, grouping samples under one HELP/TYPE per family"""
+    families = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith('# HELP '):
+                name = line.split(' ', 3)[2]
+                family = families.setdefault(name, {'header': [], 'samples': []})
+                if not family['header']:
+                    family['header'].append(line)
+            elif line.startswith('# TYPE '):
+                if len(family['header']) == 1:
+                    family['header'].append(line)
+            elif line and family is not None:
+                family['samples'].append(line)
+    lines = []
+    for family in families.values():
+        lines.extend(family['header'])
+        lines.extend(family['samples'])
+    return '\n'.join(lines) + '\n'
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats a record as one JSON object, including fields passed via extra="""
+
+    _RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level='INFO', fmt='json', loggers=('ModelAPI',)):
+    """
+    Route logging to stderr, with the given level for the API's own loggers
+
+    Third-party loggers stay at WARNING so LOG_LEVEL=DEBUG does not also
+    turn on PIL/TensorFlow chatter.
+
+    Args:
+        level: Logging level name, e.g. 'DEBUG' or 'WARNING'
+        fmt: 'json' for one JSON object per line, 'text' for plain lines
+        loggers: Names of the loggers that get `level`
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == 'json':
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.WARNING)
+    for name in loggers:
+        logging.getLogger(name).setLevel(level.upper())
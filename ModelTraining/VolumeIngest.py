@@ -0,0 +1,203 @@
+"""
+Volume ingestion for the AMRI model: NIfTI volumes and DICOM series.
+
+The AMRI model classifies single 128x128 axial slices. A study is handled by
+picking evenly spaced axial slices from a configurable central band of the
+volume, reading only those slices from disk, and normalizing and resampling
+them together as one batch. ModelAPI.py then runs them through the model in
+one forward pass and aggregates the slice probabilities into a study result.
+
+NIfTI files are memory-mapped through nibabel's array proxy, so only the
+selected slices are ever read. DICOM series are read out of a .zip member by
+member: headers first (without pixel data) to order the slices, then pixel
+data for the selected slices only.
+
+nibabel and pydicom are optional; without them the corresponding formats
+raise VolumeFormatError.
+"""
+import os
+import zipfile
+
+import numpy as np
+import tensorflow as tf
+
+try:
+    import nibabel as nib
+except ImportError:
+    nib = None
+
+try:
+    import pydicom
+except ImportError:
+    pydicom = None
+
+VOLUME_EXTENSIONS = ('.nii', '.nii.gz', '.zip')
+
+
+class VolumeFormatError(ValueError):
+    """The upload is not a readable volume, or its reader is not installed"""
+
+
+def volume_extension(filename):
+    """Return the volume extension of filename ('.nii.gz' aware), or None"""
+    name = filename.lower()
+    for extension in VOLUME_EXTENSIONS:
+        if name.endswith(extension):
+            return extension
+    return None
+
+
+def select_slice_indices(depth, max_slices, band=(0.4, 0.6)):
+    """
+    Evenly spaced slice indices inside a central band of the volume
+
+    Args:
+        depth: Number of slices along the axial axis
+        max_slices: Upper bound on the number of indices returned
+        band: (low, high) fractions of the axial extent to sample from
+    """
+    low = int(np.floor(band[0] * (depth - 1)))
+    high = int(np.ceil(band[1] * (depth - 1)))
+    count = min(max_slices, high - low + 1)
+    return np.unique(np.linspace(low, high, count).round().astype(int))
+
+
+def slices_to_model_batch(slices, image_size=(128, 128)):
+    """
+    Normalize and resample a stack of 2D slices to the AMRI input format
+
+    Intensities are windowed to the 1st-99th percentile of the whole stack,
+    then all slices are resized together in one vectorized call.
+
+    Args:
+        slices: (S, H, W) array of raw intensities
+        image_size: Target (height, width)
+
+    Returns:
+        (S, height, width, 3) uint8 batch
+    """
+    slices = np.asarray(slices, dtype=np.float32)
+    low, high = np.percentile(slices, [1, 99])
+    scale = 255.0 / (high - low) if high > low else 0.0
+    normalized = np.clip((slices - low) * scale, 0, 255)
+
+    resized = tf.image.resize(normalized[..., np.newaxis], image_size, antialias=True).numpy()
+    batch = np.clip(np.rint(resized), 0, 255).astype(np.uint8)
+    return np.repeat(batch, 3, axis=-1)
+
+
+def read_nifti_slices(path, max_slices, band):
+    """
+    Read the selected axial slices of a NIfTI volume without loading it whole
+
+    Returns:
+        (slices, indices): (S, H, W) float32 array and the slice indices used
+    """
+    if nib is None:
+        raise VolumeFormatError("NIfTI support requires nibabel (pip install nibabel)")
+    try:
+        image = nib.load(path, mmap=True)
+    except Exception as e:
+        raise VolumeFormatError(f"Could not read NIfTI volume: {str(e)}")
+
+    shape = image.shape
+    if len(shape) < 3:
+        raise VolumeFormatError(f"Expected a 3D volume, got shape {shape}")
+
+    # Axial slices run along whichever voxel axis points superior/inferior
+    axcodes = nib.aff2axcodes(image.affine)
+    axial_axis = next((axis for axis, code in enumerate(axcodes[:3]) if code in ('S', 'I')), 2)
+    indices = select_slice_indices(shape[axial_axis], max_slices, band)
+
+    proxy = image.dataobj
+    slices = []
+    for index in indices:
+        selector = [slice(None)] * 3 + [0] * (len(shape) - 3)
+        selector[axial_axis] = int(index)
+        slices.append(np.asarray(proxy[tuple(selector)], dtype=np.float32))
+
+    # Voxel (i, j) is (left-right, posterior-anterior); rotate to display orientation
+    return np.rot90(np.stack(slices), axes=(1, 2)), indices
+
+
+def _slice_position(header):
+    """Position of a DICOM slice along its normal, falling back to InstanceNumber"""
+    position = getattr(header, 'ImagePositionPatient', None)
+    orientation = getattr(header, 'ImageOrientationPatient', None)
+    if position is not None and orientation is not None:
+        normal = np.cross(np.asarray(orientation[:3], dtype=float), np.asarray(orientation[3:], dtype=float))
+        return float(np.dot(normal, np.asarray(position, dtype=float)))
+    return float(getattr(header, 'InstanceNumber', 0) or 0)
+
+
+def read_dicom_series_slices(zip_file, max_slices, band):
+    """
+    Read the selected slices of a DICOM series stored in a .zip archive
+
+    Returns:
+        (slices, indices): (S, H, W) float32 array and the slice indices used
+    """
+    if pydicom is None:
+        raise VolumeFormatError("DICOM support requires pydicom (pip install pydicom)")
+    try:
+        archive = zipfile.ZipFile(zip_file)
+    except zipfile.BadZipFile as e:
+        raise VolumeFormatError(f"Invalid zip archive: {str(e)}")
+
+    with archive:
+        # Headers only: order the series without touching pixel data
+        positions = []
+        for member in archive.infolist():
+            if member.is_dir() or os.path.basename(member.filename).startswith('.') or '__MACOSX' in member.filename:
+                continue
+            with archive.open(member) as member_file:
+                try:
+                    header = pydicom.dcmread(member_file, stop_before_pixels=True)
+                except Exception:
+                    continue
+            if 'Rows' in header:
+                positions.append((_slice_position(header), member.filename))
+
+        if not positions:
+            raise VolumeFormatError("No DICOM images found in the archive")
+        positions.sort()
+        indices = select_slice_indices(len(positions), max_slices, band)
+
+        slices = []
+        for index in indices:
+            with archive.open(positions[index][1]) as member_file:
+                slices.append(dicom_pixels(member_file))
+
+    if len({slice_.shape for slice_ in slices}) > 1:
+        raise VolumeFormatError("DICOM series has slices of different sizes")
+    return np.stack(slices), indices
+
+
+def dicom_pixels(dicom_file):
+    """Pixel data of one DICOM image in modality units, as float32"""
+    if pydicom is None:
+        raise VolumeFormatError("DICOM support requires pydicom (pip install pydicom)")
+    try:
+        dataset = pydicom.dcmread(dicom_file)
+        pixels = dataset.pixel_array.astype(np.float32)
+    except Exception as e:
+        raise VolumeFormatError(f"Could not read DICOM image: {str(e)}")
+    if pixels.ndim == 3:
+        # Multi-frame or colour data: take the middle frame / first channel
+        pixels = pixels[pixels.shape[0] // 2] if pixels.shape[-1] not in (3, 4) else pixels[..., 0]
+    slope = float(getattr(dataset, 'RescaleSlope', 1) or 1)
+    intercept = float(getattr(dataset, 'RescaleIntercept', 0) or 0)
+    return pixels * slope + intercept
+
+
+def aggregate_slice_predictions(predictions):
+    """
+    Combine per-slice model outputs into a study-level prediction
+
+    Returns:
+        (study_predictions, votes): mean output over slices and the number of
+        slices whose top class is each label index
+    """
+    predictions = np.asarray(predictions)
+    votes = np.bincount(np.argmax(predictions, axis=1), minlength=predictions.shape[1])
+    return predictions.mean(axis=0), votes
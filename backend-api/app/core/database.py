@@ -1,15 +1,52 @@
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from typing import AsyncGenerator
 import os
 from .config import settings
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+def async_database_url(database_url: str):
+    url = make_url(database_url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    if url.drivername == "postgresql+asyncpg":
+        # SQLAlchemy's own cache of prepared statements per connection
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    return url
+def create_async_database_engine(database_url: str, **kwargs):
+    url = async_database_url(database_url)
+    options = {"echo": settings.ECHO_SQL, "pool_pre_ping": True}
+    if url.drivername == "postgresql+asyncpg":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            # asyncpg's statement cache; 0 is required behind pgbouncer in transaction mode
+            connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+        )
+    options.update(kwargs)
+    return create_async_engine(url, **options)
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.ECHO_SQL,
     pool_pre_ping=True,
-    pool_recycle=300,
+    pool_recycle=settings.DB_POOL_RECYCLE,
 )
+async_engine = create_async_database_engine(settings.DATABASE_URL)
+# Sessions opened outside a request, e.g. by background jobs (which run in worker threads)
+SessionLocal = sessionmaker(bind=engine, class_=Session)
+# Request sessions; objects stay usable after commit so handlers can return them
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+def async_dialect_name() -> str:
+    return AsyncSessionLocal.kw["bind"].dialect.name
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
-def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session:
         yield session
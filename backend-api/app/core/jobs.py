@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+import logging
+import os
+import threading
+import uuid
+from .config import settings
+logger = logging.getLogger(__name__)
+# name -> function; filled by the @job decorator in app.services
+JOB_HANDLERS: Dict[str, Callable[..., Any]] = {}
+def job(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def register(func: Callable[..., Any]) -> Callable[..., Any]:
+        JOB_HANDLERS[name] = func
+        return func
+    return register
+class InProcessJobQueue:
+    # Runs jobs on a thread pool inside the API process (local development and tests)
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._futures = set()
+        self._lock = threading.Lock()
+    def enqueue(self, name: str, *args: Any, job_id: Optional[str] = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        future = self._executor.submit(self._run, name, job_id, *args)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return job_id
+    def _run(self, name: str, job_id: str, *args: Any) -> Any:
+        try:
+            return JOB_HANDLERS[name](*args)
+        except Exception:
+            logger.exception("Job %s (%s) failed", name, job_id)
+            raise
+    def _discard(self, future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            pending = list(self._futures)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+class CeleryJobQueue:
+    # Sends jobs to Celery workers started with `celery -A app.worker worker`
+    def __init__(self, celery_app):
+        self.celery_app = celery_app
+    def enqueue(self, name: str, *args: Any, job_id: Optional[str] = None) -> str:
+        return self.celery_app.send_task(name, args=args, task_id=job_id or str(uuid.uuid4())).id
+def create_celery_app():
+    from celery import Celery
+    broker_url = settings.JOB_BROKER_URL or settings.REDIS_URL
+    celery_app = Celery("alzheimer_api", broker=broker_url)
+    celery_app.conf.update(
+        task_serializer="json",
+        accept_content=["json"],
+        task_acks_late=True,
+        worker_prefetch_multiplier=1,
+        task_ignore_result=True,
+    )
+    if broker_url.startswith("filesystem://"):
+        # Broker stand-in for machines without Redis: messages are files in JOB_BROKER_DIR
+        queue_dir = os.path.join(settings.JOB_BROKER_DIR, "queue")
+        processed_dir = os.path.join(settings.JOB_BROKER_DIR, "processed")
+        os.makedirs(queue_dir, exist_ok=True)
+        os.makedirs(processed_dir, exist_ok=True)
+        celery_app.conf.broker_transport_options = {
+            "data_folder_in": queue_dir,
+            "data_folder_out": queue_dir,
+            "processed_folder": processed_dir,
+        }
+    return celery_app
+_job_queue = None
+_job_queue_lock = threading.Lock()
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                if settings.JOB_BACKEND == "celery":
+                    _job_queue = CeleryJobQueue(create_celery_app())
+                elif settings.JOB_BACKEND == "inprocess":
+                    _job_queue = InProcessJobQueue(settings.JOB_WORKERS)
+                else:
+                    raise ValueError(f"Unknown JOB_BACKEND {settings.JOB_BACKEND!r}; expected 'inprocess' or 'celery'")
+    return _job_queue
@@ -1,5 +1,10 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import asyncio
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
@@ -14,10 +19,85 @@ class AuthError(HTTPException):
             detail=detail,
             headers={"WWW-Authenticate": "Bearer"}
         )
+class PasswordHasher:
+    # Runs bcrypt on a small thread pool (bcrypt releases the GIL) so a login never blocks
+    # the event loop. Requests beyond workers + max_pending are refused with 503 instead of
+    # queueing without bound.
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.capacity = workers + max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-in requests in progress, please retry",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+    async def run(self, func, *args):
+        self._acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._release()
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+    async def hash(self, password: str) -> str:
+        return await self.run(get_password_hash, password)
+class TokenCache:
+    # LRU of already-verified JWT payloads keyed by the raw token. Entries are dropped once
+    # the token's `exp` passes, so a cached token is never accepted longer than a decoded one.
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    def __len__(self) -> int:
+        return len(self._entries)
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return dict(payload)
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        expires_at = payload.get("exp")
+        if self.maxsize <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[token] = (float(expires_at), dict(payload))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.hash(password)
 def create_access_token(data: Dict[Any, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -28,11 +108,15 @@ def create_access_token(data: Dict[Any, Any], expires_delta: Optional[timedelta]
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 def verify_token(token: str) -> Dict[str, Any]:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         raise AuthError("Could not validate credentials")
+    token_cache.put(token, payload)
+    return payload
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     payload = verify_token(credentials.credentials)
     user_id = payload.get("sub")
@@ -5,6 +5,9 @@ from typing import Optional, List
 from datetime import datetime
 from enum import Enum
 import uuid
+# JSONB on Postgres; plain JSON elsewhere (the test suite runs on SQLite). None is stored as
+# SQL NULL rather than JSON 'null', so `IS NULL` / `IS NOT NULL` filters mean what they say.
+JSONType = JSONB(none_as_null=True).with_variant(sa.JSON(none_as_null=True), "sqlite")
 class UserRole(str, Enum):
     CLINICIAN = "clinician"
     ADMIN = "admin"
@@ -50,20 +53,41 @@ class MRIStudyBase(SQLModel):
     acquisition_date: Optional[datetime] = None
     scanner_type: Optional[str] = None
     study_description: Optional[str] = None
+# Per-patient history in time order (the timeline's keyset); also serves patient_id lookups
+def patient_history_index(table_name: str) -> sa.Index:
+    return sa.Index(f"ix_{table_name}_patient_id_created_at", "patient_id", "created_at", "id")
 class MRIStudy(MRIStudyBase, TimestampMixin, table=True):
+    __table_args__ = (patient_history_index("mristudy"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patient.id")
     file_path: str
     file_size: Optional[int] = None
+    file_sha256: Optional[str] = Field(default=None, index=True)
     processing_status: str = Field(default="pending")
+    processing_job_id: Optional[str] = None
+    processing_error: Optional[str] = None
+    processing_time_seconds: Optional[float] = None
+    processed_at: Optional[datetime] = None
+
+    # Natural key of rows loaded by a bulk import (e.g. the OASIS MRI ID); None for uploads
+    source_id: Optional[str] = Field(default=None, unique=True)
 
     # JSON fields (dict type + real JSONB column)
-    feature_vector: Optional[dict] = Field(default=None, sa_column=sa.Column(JSONB))
-    risk_explanation: Optional[dict] = Field(default=None, sa_column=sa.Column(JSONB))
+    feature_vector: Optional[dict] = Field(default=None, sa_column=sa.Column(JSONType))
+    risk_explanation: Optional[dict] = Field(default=None, sa_column=sa.Column(JSONType))
 
-    risk_score_mri: Optional[float] = None
+    risk_score_mri: Optional[float] = Field(default=None, index=True)
     patient: "Patient" = Relationship(back_populates="mri_studies")
     assessments: List["Assessment"] = Relationship(back_populates="mri_study")
+# Feature-store indexes (Postgres only): containment (`=` in cohort queries) uses the GIN
+# index, range filters on the most queried features use the expression indexes
+INDEXED_FEATURES = ("mmse", "cdr", "nwbv", "etiv", "mild_impairment_probability", "moderate_impairment_probability")
+sa.Index(
+    "ix_mristudy_feature_vector", MRIStudy.__table__.c.feature_vector,
+    postgresql_using="gin", postgresql_ops={"feature_vector": "jsonb_path_ops"}
+).ddl_if(dialect="postgresql")
+for _feature in INDEXED_FEATURES:
+    sa.Index(f"ix_mristudy_feature_{_feature}", MRIStudy.__table__.c.feature_vector[_feature].as_float()).ddl_if(dialect="postgresql")
 
 class MRIStudyCreate(MRIStudyBase):
     patient_id: int
@@ -73,6 +97,19 @@ class MRIStudyRead(MRIStudyBase):
     processing_status: str
     risk_score_mri: Optional[float] = None
     created_at: datetime
+class MRIUploadSession(MRIStudyBase, TimestampMixin, table=True):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    patient_id: int = Field(foreign_key="patient.id", index=True)
+    filename: str
+    file_size: int
+    sha256: Optional[str] = None
+    partial_path: str
+    deduplicated: bool = False
+    expires_at: datetime = Field(index=True)
+
+    # Sorted, merged [start, end) byte ranges written so far
+    received_ranges: Optional[list] = Field(default=None, sa_column=sa.Column(JSONType))
+
 class LifestyleAssessmentBase(SQLModel):
     age: int
     alcohol_consumption: Optional[str] = None
@@ -86,12 +123,14 @@ class LifestyleAssessmentBase(SQLModel):
     diabetes: Optional[bool] = None
     hypertension: Optional[bool] = None
 class LifestyleAssessment(LifestyleAssessmentBase, TimestampMixin, table=True):
+    __table_args__ = (patient_history_index("lifestyleassessment"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patient.id")
     risk_score_lifestyle: Optional[float] = None
+    source_id: Optional[str] = Field(default=None, unique=True)
 
     # JSON field
-    risk_factors: Optional[dict] = Field(default=None, sa_column=sa.Column(JSONB))
+    risk_factors: Optional[dict] = Field(default=None, sa_column=sa.Column(JSONType))
 
     patient: "Patient" = Relationship(back_populates="lifestyle_assessments")
     assessments: List["Assessment"] = Relationship(back_populates="lifestyle_assessment")
@@ -108,13 +147,20 @@ class AssessmentBase(SQLModel):
     notes: Optional[str] = None
 
 class Assessment(AssessmentBase, TimestampMixin, table=True):
+    __table_args__ = (patient_history_index("assessment"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patient.id")
-    clinician_id: int = Field(foreign_key="user.id")
-    mri_study_id: Optional[int] = Field(foreign_key="mristudy.id")
-    lifestyle_assessment_id: Optional[int] = Field(foreign_key="lifestyleassessment.id")
+    clinician_id: int = Field(foreign_key="user.id", index=True)
+    mri_study_id: Optional[int] = Field(foreign_key="mristudy.id", index=True)
+    lifestyle_assessment_id: Optional[int] = Field(foreign_key="lifestyleassessment.id", index=True)
     combined_risk_score: Optional[float] = None
     risk_level: Optional[RiskLevel] = None
+
+    # Input scores the stored combined score was computed from; kept current by
+    # app.services.combined_risk whenever either input is re-scored
+    mri_risk_score: Optional[float] = None
+    lifestyle_risk_score: Optional[float] = None
+    combined_risk_updated_at: Optional[datetime] = None
     recommendation: Optional[str] = None
     patient: Patient = Relationship(back_populates="assessments")
     clinician: User = Relationship(back_populates="assessments")
@@ -128,6 +174,20 @@ class AssessmentRead(AssessmentBase):
     id: int
     patient_id: int
     clinician_id: int
+    mri_study_id: Optional[int] = None
+    lifestyle_assessment_id: Optional[int] = None
     combined_risk_score: Optional[float] = None
     risk_level: Optional[RiskLevel] = None
+    mri_risk_score: Optional[float] = None
+    lifestyle_risk_score: Optional[float] = None
+    combined_risk_updated_at: Optional[datetime] = None
     created_at: datetime
+class AnalyticsAggregate(SQLModel, table=True):
+    # One counter of a precomputed dashboard aggregate (see app.services.analytics).
+    # `series` is the second dimension of a crosstab and "" otherwise.
+    metric: str = Field(primary_key=True)
+    bucket: str = Field(primary_key=True)
+    series: str = Field(default="", primary_key=True)
+    sort_key: float = 0.0
+    count: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
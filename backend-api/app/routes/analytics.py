@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+from app.core.database import get_session
+from app.core.security import get_current_user, get_current_clinician
+from app.core.jobs import get_job_queue
+from app.models import AnalyticsAggregate
+from app.services.analytics import ANALYTICS_METRICS, METRICS_BY_NAME, REBUILD_ANALYTICS_JOB, metric_payload, payload_etag
+router = APIRouter()
+class AnalyticsBin(BaseModel):
+    bucket: str
+    lower: Optional[float] = None
+    count: int
+class AnalyticsMetricResponse(BaseModel):
+    metric: str
+    kind: str
+    source: str
+    field: str
+    bin_width: Optional[float] = None
+    total: int
+    updated_at: Optional[datetime] = None
+    bins: Optional[List[AnalyticsBin]] = None
+    series_field: Optional[str] = None
+    rows: Optional[List[str]] = None
+    columns: Optional[List[str]] = None
+    counts: Optional[List[List[int]]] = None
+class AnalyticsIndexResponse(BaseModel):
+    metrics: List[str]
+class AnalyticsRebuildResponse(BaseModel):
+    job_id: str
+    status: str
+@router.get("", response_model=AnalyticsIndexResponse)
+async def list_analytics(current_user: Dict[str, Any] = Depends(get_current_user)):
+    
+    return AnalyticsIndexResponse(metrics=[metric.name for metric in ANALYTICS_METRICS])
+@router.post("/rebuild", response_model=AnalyticsRebuildResponse, status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_analytics(current_user: Dict[str, Any] = Depends(get_current_clinician)):
+    
+    job_id = get_job_queue().enqueue(REBUILD_ANALYTICS_JOB)
+    return AnalyticsRebuildResponse(job_id=job_id, status="queued")
+@router.get("/{metric_name}", response_model=AnalyticsMetricResponse)
+async def get_analytics_metric(
+    metric_name: str,
+    request: Request,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    # Reads only the metric's precomputed buckets; clients revalidate with If-None-Match
+    metric = METRICS_BY_NAME.get(metric_name)
+    if metric is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown analytics metric {metric_name}"
+        )
+    rows = (await session.exec(select(AnalyticsAggregate).where(AnalyticsAggregate.metric == metric.name))).all()
+    payload = jsonable_encoder(metric_payload(metric, rows))
+    etag = payload_etag(payload)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return payload
@@ -7,7 +7,7 @@ from pydantic import BaseModel, EmailStr
 from typing import Dict, Any
 from app.core.database import get_session
 from app.core.security import (
-    verify_password, 
+    verify_password_async,
     get_password_hash, 
     create_access_token,
     get_current_user,
@@ -41,17 +41,17 @@ MOCK_USERS = {
         "is_active": True
     }
 }
-def authenticate_user(email: str, password: str) -> Dict[str, Any] | None:
+async def authenticate_user(email: str, password: str) -> Dict[str, Any] | None:
     user = MOCK_USERS.get(email)
     if not user:
         return None
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["hashed_password"]):
         return None
     return user
 @router.post("/login", response_model=Token)
 async def login(login_data: LoginRequest):
     
-    user = authenticate_user(login_data.email, login_data.password)
+    user = await authenticate_user(login_data.email, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
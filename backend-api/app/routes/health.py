@@ -1,24 +1,59 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Response, status
 from pydantic import BaseModel
 from datetime import datetime
-from app.core.database import get_session
-from sqlmodel import Session, text
+from typing import Any, Dict, Optional
+import time
+from app.services.health_probe import get_health_prober
 router = APIRouter()
+STARTED_AT = time.monotonic()
 class HealthResponse(BaseModel):
     status: str
     timestamp: datetime
     database: str
     version: str
+class LivenessResponse(BaseModel):
+    status: str
+    uptime_seconds: float
+    prober_running: bool
+    last_probe_age_seconds: Optional[float] = None
+class ReadinessResponse(BaseModel):
+    status: str
+    timestamp: datetime
+    last_probe_age_seconds: Optional[float] = None
+    dependencies: Dict[str, Dict[str, Any]]
 @router.get("/health", response_model=HealthResponse)
-async def health_check(session: Session = Depends(get_session)):
-    try:
-        session.exec(text("SELECT 1"))
-        db_status = "connected"
-    except Exception:
-        db_status = "disconnected"
+async def health_check():
+    prober = get_health_prober()
+    database = (await prober.snapshot()).get("database")
+    db_status = "connected" if database is not None and database.healthy else "disconnected"
     return HealthResponse(
         status="healthy" if db_status == "connected" else "unhealthy",
         timestamp=datetime.utcnow(),
         database=db_status,
         version="1.0.0"
     )
+@router.get("/livez", response_model=LivenessResponse)
+async def liveness():
+    # Answers from memory only: the process is alive if it can serve this
+    prober = get_health_prober()
+    age = prober.age()
+    return LivenessResponse(
+        status="alive",
+        uptime_seconds=round(time.monotonic() - STARTED_AT, 1),
+        prober_running=prober.running,
+        last_probe_age_seconds=round(age, 1) if age is not None else None
+    )
+@router.get("/readyz", response_model=ReadinessResponse)
+async def readiness(response: Response):
+    prober = get_health_prober()
+    dependencies = await prober.snapshot()
+    ready = prober.ready()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    age = prober.age()
+    return ReadinessResponse(
+        status="ready" if ready else "not_ready",
+        timestamp=datetime.utcnow(),
+        last_probe_age_seconds=round(age, 1) if age is not None else None,
+        dependencies={name: dependency.to_dict() for name, dependency in dependencies.items()}
+    )
@@ -1,13 +1,19 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session
-from typing import Dict, Any, List
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
-import httpx
+from fastapi.concurrency import run_in_threadpool
+import numpy as np
+from collections import Counter
 from app.core.database import get_session
 from app.core.security import get_current_clinician
 from app.core.config import settings
-from app.models import LifestyleAssessmentCreate, LifestyleAssessmentRead
+from app.core.jobs import get_job_queue
+from app.models import Assessment, LifestyleAssessment, LifestyleAssessmentCreate, LifestyleAssessmentRead, MRIStudy
+from app.services.analytics import ASSESSMENT_SOURCE, apply_deltas_async, assessment_values, record_change
+from app.services.combined_risk import LIFESTYLE_WEIGHT, MRI_WEIGHT, apply_combined_risk, contributions
+from app.services.lifestyle_scoring import RESCORE_LIFESTYLE_JOB, score_lifestyle
 router = APIRouter()
 class LifestyleRiskResponse(BaseModel):
     assessment_id: int
@@ -23,7 +29,7 @@ class CombinedRiskRequest(BaseModel):
     mri_study_id: int
     lifestyle_assessment_id: int
     assessment_name: str
-    notes: str = None
+    notes: Optional[str] = None
 class CombinedRiskResponse(BaseModel):
     assessment_id: int
     patient_id: int
@@ -34,103 +40,35 @@ class CombinedRiskResponse(BaseModel):
     confidence_score: float
     explanation: Dict[str, Any]
     recommendations: List[str]
+class LifestyleBatchRequest(BaseModel):
+    assessments: List[LifestyleAssessmentCreate]
+class LifestyleBatchItem(BaseModel):
+    patient_id: int
+    risk_score_lifestyle: float
+    risk_level: str
+    risk_factors: Dict[str, Any]
+    protective_factors: List[str]
+    recommendations: List[str]
+    confidence_score: float
+class LifestyleBatchResponse(BaseModel):
+    count: int
+    risk_level_counts: Dict[str, int]
+    results: List[LifestyleBatchItem]
+class LifestyleRescoreResponse(BaseModel):
+    job_id: str
+    status: str
 def calculate_lifestyle_risk(assessment_data: LifestyleAssessmentCreate) -> Dict[str, Any]:
-    import random
-    random.seed(assessment_data.patient_id + assessment_data.age)
-    risk_factors = []
-    protective_factors = []
-    base_risk = 0.3
-    if assessment_data.age > 65:
-        risk_factors.append("Advanced age")
-        base_risk += 0.2
-    elif assessment_data.age > 75:
-        risk_factors.append("Very advanced age")
-        base_risk += 0.3
-    if assessment_data.alcohol_consumption in ["heavy"]:
-        risk_factors.append("Heavy alcohol consumption")
-        base_risk += 0.15
-    elif assessment_data.alcohol_consumption in ["light", "moderate"]:
-        protective_factors.append("Moderate alcohol consumption")
-        base_risk -= 0.05
-    if assessment_data.smoking_status == "current":
-        risk_factors.append("Current smoking")
-        base_risk += 0.2
-    elif assessment_data.smoking_status == "never":
-        protective_factors.append("Never smoked")
-        base_risk -= 0.1
-    if assessment_data.exercise_frequency in ["none", "light"]:
-        risk_factors.append("Insufficient physical activity")
-        base_risk += 0.1
-    elif assessment_data.exercise_frequency in ["moderate", "heavy"]:
-        protective_factors.append("Regular physical exercise")
-        base_risk -= 0.15
-    if assessment_data.diet_quality in ["poor", "fair"]:
-        risk_factors.append("Poor diet quality")
-        base_risk += 0.1
-    elif assessment_data.diet_quality in ["good", "excellent"]:
-        protective_factors.append("Healthy diet")
-        base_risk -= 0.1
-    if assessment_data.family_history_alzheimer:
-        risk_factors.append("Family history of Alzheimer's")
-        base_risk += 0.25
-    if assessment_data.cardiovascular_disease:
-        risk_factors.append("Cardiovascular disease")
-        base_risk += 0.15
-    if assessment_data.diabetes:
-        risk_factors.append("Diabetes")
-        base_risk += 0.1
-    if assessment_data.hypertension:
-        risk_factors.append("Hypertension")
-        base_risk += 0.08
-    if assessment_data.education_years and assessment_data.education_years >= 16:
-        protective_factors.append("Higher education")
-        base_risk -= 0.1
-    if assessment_data.sleep_hours:
-        if assessment_data.sleep_hours < 6 or assessment_data.sleep_hours > 9:
-            risk_factors.append("Poor sleep patterns")
-            base_risk += 0.05
-        else:
-            protective_factors.append("Adequate sleep")
-            base_risk -= 0.05
-    risk_score = max(0.05, min(0.95, base_risk))
-    if risk_score < 0.3:
-        risk_level = "low"
-    elif risk_score < 0.7:
-        risk_level = "moderate"
-    else:
-        risk_level = "high"
-    return {
-        "risk_score_lifestyle": round(risk_score, 2),
-        "risk_level": risk_level,
-        "risk_factors": {
-            "primary_factors": risk_factors[:3],
-            "all_factors": risk_factors,
-            "factor_weights": {factor: round(random.uniform(0.1, 0.3), 2) for factor in risk_factors}
-        },
-        "protective_factors": protective_factors,
-        "confidence_score": round(random.uniform(0.75, 0.92), 2)
-    }
+    return score_lifestyle([assessment_data]).result(0)
 @router.post("/assess", response_model=LifestyleRiskResponse)
 async def create_lifestyle_assessment(
     assessment: LifestyleAssessmentCreate,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     
     try:
         ml_results = calculate_lifestyle_risk(assessment)
         assessment_id = 67890
-        recommendations = []
-        if "Advanced age" in ml_results["risk_factors"]["all_factors"]:
-            recommendations.append("Regular cognitive assessment recommended")
-        if "Current smoking" in ml_results["risk_factors"]["all_factors"]:
-            recommendations.append("Smoking cessation programs available")
-        if "Insufficient physical activity" in ml_results["risk_factors"]["all_factors"]:
-            recommendations.append("Increase physical exercise to 150min/week")
-        if "Poor diet quality" in ml_results["risk_factors"]["all_factors"]:
-            recommendations.append("Consider Mediterranean diet consultation")
-        if not recommendations:
-            recommendations.append("Maintain current healthy lifestyle")
         return LifestyleRiskResponse(
             assessment_id=assessment_id,
             patient_id=assessment.patient_id,
@@ -138,7 +76,7 @@ async def create_lifestyle_assessment(
             risk_level=ml_results["risk_level"],
             risk_factors=ml_results["risk_factors"],
             protective_factors=ml_results["protective_factors"],
-            recommendations=recommendations,
+            recommendations=ml_results["recommendations"],
             confidence_score=ml_results["confidence_score"]
         )
     except Exception as e:
@@ -146,62 +84,116 @@ async def create_lifestyle_assessment(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Lifestyle assessment failed: {str(e)}"
         )
+@router.post("/assess/batch", response_model=LifestyleBatchResponse)
+async def create_lifestyle_assessment_batch(
+    request: LifestyleBatchRequest,
+    current_user: Dict[str, Any] = Depends(get_current_clinician)
+):
+    
+    if len(request.assessments) > settings.LIFESTYLE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.LIFESTYLE_BATCH_MAX_SIZE} assessments per batch"
+        )
+    scores = await run_in_threadpool(score_lifestyle, request.assessments)
+    levels, counts = np.unique(scores.levels, return_counts=True)
+    return LifestyleBatchResponse(
+        count=len(scores),
+        risk_level_counts={str(level): int(count) for level, count in zip(levels, counts)},
+        results=[
+            LifestyleBatchItem(patient_id=assessment.patient_id, **scores.result(i))
+            for i, assessment in enumerate(request.assessments)
+        ]
+    )
+@router.post("/rescore", response_model=LifestyleRescoreResponse, status_code=status.HTTP_202_ACCEPTED)
+async def rescore_lifestyle_assessments(
+    current_user: Dict[str, Any] = Depends(get_current_clinician)
+):
+    
+    job_id = get_job_queue().enqueue(RESCORE_LIFESTYLE_JOB)
+    return LifestyleRescoreResponse(job_id=job_id, status="queued")
+def combined_risk_response(assessment: Assessment) -> CombinedRiskResponse:
+    risk_level = assessment.risk_level.value if assessment.risk_level else "unknown"
+    contribution = contributions(assessment)
+    return CombinedRiskResponse(
+        assessment_id=assessment.id,
+        patient_id=assessment.patient_id,
+        combined_risk_score=assessment.combined_risk_score if assessment.combined_risk_score is not None else 0.0,
+        risk_level=risk_level,
+        mri_contribution=contribution["mri"],
+        lifestyle_contribution=contribution["lifestyle"],
+        confidence_score=0.85,
+        explanation={
+            "method": "Weighted ensemble of MRI and lifestyle risk scores",
+            "mri_weight": MRI_WEIGHT,
+            "lifestyle_weight": LIFESTYLE_WEIGHT,
+            "mri_risk": assessment.mri_risk_score,
+            "lifestyle_risk": assessment.lifestyle_risk_score,
+            "computed_at": assessment.combined_risk_updated_at.isoformat() if assessment.combined_risk_updated_at else None,
+            "interpretation": f"Combined risk indicates {risk_level} probability of cognitive decline"
+        },
+        recommendations=[
+            "Regular follow-up recommended",
+            "Consider cognitive training exercises",
+            "Monitor lifestyle factors closely"
+        ] if risk_level != "low" else [
+            "Continue current preventive measures",
+            "Annual cognitive assessment"
+        ]
+    )
 @router.post("/combined-risk", response_model=CombinedRiskResponse)
 async def calculate_combined_risk(
     request: CombinedRiskRequest,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     
-    try:
-        mri_risk = 0.65
-        lifestyle_risk = 0.55
-        mri_weight = 0.6
-        lifestyle_weight = 0.4
-        combined_risk = (mri_risk * mri_weight) + (lifestyle_risk * lifestyle_weight)
-        combined_risk = round(combined_risk, 2)
-        if combined_risk < 0.3:
-            risk_level = "low"
-        elif combined_risk < 0.7:
-            risk_level = "moderate"  
-        else:
-            risk_level = "high"
-        assessment_id = 98765
-        return CombinedRiskResponse(
-            assessment_id=assessment_id,
-            patient_id=request.patient_id,
-            combined_risk_score=combined_risk,
-            risk_level=risk_level,
-            mri_contribution=mri_risk * mri_weight,
-            lifestyle_contribution=lifestyle_risk * lifestyle_weight,
-            confidence_score=0.85,
-            explanation={
-                "method": "Weighted ensemble of MRI and lifestyle risk scores",
-                "mri_weight": mri_weight,
-                "lifestyle_weight": lifestyle_weight,
-                "mri_risk": mri_risk,
-                "lifestyle_risk": lifestyle_risk,
-                "interpretation": f"Combined risk indicates {risk_level} probability of cognitive decline"
-            },
-            recommendations=[
-                "Regular follow-up recommended",
-                "Consider cognitive training exercises",
-                "Monitor lifestyle factors closely"
-            ] if risk_level != "low" else [
-                "Continue current preventive measures",
-                "Annual cognitive assessment"
-            ]
+    mri_study = await session.get(MRIStudy, request.mri_study_id)
+    lifestyle_assessment = await session.get(LifestyleAssessment, request.lifestyle_assessment_id)
+    if mri_study is None or lifestyle_assessment is None:
+        missing = f"MRI study {request.mri_study_id}" if mri_study is None else f"Lifestyle assessment {request.lifestyle_assessment_id}"
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{missing} not found"
         )
-    except Exception as e:
+    if mri_study.patient_id != request.patient_id or lifestyle_assessment.patient_id != request.patient_id:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Combined risk calculation failed: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"MRI study and lifestyle assessment must both belong to patient {request.patient_id}"
+        )
+    assessment = Assessment(
+        assessment_name=request.assessment_name,
+        notes=request.notes,
+        patient_id=request.patient_id,
+        clinician_id=int(current_user["sub"]),
+        mri_study_id=mri_study.id,
+        lifestyle_assessment_id=lifestyle_assessment.id
+    )
+    apply_combined_risk(assessment, mri_study.risk_score_mri, lifestyle_assessment.risk_score_lifestyle)
+    session.add(assessment)
+    await apply_deltas_async(session, record_change(Counter(), ASSESSMENT_SOURCE, None, assessment_values(assessment.risk_level)))
+    await session.commit()
+    await session.refresh(assessment)
+    return combined_risk_response(assessment)
+@router.get("/combined-risk/{assessment_id}", response_model=CombinedRiskResponse)
+async def get_combined_risk(
+    assessment_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    assessment = await session.get(Assessment, assessment_id)
+    if assessment is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Assessment {assessment_id} not found"
         )
+    return combined_risk_response(assessment)
 @router.get("/assessment/{assessment_id}", response_model=LifestyleAssessmentRead)
 async def get_lifestyle_assessment(
     assessment_id: int,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     
     return LifestyleAssessmentRead(
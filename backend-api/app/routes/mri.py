@@ -1,22 +1,87 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlmodel import Session
-from typing import Dict, Any, Optional
-from pydantic import BaseModel
-import os
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field, ValidationError
+import asyncio
 import uuid
-from datetime import datetime
-import httpx
-from app.core.database import get_session
+import contextlib
+from collections import Counter
+import json
+import os
+from datetime import datetime, timedelta
+from sqlmodel import select
+from app.core.database import get_session, AsyncSessionLocal, async_dialect_name
 from app.core.security import get_current_clinician
 from app.core.config import settings
-from app.models import MRIStudyCreate, MRIStudyRead, PatientRead
+from app.core.jobs import get_job_queue
+from app.models import MRIStudy, MRIStudyCreate, MRIStudyRead, MRIUploadSession, Patient, PatientRead
+from app.services.mri_processing import IN_FLIGHT_STATUSES, PROCESS_MRI_STUDY_JOB, mri_file_extension, processing_is_stale
+from app.services.analytics import MRI_SOURCE, apply_deltas_async, record_change
+from app.services.blob_store import find_blob, incoming_dir, store_blob
+from app.services.feature_store import CohortQueryError, cohort_select
+from app.services.uploads import (
+    contiguous_offset, discard_upload, merge_range, missing_ranges, sha256_file,
+    stream_multipart_upload, write_stream_at
+)
 router = APIRouter()
+TERMINAL_PROCESSING_STATUSES = ("completed", "failed")
 class MRIUploadResponse(BaseModel):
     study_id: int
     message: str
     file_info: Dict[str, Any]
     processing_status: str
+    job_id: Optional[str] = None
+class CohortQueryRequest(BaseModel):
+    where: str = Field(max_length=4000)
+    fields: Optional[List[str]] = None
+    after_id: int = 0
+    limit: Optional[int] = Field(default=None, ge=1)
+class MRIUploadForm(BaseModel):
+    patient_id: int
+    study_name: str
+    acquisition_date: Optional[datetime] = None
+    scanner_type: Optional[str] = None
+    study_description: Optional[str] = None
+# The body is parsed by stream_multipart_upload, so describe the form for the docs by hand
+UPLOAD_REQUEST_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["patient_id", "study_name", "file"],
+                    "properties": {
+                        "patient_id": {"type": "integer"},
+                        "study_name": {"type": "string"},
+                        "acquisition_date": {"type": "string", "format": "date-time"},
+                        "scanner_type": {"type": "string"},
+                        "study_description": {"type": "string"},
+                        "file": {"type": "string", "format": "binary"}
+                    }
+                }
+            }
+        }
+    }
+}
+class MRIUploadSessionCreate(MRIUploadForm):
+    filename: str
+    file_size: int
+    sha256: Optional[str] = None
+class MRIUploadSessionStatus(BaseModel):
+    upload_id: str
+    filename: str
+    file_size: int
+    offset: int
+    received_bytes: int
+    missing_ranges: List[List[int]]
+    chunk_size: int
+    expires_at: datetime
+class MRIUploadFinalizeRequest(BaseModel):
+    sha256: Optional[str] = None
 class MRIFeatureResponse(BaseModel):
     study_id: int
     feature_vector: Dict[str, float]
@@ -26,121 +91,452 @@ class MRIFeatureResponse(BaseModel):
 class MRIProcessingRequest(BaseModel):
     study_id: int
     processing_options: Optional[Dict[str, Any]] = None
-def get_mock_mri_results(study_id: int) -> Dict[str, Any]:
-    import random
-    random.seed(study_id)
-    return {
-        "study_id": study_id,
-        "feature_vector": {
-            "hippocampal_volume": round(random.uniform(3000, 4500), 2),
-            "cortical_thickness": round(random.uniform(2.1, 3.2), 3),
-            "white_matter_volume": round(random.uniform(450000, 520000), 2),
-            "ventricle_size": round(random.uniform(15000, 35000), 2),
-            "amyloid_burden": round(random.uniform(0.1, 0.8), 3),
-            "tau_distribution": round(random.uniform(0.05, 0.6), 3),
-            "brain_atrophy_rate": round(random.uniform(0.5, 2.1), 3),
-            "default_mode_network": round(random.uniform(0.3, 0.9), 3)
-        },
-        "risk_score_mri": round(random.uniform(0.1, 0.9), 2),
-        "risk_explanation": {
-            "high_risk_features": [
-                "Reduced hippocampal volume",
-                "Increased ventricle size"
-            ] if random.random() > 0.5 else [
-                "Cortical thinning detected",
-                "White matter changes"
-            ],
-            "protective_features": [
-                "Preserved default mode network",
-                "Normal tau distribution"
-            ] if random.random() > 0.5 else [
-                "Minimal brain atrophy",
-                "Low amyloid burden"
-            ],
-            "confidence_score": round(random.uniform(0.7, 0.95), 2),
-            "recommendations": "Consider follow-up scan in 6-12 months"
+class MRIJobStatus(BaseModel):
+    study_id: int
+    job_id: Optional[str] = None
+    processing_status: str
+    error: Optional[str] = None
+    risk_score_mri: Optional[float] = None
+    updated_at: Optional[datetime] = None
+def job_status(study: MRIStudy) -> MRIJobStatus:
+    return MRIJobStatus(
+        study_id=study.id,
+        job_id=study.processing_job_id,
+        processing_status=study.processing_status,
+        error=study.processing_error,
+        risk_score_mri=study.risk_score_mri,
+        updated_at=study.updated_at or study.created_at
+    )
+async def get_study_or_404(study_id: int, session: AsyncSession) -> MRIStudy:
+    study = await session.get(MRIStudy, study_id)
+    if study is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"MRI study {study_id} not found"
+        )
+    return study
+async def enqueue_processing(study: MRIStudy, session: AsyncSession) -> str:
+    job_id = str(uuid.uuid4())
+    study.processing_status = "queued"
+    study.processing_job_id = job_id
+    study.processing_error = None
+    study.updated_at = datetime.utcnow()
+    session.add(study)
+    await session.commit()
+    await session.refresh(study)
+    get_job_queue().enqueue(PROCESS_MRI_STUDY_JOB, study.id, job_id=job_id)
+    return job_id
+async def register_uploaded_study(
+    form: MRIUploadForm,
+    session: AsyncSession,
+    file_path: str,
+    original_filename: str,
+    file_size: int,
+    sha256: str,
+    deduplicated: bool = False
+) -> MRIUploadResponse:
+    study = MRIStudy(
+        patient_id=form.patient_id,
+        study_name=form.study_name,
+        acquisition_date=form.acquisition_date,
+        scanner_type=form.scanner_type,
+        study_description=form.study_description,
+        file_path=file_path,
+        file_size=file_size,
+        file_sha256=sha256
+    )
+    # Model output depends only on the file, so an earlier study of the same bytes answers this one
+    processed = (await session.exec(
+        select(MRIStudy)
+        .where(MRIStudy.file_sha256 == sha256, MRIStudy.processing_status == "completed")
+        .order_by(MRIStudy.processed_at.desc())
+    )).first()
+    if processed is not None:
+        study.processing_status = "completed"
+        study.feature_vector = processed.feature_vector
+        study.risk_score_mri = processed.risk_score_mri
+        study.risk_explanation = processed.risk_explanation
+        study.processing_time_seconds = 0.0
+        study.processed_at = datetime.utcnow()
+        await apply_deltas_async(session, record_change(Counter(), MRI_SOURCE, None, study.feature_vector))
+    session.add(study)
+    await session.commit()
+    await session.refresh(study)
+    if processed is not None:
+        job_id = None
+        message = f"MRI file already processed as study {processed.id}; results reused"
+    else:
+        job_id = await enqueue_processing(study, session)
+        message = "MRI file uploaded successfully, processing queued"
+    return MRIUploadResponse(
+        study_id=study.id,
+        message=message,
+        file_info={
+            "original_filename": original_filename,
+            "stored_filename": os.path.relpath(file_path, settings.UPLOAD_DIR),
+            "file_size": file_size,
+            "file_type": mri_file_extension(original_filename),
+            "sha256": sha256,
+            "deduplicated": deduplicated,
+            "upload_timestamp": study.created_at.isoformat()
         },
-        "processing_time_seconds": round(random.uniform(45.5, 120.3), 1)
-    }
-@router.post("/upload", response_model=MRIUploadResponse)
+        processing_status=study.processing_status,
+        job_id=job_id
+    )
+@router.post("/upload", response_model=MRIUploadResponse, openapi_extra=UPLOAD_REQUEST_SCHEMA)
 async def upload_mri_file(
-    patient_id: int = Form(...),
-    study_name: str = Form(...),
-    acquisition_date: Optional[str] = Form(None),
-    scanner_type: Optional[str] = Form(None),
-    study_description: Optional[str] = Form(None),
-    file: UploadFile = File(...),
+    request: Request,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    upload = await stream_multipart_upload(request, settings.ALLOWED_MRI_EXTENSIONS, upload_dir=incoming_dir())
+    try:
+        form = MRIUploadForm(**upload.fields)
+    except ValidationError as e:
+        await discard_upload(upload)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors(include_url=False))
+    if await session.get(Patient, form.patient_id) is None:
+        await discard_upload(upload)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Patient {form.patient_id} not found"
+        )
+    file_path, deduplicated = await run_in_threadpool(
+        store_blob, upload.file_path, upload.sha256, mri_file_extension(upload.original_filename)
+    )
+    return await register_uploaded_study(
+        form, session,
+        file_path=file_path,
+        original_filename=upload.original_filename,
+        file_size=upload.file_size,
+        sha256=upload.sha256,
+        deduplicated=deduplicated
+    )
+def upload_session_status(upload_session: MRIUploadSession) -> MRIUploadSessionStatus:
+    ranges = upload_session.received_ranges or []
+    return MRIUploadSessionStatus(
+        upload_id=upload_session.id,
+        filename=upload_session.filename,
+        file_size=upload_session.file_size,
+        offset=contiguous_offset(ranges),
+        received_bytes=sum(end - start for start, end in ranges),
+        missing_ranges=missing_ranges(ranges, upload_session.file_size),
+        chunk_size=settings.UPLOAD_SESSION_CHUNK_SIZE,
+        expires_at=upload_session.expires_at
+    )
+async def delete_upload_session(upload_session: MRIUploadSession, session: AsyncSession) -> None:
+    if not upload_session.deduplicated:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(upload_session.partial_path)
+    await session.delete(upload_session)
+    await session.commit()
+async def purge_expired_upload_sessions(session: AsyncSession) -> int:
+    expired = (await session.exec(select(MRIUploadSession).where(MRIUploadSession.expires_at < datetime.utcnow()))).all()
+    for upload_session in expired:
+        await delete_upload_session(upload_session, session)
+    return len(expired)
+async def get_upload_session_or_404(upload_id: str, session: AsyncSession) -> MRIUploadSession:
+    upload_session = await session.get(MRIUploadSession, upload_id)
+    if upload_session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session {upload_id} not found"
+        )
+    if upload_session.expires_at < datetime.utcnow():
+        await delete_upload_session(upload_session, session)
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Upload session {upload_id} has expired"
+        )
+    return upload_session
+@router.post("/uploads", response_model=MRIUploadSessionStatus, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    request: MRIUploadSessionCreate,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    file_ext = mri_file_extension(request.filename)
     if file_ext not in settings.ALLOWED_MRI_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File type {file_ext} not allowed. Supported: {settings.ALLOWED_MRI_EXTENSIONS}"
         )
-    if file.size > settings.MAX_FILE_SIZE:
+    if request.file_size <= 0 or request.file_size > settings.MAX_FILE_SIZE:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE // (1024*1024)}MB"
+            detail=f"File size must be between 1 byte and {settings.MAX_FILE_SIZE // (1024*1024)}MB"
         )
-    file_id = str(uuid.uuid4())
-    filename = f"{file_id}_{file.filename}"
-    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    study_id = 12345
-    return MRIUploadResponse(
-        study_id=study_id,
-        message="MRI file uploaded successfully",
-        file_info={
-            "original_filename": file.filename,
-            "stored_filename": filename,
-            "file_size": file.size,
-            "file_type": file_ext,
-            "upload_timestamp": datetime.utcnow().isoformat()
-        },
-        processing_status="uploaded"
+    if await session.get(Patient, request.patient_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Patient {request.patient_id} not found"
+        )
+    await purge_expired_upload_sessions(session)
+    upload_id = str(uuid.uuid4())
+    sha256 = request.sha256.lower() if request.sha256 else None
+    existing_blob = None
+    if sha256 and (await session.exec(
+        select(MRIStudy.id).where(MRIStudy.patient_id == request.patient_id, MRIStudy.file_sha256 == sha256).limit(1)
+    )).first() is not None:
+        # Only a scan this patient already has can be attached by hash alone: knowing a hash
+        # must not be enough to copy another patient's scan. Anything else sends the bytes and
+        # is deduplicated once the server has hashed them at completion.
+        existing_blob = find_blob(sha256, file_ext)
+    if existing_blob is not None and os.path.getsize(existing_blob) == request.file_size:
+        # Already stored: nothing to send, the session can be completed straight away
+        partial_path, received_ranges = existing_blob, [[0, request.file_size]]
+    else:
+        existing_blob = None
+        sessions_dir = os.path.join(settings.UPLOAD_DIR, "sessions")
+        os.makedirs(sessions_dir, exist_ok=True)
+        partial_path = os.path.join(sessions_dir, f"{upload_id}.part")
+        received_ranges = []
+        # Sized up front so chunks can be written at their offsets in any order
+        with open(partial_path, "wb") as partial_file:
+            partial_file.truncate(request.file_size)
+    upload_session = MRIUploadSession(
+        id=upload_id,
+        patient_id=request.patient_id,
+        study_name=request.study_name,
+        acquisition_date=request.acquisition_date,
+        scanner_type=request.scanner_type,
+        study_description=request.study_description,
+        filename=os.path.basename(request.filename.replace("\\", "/")),
+        file_size=request.file_size,
+        sha256=sha256,
+        partial_path=partial_path,
+        deduplicated=existing_blob is not None,
+        expires_at=datetime.utcnow() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS),
+        received_ranges=received_ranges
     )
-@router.post("/process", response_model=MRIFeatureResponse)
+    session.add(upload_session)
+    await session.commit()
+    await session.refresh(upload_session)
+    return upload_session_status(upload_session)
+@router.get("/uploads/{upload_id}", response_model=MRIUploadSessionStatus)
+async def get_upload_session(
+    upload_id: str,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    result = upload_session_status(await get_upload_session_or_404(upload_id, session))
+    response.headers["Upload-Offset"] = str(result.offset)
+    return result
+@router.patch("/uploads/{upload_id}", response_model=MRIUploadSessionStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    upload_session = await get_upload_session_or_404(upload_id, session)
+    if upload_session.deduplicated:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This file is already stored; complete the upload without sending chunks"
+        )
+    if upload_offset < 0 or upload_offset >= upload_session.file_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Upload-Offset must be between 0 and {upload_session.file_size - 1}"
+        )
+    written = await write_stream_at(request, upload_session.partial_path, upload_offset, upload_session.file_size - upload_offset)
+    if written:
+        # Row lock so parallel chunks of the same session do not lose each other's ranges
+        await session.refresh(upload_session, with_for_update=True)
+        upload_session.received_ranges = merge_range(upload_session.received_ranges, upload_offset, upload_offset + written)
+        upload_session.updated_at = datetime.utcnow()
+        session.add(upload_session)
+        await session.commit()
+        await session.refresh(upload_session)
+    result = upload_session_status(upload_session)
+    response.headers["Upload-Offset"] = str(result.offset)
+    return result
+@router.post("/uploads/{upload_id}/complete", response_model=MRIUploadResponse)
+async def complete_upload_session(
+    upload_id: str,
+    request: Optional[MRIUploadFinalizeRequest] = None,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    upload_session = await get_upload_session_or_404(upload_id, session)
+    await session.refresh(upload_session, with_for_update=True)
+    missing = missing_ranges(upload_session.received_ranges, upload_session.file_size)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload is incomplete; missing byte ranges {missing}"
+        )
+    expected_sha256 = (request.sha256 if request and request.sha256 else upload_session.sha256 or "").lower()
+    if not expected_sha256:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="A sha256 checksum is required to finalize an upload"
+        )
+    file_ext = mri_file_extension(upload_session.filename)
+    if upload_session.deduplicated:
+        # The blob's name is the hash it was verified against when first stored
+        sha256 = upload_session.sha256
+        file_path = find_blob(sha256, file_ext)
+        if file_path is None:
+            await delete_upload_session(upload_session, session)
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="The stored copy of this file was removed; start a new upload"
+            )
+    else:
+        sha256 = await run_in_threadpool(sha256_file, upload_session.partial_path)
+    if sha256 != expected_sha256:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Checksum mismatch: expected {expected_sha256}, received data hashes to {sha256}"
+        )
+    deduplicated = upload_session.deduplicated
+    if not deduplicated:
+        # Same filesystem as the session file, so this is a rename rather than a copy
+        file_path, deduplicated = await run_in_threadpool(store_blob, upload_session.partial_path, sha256, file_ext)
+    form = MRIUploadForm(
+        patient_id=upload_session.patient_id,
+        study_name=upload_session.study_name,
+        acquisition_date=upload_session.acquisition_date,
+        scanner_type=upload_session.scanner_type,
+        study_description=upload_session.study_description
+    )
+    file_size = upload_session.file_size
+    original_filename = upload_session.filename
+    await session.delete(upload_session)
+    await session.commit()
+    return await register_uploaded_study(
+        form, session,
+        file_path=file_path,
+        original_filename=original_filename,
+        file_size=file_size,
+        sha256=sha256,
+        deduplicated=deduplicated
+    )
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload_session(
+    upload_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    await delete_upload_session(await get_upload_session_or_404(upload_id, session), session)
+@router.post("/process", response_model=MRIJobStatus, status_code=status.HTTP_202_ACCEPTED)
 async def process_mri_study(
     request: MRIProcessingRequest,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
+):
+    
+    study = await get_study_or_404(request.study_id, session)
+    # A study stuck in flight past the stale timeout lost its job (e.g. a worker died) and is
+    # queued again; otherwise an in-flight study is left alone
+    if study.processing_status not in IN_FLIGHT_STATUSES or processing_is_stale(study):
+        await enqueue_processing(study, session)
+    return job_status(study)
+@router.get("/study/{study_id}/status", response_model=MRIJobStatus)
+async def get_mri_processing_status(
+    study_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    return job_status(await get_study_or_404(study_id, session))
+async def read_job_status(study_id: int) -> Optional[MRIJobStatus]:
+    async with AsyncSessionLocal() as session:
+        study = await session.get(MRIStudy, study_id)
+        return job_status(study) if study is not None else None
+@router.get("/study/{study_id}/events")
+async def stream_mri_processing_status(
+    study_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_clinician)
 ):
     
+    # Each poll opens its own short session so the stream does not pin a pooled connection
+    if await read_job_status(study_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"MRI study {study_id} not found"
+        )
+    async def events():
+        last_event = None
+        while True:
+            current = await read_job_status(study_id)
+            if current is None:
+                yield 'event: error\ndata: {"detail": "MRI study deleted"}\n\n'
+                return
+            event = current.model_dump_json()
+            if event != last_event:
+                yield f"event: status\ndata: {event}\n\n"
+                last_event = event
+            if current.processing_status in TERMINAL_PROCESSING_STATUSES:
+                return
+            await asyncio.sleep(settings.JOB_STATUS_POLL_SECONDS)
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+@router.post("/cohort")
+async def query_mri_cohort(
+    request: CohortQueryRequest,
+    current_user: Dict[str, Any] = Depends(get_current_clinician)
+):
+    
+    # Streams matching studies as NDJSON in id order; pass the last id back as after_id to resume
     try:
-        ml_results = get_mock_mri_results(request.study_id)
-        return MRIFeatureResponse(**ml_results)
-    except Exception as e:
+        query = cohort_select(request.where, async_dialect_name(), request.after_id, request.limit)
+    except CohortQueryError as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"MRI processing failed: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
+    fields = set(request.fields) if request.fields is not None else None
+    async def rows():
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=settings.COHORT_STREAM_BATCH_SIZE))
+            async for partition in result.partitions():
+                yield "".join(
+                    json.dumps({
+                        "study_id": study_id,
+                        "patient_id": patient_id,
+                        "risk_score_mri": risk_score_mri,
+                        "features": features if fields is None else {k: v for k, v in features.items() if k in fields}
+                    }) + "\n"
+                    for study_id, patient_id, risk_score_mri, features in partition
+                    if features is not None
+                )
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
 @router.get("/study/{study_id}/features", response_model=MRIFeatureResponse)
 async def get_mri_features(
     study_id: int,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     
-    mock_results = get_mock_mri_results(study_id)
-    return MRIFeatureResponse(**mock_results)
+    study = await get_study_or_404(study_id, session)
+    if study.processing_status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"MRI study {study_id} is {study.processing_status}; features are available once processing completes"
+        )
+    return MRIFeatureResponse(
+        study_id=study.id,
+        feature_vector=study.feature_vector,
+        risk_score_mri=study.risk_score_mri,
+        risk_explanation=study.risk_explanation,
+        processing_time_seconds=study.processing_time_seconds
+    )
 @router.get("/study/{study_id}", response_model=MRIStudyRead)
 async def get_mri_study(
     study_id: int,
     current_user: Dict[str, Any] = Depends(get_current_clinician),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     
-    return MRIStudyRead(
-        id=study_id,
-        patient_id=1001,
-        study_name=f"MRI Study {study_id}",
-        acquisition_date=datetime.utcnow(),
-        scanner_type="Siemens Prisma 3T",
-        study_description="T1-weighted structural MRI",
-        processing_status="completed",
-        risk_score_mri=0.65,
-        created_at=datetime.utcnow()
-    )
+    return await get_study_or_404(study_id, session)
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+from app.core.database import get_session
+from app.core.security import get_current_clinician
+from app.core.config import settings
+from app.models import Patient, RiskLevel
+from app.services.patient_timeline import InvalidCursor, TimelineCursor, timeline_page
+router = APIRouter()
+class TimelineEvent(BaseModel):
+    type: str
+    id: int
+    occurred_at: datetime
+    title: str
+    status: Optional[str] = None
+    risk_score: Optional[float] = None
+    risk_level: Optional[RiskLevel] = None
+class TimelineResponse(BaseModel):
+    patient_id: int
+    items: List[TimelineEvent]
+    next_cursor: Optional[str] = None
+@router.get("/{patient_id}/timeline", response_model=TimelineResponse)
+async def get_patient_timeline(
+    patient_id: int,
+    limit: int = Query(default=50, ge=1),
+    cursor: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(get_current_clinician),
+    session: AsyncSession = Depends(get_session)
+):
+    
+    if await session.get(Patient, patient_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Patient {patient_id} not found"
+        )
+    try:
+        after = TimelineCursor.decode(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    items, next_cursor = await timeline_page(session, patient_id, min(limit, settings.TIMELINE_MAX_PAGE_SIZE), after)
+    return TimelineResponse(
+        patient_id=patient_id,
+        items=items,
+        next_cursor=next_cursor.encode() if next_cursor else None
+    )
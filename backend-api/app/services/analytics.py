@@ -0,0 +1,158 @@
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import math
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from app.core.database import SessionLocal
+from app.core.jobs import job
+from app.models import AnalyticsAggregate, Assessment, LifestyleAssessment, MRIStudy
+logger = logging.getLogger(__name__)
+REBUILD_ANALYTICS_JOB = "analytics.rebuild"
+# Every change to a source row turns into +1/-1 deltas on the buckets its old and new values
+# fall in, applied in the same transaction as the change. A rebuild recomputes everything
+# from the source tables (after bulk imports, or to repair drift).
+MRI_SOURCE = "mri_study"
+LIFESTYLE_SOURCE = "lifestyle_assessment"
+ASSESSMENT_SOURCE = "assessment"
+Bucket = Tuple[str, str, float]
+Deltas = Counter
+@dataclass(frozen=True)
+class AnalyticsMetric:
+    name: str
+    kind: str
+    source: str
+    field: str
+    width: Optional[float] = None
+    series_field: Optional[str] = None
+    # Display order of categories; others sort after these, by label
+    order: Tuple[str, ...] = ()
+    def buckets(self, values: Optional[Dict[str, Any]]) -> List[Bucket]:
+        if not values or values.get(self.field) is None:
+            return []
+        value = values[self.field]
+        series = ""
+        if self.series_field is not None:
+            if values.get(self.series_field) is None:
+                return []
+            series = _label(values[self.series_field])
+        if self.width is None:
+            label = _label(value)
+            if label in self.order:
+                return [(label, series, float(self.order.index(label)))]
+            return [(label, series, float(value) if isinstance(value, (int, float)) else float(len(self.order)))]
+        # The epsilon keeps values sitting on a bin edge (0.72 / 0.02) in the upper bin
+        lower = math.floor(float(value) / self.width + 1e-9) * self.width
+        return [(f"{_label(lower)}-{_label(lower + self.width)}", series, lower)]
+def _label(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{round(value, 6):g}"
+    return str(value.value if hasattr(value, "value") else value)
+ANALYTICS_METRICS: Tuple[AnalyticsMetric, ...] = (
+    AnalyticsMetric("age_distribution", "histogram", LIFESTYLE_SOURCE, "age", width=5),
+    AnalyticsMetric("mmse_distribution", "histogram", MRI_SOURCE, "mmse", width=2),
+    AnalyticsMetric("nwbv_distribution", "histogram", MRI_SOURCE, "nwbv", width=0.02),
+    AnalyticsMetric("etiv_distribution", "histogram", MRI_SOURCE, "etiv", width=100),
+    AnalyticsMetric("cdr_distribution", "categories", MRI_SOURCE, "cdr"),
+    AnalyticsMetric("risk_level_counts", "categories", ASSESSMENT_SOURCE, "risk_level", order=("low", "moderate", "high")),
+    AnalyticsMetric("age_band_by_cdr", "crosstab", MRI_SOURCE, "age", width=10, series_field="cdr"),
+)
+METRICS_BY_NAME = {metric.name: metric for metric in ANALYTICS_METRICS}
+def record_change(
+    deltas: Deltas,
+    source: str,
+    old_values: Optional[Dict[str, Any]],
+    new_values: Optional[Dict[str, Any]]
+) -> Deltas:
+    for metric in ANALYTICS_METRICS:
+        if metric.source != source:
+            continue
+        for bucket in metric.buckets(old_values):
+            deltas[(metric.name, *bucket)] -= 1
+        for bucket in metric.buckets(new_values):
+            deltas[(metric.name, *bucket)] += 1
+    return deltas
+def _upsert_statement(dialect: str):
+    table = AnalyticsAggregate.__table__
+    insert = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+    return insert.on_conflict_do_update(
+        index_elements=[table.c.metric, table.c.bucket, table.c.series],
+        set_={"count": table.c.count + insert.excluded.count, "updated_at": insert.excluded.updated_at}
+    )
+def _delta_rows(deltas: Deltas) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return [
+        {"metric": metric, "bucket": bucket, "series": series, "sort_key": sort_key, "count": change, "updated_at": now}
+        for (metric, bucket, series, sort_key), change in deltas.items()
+        if change
+    ]
+def apply_deltas(session: Session, deltas: Deltas) -> None:
+    rows = _delta_rows(deltas)
+    if rows:
+        session.execute(_upsert_statement(session.get_bind().dialect.name), rows)
+async def apply_deltas_async(session, deltas: Deltas) -> None:
+    rows = _delta_rows(deltas)
+    if rows:
+        await session.exec(_upsert_statement(session.bind.dialect.name), params=rows)
+def assessment_values(risk_level: Any) -> Optional[Dict[str, Any]]:
+    return None if risk_level is None else {"risk_level": risk_level}
+def lifestyle_values(age: Optional[int]) -> Optional[Dict[str, Any]]:
+    return None if age is None else {"age": age}
+SOURCE_QUERIES = (
+    (MRI_SOURCE, select(MRIStudy.feature_vector).where(MRIStudy.feature_vector.is_not(None)), lambda features: features),
+    (LIFESTYLE_SOURCE, select(LifestyleAssessment.age), lifestyle_values),
+    (ASSESSMENT_SOURCE, select(Assessment.risk_level).where(Assessment.risk_level.is_not(None)), assessment_values),
+)
+def rebuild_analytics(session: Session, batch_size: int = 10_000) -> int:
+    # One streaming pass per source table; the caller commits
+    deltas: Deltas = Counter()
+    for source, query, values in SOURCE_QUERIES:
+        for row in session.exec(query.execution_options(yield_per=batch_size)):
+            record_change(deltas, source, None, values(row))
+    session.execute(delete(AnalyticsAggregate))
+    apply_deltas(session, deltas)
+    logger.info("Rebuilt %d analytics buckets", len(deltas))
+    return len(deltas)
+@job(REBUILD_ANALYTICS_JOB)
+def rebuild_analytics_job() -> Dict[str, int]:
+    with SessionLocal() as session:
+        buckets = rebuild_analytics(session)
+        session.commit()
+    return {"buckets": buckets}
+def _sort_value(label: str) -> Any:
+    try:
+        return (0, float(label), label)
+    except ValueError:
+        return (1, 0.0, label)
+def metric_payload(metric: AnalyticsMetric, rows: Iterable[AnalyticsAggregate]) -> Dict[str, Any]:
+    rows = sorted((row for row in rows if row.count > 0), key=lambda row: (row.sort_key, row.bucket, _sort_value(row.series)))
+    payload: Dict[str, Any] = {
+        "metric": metric.name,
+        "kind": metric.kind,
+        "source": metric.source,
+        "field": metric.field,
+        "bin_width": metric.width,
+        "total": sum(row.count for row in rows),
+        "updated_at": max((row.updated_at for row in rows), default=None),
+    }
+    if metric.kind != "crosstab":
+        payload["bins"] = [{"bucket": row.bucket, "lower": row.sort_key if metric.width else None, "count": row.count} for row in rows]
+        return payload
+    bands = list(dict.fromkeys(row.bucket for row in rows))
+    series = sorted({row.series for row in rows}, key=_sort_value)
+    counts = {(row.bucket, row.series): row.count for row in rows}
+    payload.update(
+        series_field=metric.series_field,
+        rows=bands,
+        columns=series,
+        counts=[[counts.get((band, column), 0) for column in series] for band in bands]
+    )
+    return payload
+def payload_etag(payload: Dict[str, Any]) -> str:
+    body = json.dumps(payload, sort_keys=True, default=str).encode()
+    return f'W/"{hashlib.sha1(body).hexdigest()}"'
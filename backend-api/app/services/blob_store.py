@@ -0,0 +1,105 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.jobs import get_job_queue, job
+from app.models import MRIStudy, MRIUploadSession
+logger = logging.getLogger(__name__)
+GC_BLOBS_JOB = "storage.gc_blobs"
+HEX_DIGITS = frozenset("0123456789abcdef")
+# MRI files live once per content hash: UPLOAD_DIR/blobs/ab/cd/abcd...<ext>. The extension is
+# part of the key because the model service picks its decoder from it.
+def blob_root() -> str:
+    return os.path.join(settings.UPLOAD_DIR, "blobs")
+def incoming_dir() -> str:
+    return os.path.join(settings.UPLOAD_DIR, "incoming")
+def blob_path(sha256: str, file_ext: str) -> str:
+    return os.path.join(blob_root(), sha256[:2], sha256[2:4], sha256 + file_ext)
+def find_blob(sha256: str, file_ext: str) -> Optional[str]:
+    path = blob_path(sha256, file_ext)
+    if not os.path.exists(path):
+        return None
+    # Touch it so the collector's grace period covers the reference about to be written
+    os.utime(path)
+    return path
+def store_blob(source_path: str, sha256: str, file_ext: str) -> Tuple[str, bool]:
+    # Moves a verified file into the store; returns (blob path, whether it was a duplicate)
+    existing = find_blob(sha256, file_ext)
+    if existing is not None:
+        os.remove(source_path)
+        return existing, True
+    path = blob_path(sha256, file_ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(source_path, path)
+    return path, False
+def blob_hash(filename: str) -> Optional[str]:
+    # Inverse of blob_path: the content hash a stored file is named after
+    sha256 = filename[:64]
+    return sha256 if len(sha256) == 64 and all(c in HEX_DIGITS for c in sha256) else None
+def blob_reference_counts(session: Session) -> Dict[str, int]:
+    # Keyed by content hash rather than path, so references survive UPLOAD_DIR being
+    # spelled differently (relative/absolute, symlinked, remounted) from when they were written
+    counts: Dict[str, int] = dict(session.exec(
+        select(MRIStudy.file_sha256, func.count())
+        .where(MRIStudy.file_sha256.is_not(None))
+        .group_by(MRIStudy.file_sha256)
+    ).all())
+    # Sessions that deduplicated against a blob point at it until they complete
+    for sha256 in session.exec(select(MRIUploadSession.sha256).where(MRIUploadSession.deduplicated)).all():
+        counts[sha256] = counts.get(sha256, 0) + 1
+    return counts
+def collect_garbage(session: Session, grace_seconds: Optional[float] = None) -> Dict[str, int]:
+    # Removes blobs no MRIStudy references and abandoned incoming files. Anything modified
+    # within the grace period is kept: it may belong to an upload whose row is not written yet.
+    grace_seconds = settings.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    references = blob_reference_counts(session)
+    stats = {"blobs_kept": 0, "blobs_removed": 0, "incoming_removed": 0, "bytes_freed": 0}
+    for directory, _, filenames in os.walk(blob_root()):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            sha256 = blob_hash(filename)
+            # Files not named after a hash are not ours to remove
+            if sha256 is None or references.get(sha256, 0) > 0:
+                stats["blobs_kept"] += 1
+                continue
+            try:
+                file_stat = os.stat(path)
+                if file_stat.st_mtime > cutoff:
+                    stats["blobs_kept"] += 1
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            stats["blobs_removed"] += 1
+            stats["bytes_freed"] += file_stat.st_size
+    if os.path.isdir(incoming_dir()):
+        for filename in os.listdir(incoming_dir()):
+            path = os.path.join(incoming_dir(), filename)
+            try:
+                file_stat = os.stat(path)
+                if file_stat.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            stats["incoming_removed"] += 1
+            stats["bytes_freed"] += file_stat.st_size
+    logger.info("Blob garbage collection: %s", stats)
+    return stats
+@job(GC_BLOBS_JOB)
+def gc_blobs() -> Dict[str, int]:
+    with SessionLocal() as session:
+        return collect_garbage(session)
+async def schedule_blob_gc(interval_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            get_job_queue().enqueue(GC_BLOBS_JOB)
+        except Exception:
+            logger.exception("Could not enqueue blob garbage collection")
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+from collections import Counter
+from app.models import Assessment, LifestyleAssessment, MRIStudy, RiskLevel
+from app.services.analytics import ASSESSMENT_SOURCE, apply_deltas, assessment_values, record_change
+logger = logging.getLogger(__name__)
+MRI_WEIGHT = 0.6
+LIFESTYLE_WEIGHT = 0.4
+def risk_level_for(score: float) -> RiskLevel:
+    if score < 0.3:
+        return RiskLevel.LOW
+    if score < 0.7:
+        return RiskLevel.MODERATE
+    return RiskLevel.HIGH
+def combine_risk(mri_risk: Optional[float], lifestyle_risk: Optional[float]) -> Tuple[Optional[float], Optional[RiskLevel]]:
+    # Weighted mean of whichever scores are available; None until at least one is
+    parts = [(score, weight) for score, weight in ((mri_risk, MRI_WEIGHT), (lifestyle_risk, LIFESTYLE_WEIGHT)) if score is not None]
+    if not parts:
+        return None, None
+    combined = round(sum(score * weight for score, weight in parts) / sum(weight for _, weight in parts), 2)
+    return combined, risk_level_for(combined)
+def contributions(assessment: Assessment) -> Dict[str, float]:
+    # Share of the stored combined score that came from each input, from the stored snapshot
+    available = [(name, score, weight) for name, score, weight in (
+        ("mri", assessment.mri_risk_score, MRI_WEIGHT),
+        ("lifestyle", assessment.lifestyle_risk_score, LIFESTYLE_WEIGHT)
+    ) if score is not None]
+    total_weight = sum(weight for _, _, weight in available) or 1.0
+    result = {"mri": 0.0, "lifestyle": 0.0}
+    for name, score, weight in available:
+        result[name] = round(score * weight / total_weight, 4)
+    return result
+def apply_combined_risk(assessment: Assessment, mri_risk: Optional[float], lifestyle_risk: Optional[float]) -> None:
+    assessment.mri_risk_score = mri_risk
+    assessment.lifestyle_risk_score = lifestyle_risk
+    assessment.combined_risk_score, assessment.risk_level = combine_risk(mri_risk, lifestyle_risk)
+    assessment.combined_risk_updated_at = datetime.utcnow()
+def refresh_combined_risk(
+    session: Session,
+    mri_study_ids: Iterable[int] = (),
+    lifestyle_assessment_ids: Iterable[int] = ()
+) -> int:
+    # Recomputes only the assessments that use one of the given inputs. The caller commits.
+    mri_study_ids, lifestyle_assessment_ids = list(mri_study_ids), list(lifestyle_assessment_ids)
+    filters = []
+    if mri_study_ids:
+        filters.append(Assessment.mri_study_id.in_(mri_study_ids))
+    if lifestyle_assessment_ids:
+        filters.append(Assessment.lifestyle_assessment_id.in_(lifestyle_assessment_ids))
+    if not filters:
+        return 0
+    rows = session.exec(
+        select(
+            Assessment.id,
+            Assessment.risk_level,
+            MRIStudy.risk_score_mri,
+            LifestyleAssessment.risk_score_lifestyle
+        )
+        .outerjoin(MRIStudy, MRIStudy.id == Assessment.mri_study_id)
+        .outerjoin(LifestyleAssessment, LifestyleAssessment.id == Assessment.lifestyle_assessment_id)
+        .where(or_(*filters))
+    ).all()
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    updates, deltas = [], Counter()
+    for assessment_id, previous_level, mri_risk, lifestyle_risk in rows:
+        combined, level = combine_risk(mri_risk, lifestyle_risk)
+        record_change(deltas, ASSESSMENT_SOURCE, assessment_values(previous_level), assessment_values(level))
+        updates.append({
+            "id": assessment_id,
+            "mri_risk_score": mri_risk,
+            "lifestyle_risk_score": lifestyle_risk,
+            "combined_risk_score": combined,
+            "risk_level": level,
+            "combined_risk_updated_at": now,
+            "updated_at": now
+        })
+    session.execute(update(Assessment), updates)
+    apply_deltas(session, deltas)
+    logger.info("Recomputed combined risk for %d assessments", len(updates))
+    return len(updates)
@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple, Union
+import re
+import sqlalchemy as sa
+from app.models import MRIStudy
+# Cohort filters over MRI feature vectors, e.g.
+#   nwbv < 0.7 AND (cdr >= 0.5 OR explanation.primary_finding = 'Mild Impairment')
+# A bare name is a key of MRIStudy.feature_vector, `explanation.<key>` a key of
+# risk_explanation, and the names below are real columns. Expressions are compiled to
+# SQLAlchemy clauses, so every value reaches the database as a bound parameter.
+COLUMN_FIELDS = {
+    "risk_score_mri": MRIStudy.risk_score_mri,
+    "patient_id": MRIStudy.patient_id,
+    "processing_status": MRIStudy.processing_status,
+}
+COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+KEY_PATTERN = re.compile(r"[a-z_][a-z0-9_]*\Z")
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | '(?P<string>(?:[^']|'')*)'
+      | (?P<op><=|>=|!=|=|<|>)
+      | (?P<paren>[()])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_.]*)
+    )""", re.VERBOSE)
+class CohortQueryError(ValueError):
+    pass
+@dataclass
+class Token:
+    kind: str
+    value: Union[str, float]
+    position: int
+def tokenize(expression: str) -> List[Token]:
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise CohortQueryError(f"Unexpected character at position {position}: {expression[position]!r}")
+        kind = match.lastgroup
+        value, start = match.group(kind), match.start(kind)
+        if kind == "number":
+            value = float(value)
+        elif kind == "string":
+            value = value.replace("''", "'")
+        elif kind == "word" and value.upper() in ("AND", "OR", "NOT", "IS", "NULL", "TRUE", "FALSE"):
+            kind, value = "keyword", value.upper()
+        tokens.append(Token(kind, value, start))
+        position = match.end()
+    return tokens
+def check_feature_key(key: str) -> str:
+    if not KEY_PATTERN.match(key):
+        raise CohortQueryError(f"Invalid feature name {key!r}")
+    return key
+def feature_value(column, key: str, dialect: str, as_type: str = "float"):
+    # The JSON path is rendered inline on Postgres so the expression matches the
+    # expression indexes declared in app.models
+    check_feature_key(key)
+    path = sa.literal(key, literal_execute=True) if dialect == "postgresql" else key
+    element = column[path]
+    return {"float": element.as_float, "string": element.as_string, "boolean": element.as_boolean}[as_type]()
+class CohortQueryCompiler:
+    # Recursive-descent parser: or_expr := and_expr (OR and_expr)*,
+    # and_expr := factor (AND factor)*, factor := NOT factor | ( or_expr ) | comparison
+    def __init__(self, expression: str, dialect: str):
+        self.tokens = tokenize(expression)
+        self.dialect = dialect
+        self.index = 0
+    def compile(self):
+        if not self.tokens:
+            raise CohortQueryError("Empty cohort query")
+        clause = self._or()
+        if self.index < len(self.tokens):
+            self._fail("Unexpected")
+        return clause
+    def _peek(self) -> Optional[Token]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+    def _next(self) -> Token:
+        token = self._peek()
+        if token is None:
+            raise CohortQueryError("Unexpected end of cohort query")
+        self.index += 1
+        return token
+    def _accept(self, kind: str, value: Any = None) -> bool:
+        token = self._peek()
+        if token is not None and token.kind == kind and (value is None or token.value == value):
+            self.index += 1
+            return True
+        return False
+    def _fail(self, message: str):
+        token = self._peek()
+        if token is None:
+            raise CohortQueryError(f"{message} end of cohort query")
+        raise CohortQueryError(f"{message} {token.value!r} at position {token.position}")
+    def _or(self):
+        clauses = [self._and()]
+        while self._accept("keyword", "OR"):
+            clauses.append(self._and())
+        return clauses[0] if len(clauses) == 1 else sa.or_(*clauses)
+    def _and(self):
+        clauses = [self._factor()]
+        while self._accept("keyword", "AND"):
+            clauses.append(self._factor())
+        return clauses[0] if len(clauses) == 1 else sa.and_(*clauses)
+    def _factor(self):
+        if self._accept("keyword", "NOT"):
+            return sa.not_(self._factor())
+        if self._accept("paren", "("):
+            clause = self._or()
+            if not self._accept("paren", ")"):
+                self._fail("Expected ')' before")
+            return clause
+        return self._comparison()
+    def _value(self) -> Tuple[Any, str]:
+        token = self._next()
+        if token.kind == "number":
+            return token.value, "float"
+        if token.kind == "string":
+            return token.value, "string"
+        if token.kind == "keyword" and token.value in ("TRUE", "FALSE"):
+            return token.value == "TRUE", "boolean"
+        self.index -= 1
+        self._fail("Expected a value, got")
+    def _field(self, name: str, as_type: str):
+        if name in COLUMN_FIELDS:
+            return COLUMN_FIELDS[name]
+        column, key = MRIStudy.feature_vector, name
+        if name.startswith("explanation."):
+            column, key = MRIStudy.risk_explanation, name[len("explanation."):]
+        return feature_value(column, key, self.dialect, as_type)
+    def _comparison(self):
+        token = self._next()
+        if token.kind != "word":
+            self.index -= 1
+            self._fail("Expected a feature name, got")
+        if self._accept("keyword", "IS"):
+            negate = self._accept("keyword", "NOT")
+            if not self._accept("keyword", "NULL"):
+                self._fail("Expected NULL, got")
+            field = self._field(token.value, "string")
+            return field.is_not(None) if negate else field.is_(None)
+        op = self._next()
+        if op.kind != "op":
+            self.index -= 1
+            self._fail("Expected a comparison operator, got")
+        value, as_type = self._value()
+        if as_type != "float" and op.value not in ("=", "!="):
+            raise CohortQueryError(f"Operator {op.value} needs a number at position {op.position}")
+        if self.dialect == "postgresql" and op.value == "=" and token.value not in COLUMN_FIELDS and "." not in token.value:
+            # Equality on the feature vector is a containment test, served by the GIN index
+            return MRIStudy.feature_vector.contains({check_feature_key(token.value): value})
+        return COMPARISONS[op.value](self._field(token.value, as_type), value)
+def compile_cohort_query(expression: str, dialect: str):
+    return CohortQueryCompiler(expression, dialect).compile()
+def cohort_select(expression: str, dialect: str, after_id: int = 0, limit: Optional[int] = None):
+    query = (
+        sa.select(MRIStudy.id, MRIStudy.patient_id, MRIStudy.risk_score_mri, MRIStudy.feature_vector)
+        .where(MRIStudy.feature_vector.is_not(None), MRIStudy.id > after_id, compile_cohort_query(expression, dialect))
+        .order_by(MRIStudy.id)
+    )
+    return query.limit(limit) if limit else query
@@ -0,0 +1,145 @@
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import time
+import httpx
+import redis.asyncio as redis
+from sqlmodel import text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+logger = logging.getLogger(__name__)
+Probe = Callable[[], Awaitable[Dict[str, Any]]]
+@dataclass
+class DependencyStatus:
+    name: str
+    healthy: bool
+    required: bool
+    latency_ms: Optional[float] = None
+    checked_at: Optional[datetime] = None
+    error: Optional[str] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+async def probe_database() -> Dict[str, Any]:
+    async with AsyncSessionLocal() as session:
+        await session.exec(text("SELECT 1"))
+    return {}
+def model_service_probe(url: str) -> Probe:
+    async def probe() -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=settings.HEALTH_PROBE_TIMEOUT) as client:
+            response = await client.get(url.rstrip("/") + "/ready")
+        detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+        warm = bool(detail.get("ready", response.status_code == 200))
+        if not warm:
+            raise RuntimeError(f"model service not warm (HTTP {response.status_code})")
+        return {"url": url, "warm": warm, **detail}
+    return probe
+def redis_probe(url: str) -> Probe:
+    async def probe() -> Dict[str, Any]:
+        client = redis.from_url(url, socket_connect_timeout=settings.HEALTH_PROBE_TIMEOUT)
+        try:
+            await client.ping()
+        finally:
+            await client.aclose()
+        return {}
+    return probe
+def default_probes() -> Dict[str, Probe]:
+    probes: Dict[str, Probe] = {"database": probe_database}
+    services = {"mri_model_service": settings.MRI_PROCESSING_SERVICE_URL}
+    if settings.LIFESTYLE_MODEL_SERVICE_URL != settings.MRI_PROCESSING_SERVICE_URL:
+        services["lifestyle_model_service"] = settings.LIFESTYLE_MODEL_SERVICE_URL
+    for name, url in services.items():
+        probes[name] = model_service_probe(url)
+    probes["redis"] = redis_probe(settings.REDIS_URL)
+    return probes
+class HealthProber:
+    # Checks every dependency on an interval in the background and keeps the latest result,
+    # so liveness/readiness requests only read memory
+    def __init__(self, probes: Dict[str, Probe], required: List[str], interval: float, timeout: float):
+        self.probes = probes
+        self.required = set(required)
+        self.interval = interval
+        self.timeout = timeout
+        self.results: Dict[str, DependencyStatus] = {}
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inline_run: Optional[asyncio.Lock] = None
+    async def _check(self, name: str, probe: Probe) -> DependencyStatus:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(probe(), timeout=self.timeout)
+            healthy, error = True, None
+        except Exception as e:
+            detail, healthy, error = {}, False, str(e) or type(e).__name__
+        return DependencyStatus(
+            name=name,
+            healthy=healthy,
+            required=name in self.required,
+            latency_ms=round((time.perf_counter() - started) * 1000, 2),
+            checked_at=datetime.utcnow(),
+            error=error,
+            detail=detail
+        )
+    async def run_once(self) -> Dict[str, DependencyStatus]:
+        statuses = await asyncio.gather(*(self._check(name, probe) for name, probe in self.probes.items()))
+        for dependency in statuses:
+            previous = self.results.get(dependency.name)
+            if previous is not None and previous.healthy != dependency.healthy:
+                log = logger.info if dependency.healthy else logger.warning
+                log("Dependency %s is now %s: %s", dependency.name,
+                    "healthy" if dependency.healthy else "unhealthy", dependency.error or "ok")
+        self.results = {dependency.name: dependency for dependency in statuses}
+        self.last_run = time.monotonic()
+        return self.results
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Health probe round failed")
+    def start(self) -> None:
+        # Call run_once() first; the loop waits one interval before its first round
+        if not self.running:
+            self._task = asyncio.create_task(self._loop())
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    def age(self) -> Optional[float]:
+        return None if self.last_run is None else time.monotonic() - self.last_run
+    async def snapshot(self) -> Dict[str, DependencyStatus]:
+        # With the background task running this only reads the cache. A process that never
+        # started it (scripts, tests) probes inline, at most once per staleness window.
+        if not self.running and not self.fresh():
+            if self._inline_run is None:
+                self._inline_run = asyncio.Lock()
+            async with self._inline_run:
+                if not self.fresh():
+                    await self.run_once()
+        return self.results
+    def fresh(self) -> bool:
+        age = self.age()
+        return age is not None and age <= max(settings.HEALTH_STALE_AFTER_SECONDS, 2 * self.interval)
+    def ready(self) -> bool:
+        return self.fresh() and all(name in self.results and self.results[name].healthy for name in self.required)
+_prober: Optional[HealthProber] = None
+def get_health_prober() -> HealthProber:
+    global _prober
+    if _prober is None:
+        _prober = HealthProber(
+            default_probes(),
+            required=settings.HEALTH_REQUIRED_DEPENDENCIES,
+            interval=settings.HEALTH_PROBE_INTERVAL_SECONDS,
+            timeout=settings.HEALTH_PROBE_TIMEOUT
+        )
+    return _prober
@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+import logging
+import numpy as np
+from sqlalchemy import update
+from sqlmodel import select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.jobs import job
+from app.models import LifestyleAssessment
+from app.services.combined_risk import refresh_combined_risk
+logger = logging.getLogger(__name__)
+RESCORE_LIFESTYLE_JOB = "lifestyle.rescore_all"
+BASE_RISK = 0.3
+MIN_RISK, MAX_RISK = 0.05, 0.95
+RISK_LEVEL_THRESHOLDS = (0.3, 0.7)
+RISK_LEVELS = np.array(["low", "moderate", "high"])
+@dataclass(frozen=True)
+class LifestyleRule:
+    # One row of the scoring table: when `column` matches, `weight` is added to the base risk.
+    # Negative weights are protective factors.
+    factor: str
+    weight: float
+    column: str
+    op: str
+    value: Any = None
+    recommendation: Optional[str] = None
+    @property
+    def protective(self) -> bool:
+        return self.weight < 0
+# Order matters: risk factors are listed in this order and the first three are "primary"
+LIFESTYLE_RULES: Tuple[LifestyleRule, ...] = (
+    LifestyleRule("Advanced age", 0.20, "age", "gt", 65, "Regular cognitive assessment recommended"),
+    LifestyleRule("Heavy alcohol consumption", 0.15, "alcohol_consumption", "in", ("heavy",)),
+    LifestyleRule("Moderate alcohol consumption", -0.05, "alcohol_consumption", "in", ("light", "moderate")),
+    LifestyleRule("Current smoking", 0.20, "smoking_status", "in", ("current",), "Smoking cessation programs available"),
+    LifestyleRule("Never smoked", -0.10, "smoking_status", "in", ("never",)),
+    LifestyleRule("Insufficient physical activity", 0.10, "exercise_frequency", "in", ("none", "light"),
+                  "Increase physical exercise to 150min/week"),
+    LifestyleRule("Regular physical exercise", -0.15, "exercise_frequency", "in", ("moderate", "heavy")),
+    LifestyleRule("Poor diet quality", 0.10, "diet_quality", "in", ("poor", "fair"), "Consider Mediterranean diet consultation"),
+    LifestyleRule("Healthy diet", -0.10, "diet_quality", "in", ("good", "excellent")),
+    LifestyleRule("Family history of Alzheimer's", 0.25, "family_history_alzheimer", "true"),
+    LifestyleRule("Cardiovascular disease", 0.15, "cardiovascular_disease", "true"),
+    LifestyleRule("Diabetes", 0.10, "diabetes", "true"),
+    LifestyleRule("Hypertension", 0.08, "hypertension", "true"),
+    LifestyleRule("Higher education", -0.10, "education_years", "ge", 16),
+    LifestyleRule("Poor sleep patterns", 0.05, "sleep_hours", "outside", (6, 9)),
+    LifestyleRule("Adequate sleep", -0.05, "sleep_hours", "between", (6, 9)),
+)
+DEFAULT_RECOMMENDATION = "Maintain current healthy lifestyle"
+NUMERIC_COLUMNS = ("age", "sleep_hours", "education_years")
+CATEGORICAL_COLUMNS = ("alcohol_consumption", "smoking_status", "exercise_frequency", "diet_quality")
+BOOLEAN_COLUMNS = ("family_history_alzheimer", "cardiovascular_disease", "diabetes", "hypertension")
+# Optional answers; confidence grows with how many of them were given
+COMPLETENESS_COLUMNS = NUMERIC_COLUMNS[1:] + CATEGORICAL_COLUMNS + BOOLEAN_COLUMNS
+def _field(record: Any, name: str) -> Any:
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+def columns_from_records(records: Sequence[Any]) -> Dict[str, np.ndarray]:
+    # Column arrays for a cohort: NaN for missing numbers, "" for missing categories
+    columns = {}
+    for name in NUMERIC_COLUMNS:
+        columns[name] = np.array([_field(r, name) for r in records], dtype=float)
+    for name in CATEGORICAL_COLUMNS:
+        columns[name] = np.array([_field(r, name) or "" for r in records], dtype=str)
+    for name in BOOLEAN_COLUMNS:
+        values = [_field(r, name) for r in records]
+        columns[name] = np.array([bool(v) for v in values], dtype=bool)
+        columns[name + "__present"] = np.array([v is not None for v in values], dtype=bool)
+    return columns
+def _rule_mask(rule: LifestyleRule, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    column = columns[rule.column]
+    with np.errstate(invalid="ignore"):
+        if rule.op == "in":
+            return np.isin(column, rule.value)
+        if rule.op == "true":
+            return column.copy()
+        if rule.op == "gt":
+            return column > rule.value
+        if rule.op == "ge":
+            return column >= rule.value
+        # Sleep rules skip 0 as well as missing values: 0 hours means "not answered"
+        answered = np.nan_to_num(column) != 0
+        low, high = rule.value
+        if rule.op == "between":
+            return answered & (column >= low) & (column <= high)
+        if rule.op == "outside":
+            return answered & ((column < low) | (column > high))
+    raise ValueError(f"Unknown lifestyle rule operator {rule.op!r}")
+@dataclass
+class LifestyleScores:
+    rules: Tuple[LifestyleRule, ...]
+    masks: np.ndarray
+    scores: np.ndarray
+    levels: np.ndarray
+    confidence: np.ndarray
+    def __post_init__(self):
+        # Rows matching the same set of rules share one explanation; a cohort has few distinct sets
+        self._patterns = (1 << np.arange(len(self.rules), dtype=np.int64)) @ self.masks.astype(np.int64)
+        self._explanations: Dict[int, Dict[str, Any]] = {}
+    def __len__(self) -> int:
+        return len(self.scores)
+    def _explanation(self, pattern: int) -> Dict[str, Any]:
+        explanation = self._explanations.get(pattern)
+        if explanation is None:
+            matched = [rule for bit, rule in enumerate(self.rules) if pattern >> bit & 1]
+            risk_factors = [rule.factor for rule in matched if not rule.protective]
+            recommendations = [rule.recommendation for rule in matched if rule.recommendation]
+            explanation = self._explanations[pattern] = {
+                "risk_factors": {
+                    "primary_factors": risk_factors[:3],
+                    "all_factors": risk_factors,
+                    "factor_weights": {rule.factor: rule.weight for rule in matched if not rule.protective}
+                },
+                "protective_factors": [rule.factor for rule in matched if rule.protective],
+                "recommendations": recommendations or [DEFAULT_RECOMMENDATION]
+            }
+        return explanation
+    def result(self, index: int) -> Dict[str, Any]:
+        return {
+            "risk_score_lifestyle": float(self.scores[index]),
+            "risk_level": str(self.levels[index]),
+            **self._explanation(int(self._patterns[index])),
+            "confidence_score": float(self.confidence[index])
+        }
+def score_columns(columns: Dict[str, np.ndarray], rules: Tuple[LifestyleRule, ...] = LIFESTYLE_RULES) -> LifestyleScores:
+    masks = np.stack([_rule_mask(rule, columns) for rule in rules])
+    # Summed rule by rule rather than as a dot product so scores sitting on a level
+    # threshold round the same way they always have
+    raw = np.full(masks.shape[1], BASE_RISK)
+    for rule, mask in zip(rules, masks):
+        raw += rule.weight * mask
+    raw = np.clip(raw, MIN_RISK, MAX_RISK)
+    scores = np.round(raw, 2)
+    levels = RISK_LEVELS[np.searchsorted(RISK_LEVEL_THRESHOLDS, raw, side="right")]
+    answered = np.zeros(len(scores))
+    for name in COMPLETENESS_COLUMNS:
+        column = columns.get(name + "__present", columns[name])
+        if column.dtype.kind == "f":
+            answered += ~np.isnan(column)
+        elif column.dtype.kind == "b":
+            answered += column
+        else:
+            answered += column != ""
+    confidence = np.round(0.75 + 0.17 * answered / len(COMPLETENESS_COLUMNS), 2)
+    return LifestyleScores(rules, masks, scores, levels, confidence)
+def score_lifestyle(records: Sequence[Any]) -> LifestyleScores:
+    return score_columns(columns_from_records(records))
+SCORING_COLUMNS = (LifestyleAssessment.id, LifestyleAssessment.risk_score_lifestyle) + tuple(
+    getattr(LifestyleAssessment, name) for name in NUMERIC_COLUMNS + CATEGORICAL_COLUMNS + BOOLEAN_COLUMNS
+)
+@job(RESCORE_LIFESTYLE_JOB)
+def rescore_lifestyle_assessments(batch_size: Optional[int] = None) -> Dict[str, int]:
+    # Re-scores every stored assessment in id-ordered pages: one column query, one
+    # vectorized scoring pass and one bulk UPDATE per page
+    batch_size = batch_size or settings.LIFESTYLE_RESCORE_BATCH_SIZE
+    rescored, last_id = 0, 0
+    with SessionLocal() as session:
+        while True:
+            rows = session.exec(
+                select(*SCORING_COLUMNS)
+                .where(LifestyleAssessment.id > last_id)
+                .order_by(LifestyleAssessment.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            scores = score_lifestyle(rows)
+            session.execute(update(LifestyleAssessment), [
+                {
+                    "id": row.id,
+                    "risk_score_lifestyle": float(scores.scores[i]),
+                    "risk_factors": scores.result(i)["risk_factors"]
+                }
+                for i, row in enumerate(rows)
+            ])
+            changed = [row.id for i, row in enumerate(rows) if row.risk_score_lifestyle != scores.scores[i]]
+            refresh_combined_risk(session, lifestyle_assessment_ids=changed)
+            session.commit()
+            rescored += len(rows)
+            last_id = rows[-1].id
+            logger.info("Re-scored %d lifestyle assessments", rescored)
+    return {"rescored": rescored}
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import logging
+import os
+import re
+import time
+import uuid
+import httpx
+from sqlmodel import select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.jobs import get_job_queue, job
+from app.models import MRIStudy
+from collections import Counter
+from app.services.analytics import MRI_SOURCE, apply_deltas, record_change
+from app.services.combined_risk import refresh_combined_risk
+logger = logging.getLogger(__name__)
+PROCESS_MRI_STUDY_JOB = "mri.process_study"
+IN_FLIGHT_STATUSES = ("queued", "processing")
+VOLUME_EXTENSIONS = (".nii", ".nii.gz", ".zip")
+# Impairment classes of the AMRI model mapped onto a 0-1 risk scale
+IMPAIRMENT_SEVERITY = {
+    "No Impairment": 0.0,
+    "Very Mild Impairment": 1 / 3,
+    "Mild Impairment": 2 / 3,
+    "Moderate Impairment": 1.0,
+}
+def mri_file_extension(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(".nii.gz"):
+        return ".nii.gz"
+    return os.path.splitext(name)[1]
+def model_service_endpoint(file_path: str) -> str:
+    if mri_file_extension(file_path) in VOLUME_EXTENSIONS:
+        return "/amri/volume"
+    return "/amri"
+def call_model_service(file_path: str) -> Dict[str, Any]:
+    url = settings.MRI_PROCESSING_SERVICE_URL.rstrip("/") + model_service_endpoint(file_path)
+    with open(file_path, "rb") as mri_file, httpx.Client(timeout=settings.MRI_PROCESSING_TIMEOUT) as client:
+        response = client.post(url, files={"file": (os.path.basename(file_path), mri_file)})
+    response.raise_for_status()
+    return response.json()
+def summarize_model_output(result: Dict[str, Any]) -> Tuple[Dict[str, float], float, Dict[str, Any]]:
+    decision = result["decision_analysis"]
+    probabilities = {item["label"]: float(item["probability"]) for item in decision["full_comparison"]}
+    feature_vector = {
+        re.sub(r"\W+", "_", label.lower()) + "_probability": round(probability, 6)
+        for label, probability in probabilities.items()
+    }
+    risk_score = sum(probability * IMPAIRMENT_SEVERITY.get(label, 0.0) for label, probability in probabilities.items())
+    explanation = {
+        "primary_finding": decision["primary_finding"],
+        "secondary_finding": decision["secondary_finding"],
+        "confidence": decision["decision_confidence"],
+        "rationale": decision["decision_rationale"],
+        "clinical_significance": decision.get("clinical_significance"),
+        "recommendations": decision.get("recommendations", []),
+    }
+    if "slices" in result:
+        explanation["slices"] = result["slices"]
+    return feature_vector, round(min(max(risk_score, 0.0), 1.0), 4), explanation
+@job(PROCESS_MRI_STUDY_JOB)
+def process_mri_study(study_id: int) -> str:
+    with SessionLocal() as session:
+        study = session.get(MRIStudy, study_id)
+        if study is None:
+            logger.warning("MRI study %s no longer exists, skipping", study_id)
+            return "missing"
+        study.processing_status = "processing"
+        study.processing_error = None
+        study.updated_at = datetime.utcnow()
+        session.add(study)
+        session.commit()
+        file_path = study.file_path
+    started = time.perf_counter()
+    try:
+        feature_vector, risk_score, explanation = summarize_model_output(call_model_service(file_path))
+        status, error = "completed", None
+    except Exception as e:
+        logger.exception("Processing MRI study %s failed", study_id)
+        status, error = "failed", str(e)
+    with SessionLocal() as session:
+        study = session.get(MRIStudy, study_id)
+        if study is None:
+            return "missing"
+        study.processing_status = status
+        study.processing_error = error
+        study.processing_time_seconds = round(time.perf_counter() - started, 3)
+        study.updated_at = datetime.utcnow()
+        if status == "completed":
+            apply_deltas(session, record_change(Counter(), MRI_SOURCE, study.feature_vector, feature_vector))
+            study.feature_vector = feature_vector
+            study.risk_score_mri = risk_score
+            study.risk_explanation = explanation
+            study.processed_at = study.updated_at
+        session.add(study)
+        if status == "completed":
+            session.flush()
+            refresh_combined_risk(session, mri_study_ids=[study_id])
+        session.commit()
+    return status
+def processing_is_stale(study: MRIStudy, now: Optional[datetime] = None) -> bool:
+    # updated_at is stamped when the study is queued and again when a worker picks it up
+    last_progress = study.updated_at or study.created_at
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=settings.MRI_PROCESSING_STALE_SECONDS)
+    return study.processing_status in IN_FLIGHT_STATUSES and last_progress < cutoff
+def requeue_interrupted_studies(stale_only: bool = True) -> int:
+    # Queues studies whose job was lost again. The in-process queue loses every job on a
+    # restart, so at startup it requeues all in-flight studies (stale_only=False); a broker
+    # keeps its jobs, so there only studies without progress for MRI_PROCESSING_STALE_SECONDS are.
+    now = datetime.utcnow()
+    requeued = []
+    with SessionLocal() as session:
+        studies = session.exec(select(MRIStudy).where(MRIStudy.processing_status.in_(IN_FLIGHT_STATUSES))).all()
+        for study in studies:
+            if stale_only and not processing_is_stale(study, now):
+                continue
+            study.processing_status = "queued"
+            study.processing_job_id = str(uuid.uuid4())
+            study.processing_error = None
+            study.updated_at = now
+            session.add(study)
+            requeued.append((study.id, study.processing_job_id))
+        session.commit()
+    for study_id, job_id in requeued:
+        get_job_queue().enqueue(PROCESS_MRI_STUDY_JOB, study_id, job_id=job_id)
+    if requeued:
+        logger.info("Requeued %d interrupted MRI studies", len(requeued))
+    return len(requeued)
@@ -0,0 +1,241 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import argparse
+import csv
+import io
+import json
+import logging
+import time
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from app.core.config import settings
+from app.core.database import engine as default_engine
+from app.models import LifestyleAssessment, MRIStudy, Patient
+from app.services.analytics import rebuild_analytics
+from sqlmodel import Session
+logger = logging.getLogger(__name__)
+# Imported cohorts get a placeholder name; the OASIS subject id is the medical record number
+OASIS_FIRST_NAME = "OASIS"
+IMPORTED_STATUS = "imported"
+# OASIS-1 (cross-sectional) reports education as a 1-5 code, OASIS-2 (longitudinal) in years
+EDUCATION_CODE_YEARS = {1: 10, 2: 12, 3: 14, 4: 16, 5: 18}
+MISSING_VALUES = {"", "N/A", "NA", "nan"}
+# One normalized row per MRI session, in COPY column order
+STAGING_COLUMNS = (
+    sa.Column("subject_id", sa.String, nullable=False),
+    sa.Column("mri_id", sa.String, nullable=False),
+    sa.Column("gender", sa.String),
+    sa.Column("age", sa.Integer),
+    sa.Column("education_years", sa.Integer),
+    sa.Column("features", sa.Text),
+)
+staging_metadata = sa.MetaData()
+staging = sa.Table("oasis_staging", staging_metadata, *STAGING_COLUMNS, prefixes=["TEMPORARY"])
+@dataclass
+class ImportProgress:
+    rows: int = 0
+    batches: int = 0
+    skipped: int = 0
+    elapsed_seconds: float = 0.0
+    @property
+    def rows_per_minute(self) -> float:
+        return self.rows * 60 / self.elapsed_seconds if self.elapsed_seconds else 0.0
+def _value(raw: Optional[str]) -> Optional[str]:
+    raw = (raw or "").strip()
+    return None if raw in MISSING_VALUES else raw
+def _number(raw: Optional[str]) -> Optional[float]:
+    value = _value(raw)
+    return None if value is None else float(value)
+def _integer(raw: Optional[str]) -> Optional[int]:
+    value = _number(raw)
+    return None if value is None else int(round(value))
+def normalize_row(row: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    # Maps a row of either OASIS file onto the staging columns; None for rows without an id
+    if "Subject ID" in row:
+        subject_id, mri_id = _value(row["Subject ID"]), _value(row.get("MRI ID"))
+        education_years = _integer(row.get("EDUC"))
+        visit, delay = _integer(row.get("Visit")), _integer(row.get("MR Delay"))
+    else:
+        mri_id = _value(row.get("ID"))
+        subject_id = mri_id.rsplit("_MR", 1)[0] if mri_id else None
+        education_years = EDUCATION_CODE_YEARS.get(_integer(row.get("Educ")))
+        visit, delay = 1, _integer(row.get("Delay"))
+    if not subject_id or not mri_id:
+        return None
+    features = {
+        "group": _value(row.get("Group")),
+        "age": _integer(row.get("Age")),
+        "visit": visit,
+        "mr_delay_days": delay,
+        "hand": _value(row.get("Hand")),
+        "ses": _number(row.get("SES")),
+        "mmse": _number(row.get("MMSE")),
+        "cdr": _number(row.get("CDR")),
+        "etiv": _number(row.get("eTIV")),
+        "nwbv": _number(row.get("nWBV")),
+        "asf": _number(row.get("ASF")),
+    }
+    return {
+        "subject_id": subject_id,
+        "mri_id": mri_id,
+        "gender": _value(row.get("M/F")),
+        "age": _integer(row.get("Age")),
+        "education_years": education_years,
+        "features": json.dumps({key: value for key, value in features.items() if value is not None}),
+    }
+def read_batches(path: str, batch_size: int, progress: ImportProgress) -> Iterator[List[Dict[str, Any]]]:
+    # Streams the file; only one batch of normalized rows is held in memory. Rows are keyed
+    # by MRI ID because an upsert may not touch the same target row twice in one statement.
+    batch: Dict[str, Dict[str, Any]] = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            record = normalize_row(row)
+            if record is None:
+                progress.skipped += 1
+                continue
+            batch[record["mri_id"]] = record
+            if len(batch) >= batch_size:
+                yield list(batch.values())
+                batch = {}
+    if batch:
+        yield list(batch.values())
+def _copy_rows(connection: Connection, rows: List[Dict[str, Any]]) -> None:
+    names = [column.name for column in STAGING_COLUMNS]
+    if connection.dialect.name != "postgresql":
+        connection.execute(staging.insert(), rows)
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # Unquoted empty fields are NULL in COPY's CSV format
+        writer.writerow(["" if row[name] is None else row[name] for name in names])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {staging.name} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+def _insert(connection: Connection, table):
+    return (postgresql if connection.dialect.name == "postgresql" else sqlite).insert(table)
+def _json(connection: Connection, column):
+    return sa.cast(column, postgresql.JSONB) if connection.dialect.name == "postgresql" else column
+def _upsert_staged(connection: Connection, now: datetime) -> None:
+    # Set-based upserts from the staging table: patients first, then the per-session rows
+    # that reference them. Re-importing a file updates rows in place.
+    patients = Patient.__table__
+    subjects = (
+        sa.select(
+            sa.literal(OASIS_FIRST_NAME).label("first_name"),
+            staging.c.subject_id.label("last_name"),
+            sa.func.max(staging.c.gender).label("gender"),
+            staging.c.subject_id.label("medical_record_number"),
+            sa.literal(now).label("created_at"),
+        )
+        .group_by(staging.c.subject_id)
+    )
+    insert = _insert(connection, patients).from_select(
+        ["first_name", "last_name", "gender", "medical_record_number", "created_at"], subjects
+    )
+    connection.execute(insert.on_conflict_do_update(
+        index_elements=[patients.c.medical_record_number],
+        set_={"gender": insert.excluded.gender, "updated_at": now}
+    ))
+    studies = MRIStudy.__table__
+    sessions = (
+        sa.select(
+            patients.c.id.label("patient_id"),
+            staging.c.mri_id.label("study_name"),
+            staging.c.mri_id.label("source_id"),
+            (sa.literal("oasis://") + staging.c.mri_id).label("file_path"),
+            sa.literal(IMPORTED_STATUS).label("processing_status"),
+            _json(connection, staging.c.features).label("feature_vector"),
+            sa.literal(now).label("created_at"),
+        )
+        .join(patients, patients.c.medical_record_number == staging.c.subject_id)
+    )
+    insert = _insert(connection, studies).from_select(
+        ["patient_id", "study_name", "source_id", "file_path", "processing_status", "feature_vector", "created_at"],
+        sessions
+    )
+    connection.execute(insert.on_conflict_do_update(
+        index_elements=[studies.c.source_id],
+        set_={"patient_id": insert.excluded.patient_id, "feature_vector": insert.excluded.feature_vector, "updated_at": now}
+    ))
+    assessments = LifestyleAssessment.__table__
+    visits = (
+        sa.select(
+            patients.c.id.label("patient_id"),
+            staging.c.mri_id.label("source_id"),
+            staging.c.age,
+            staging.c.education_years,
+            sa.literal(now).label("created_at"),
+        )
+        .join(patients, patients.c.medical_record_number == staging.c.subject_id)
+        .where(staging.c.age.is_not(None))
+    )
+    insert = _insert(connection, assessments).from_select(
+        ["patient_id", "source_id", "age", "education_years", "created_at"], visits
+    )
+    connection.execute(insert.on_conflict_do_update(
+        index_elements=[assessments.c.source_id],
+        set_={
+            "patient_id": insert.excluded.patient_id,
+            "age": insert.excluded.age,
+            "education_years": insert.excluded.education_years,
+            "updated_at": now
+        }
+    ))
+def log_progress(progress: ImportProgress) -> None:
+    logger.info(
+        "Imported %d rows in %d batches (%.0f rows/min, %d skipped)",
+        progress.rows, progress.batches, progress.rows_per_minute, progress.skipped
+    )
+def import_oasis_csv(
+    path: str,
+    bind: Optional[Engine] = None,
+    batch_size: Optional[int] = None,
+    on_progress: Callable[[ImportProgress], None] = log_progress
+) -> ImportProgress:
+    # Loads an OASIS cross-sectional or longitudinal CSV: each batch is COPYed into a
+    # temporary staging table and upserted into patient / mristudy / lifestyleassessment
+    # in one transaction, so an interrupted import can simply be re-run.
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    progress = ImportProgress()
+    started = time.perf_counter()
+    with (bind or default_engine).connect() as connection:
+        staging.create(connection, checkfirst=False)
+        connection.commit()
+        try:
+            for rows in read_batches(path, batch_size, progress):
+                now = datetime.utcnow()
+                _copy_rows(connection, rows)
+                _upsert_staged(connection, now)
+                connection.execute(staging.delete())
+                connection.commit()
+                progress.rows += len(rows)
+                progress.batches += 1
+                progress.elapsed_seconds = time.perf_counter() - started
+                on_progress(progress)
+        finally:
+            connection.rollback()
+            staging.drop(connection, checkfirst=False)
+            connection.commit()
+    # Aggregates are rebuilt once per import rather than adjusted row by row
+    with Session(bind or default_engine) as session:
+        rebuild_analytics(session)
+        session.commit()
+    return progress
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk import OASIS CSV files into the database")
+    parser.add_argument("paths", nargs="+", help="oasis_longitudinal.csv and/or oasis_cross-sectional.csv")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    for path in args.paths:
+        logger.info("Importing %s", path)
+        progress = import_oasis_csv(path, batch_size=args.batch_size)
+        logger.info("Finished %s: %d rows in %.1fs", path, progress.rows, progress.elapsed_seconds)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import heapq
+import json
+from sqlalchemy import literal, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import Assessment, LifestyleAssessment, MRIStudy
+# Event kinds in tie-break order: events with the same timestamp are listed in this order
+# (descending), then by id. (created_at, rank, id) is the total order the cursor points into.
+TIMELINE_SOURCES = {
+    "mri_study": (0, MRIStudy, lambda: (
+        MRIStudy.study_name, MRIStudy.processing_status, MRIStudy.risk_score_mri, literal(None)
+    )),
+    "lifestyle_assessment": (1, LifestyleAssessment, lambda: (
+        literal("Lifestyle assessment"), literal(None), LifestyleAssessment.risk_score_lifestyle, literal(None)
+    )),
+    "assessment": (2, Assessment, lambda: (
+        Assessment.assessment_name, literal(None), Assessment.combined_risk_score, Assessment.risk_level
+    )),
+}
+class InvalidCursor(ValueError):
+    pass
+@dataclass(frozen=True)
+class TimelineCursor:
+    created_at: datetime
+    rank: int
+    id: int
+    def encode(self) -> str:
+        raw = json.dumps([self.created_at.isoformat(), self.rank, self.id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    @classmethod
+    def decode(cls, token: str) -> "TimelineCursor":
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            created_at, rank, id = json.loads(raw)
+            return cls(datetime.fromisoformat(created_at), int(rank), int(id))
+        except (ValueError, TypeError):
+            raise InvalidCursor("Invalid timeline cursor")
+def _after_cursor(model, rank: int, cursor: TimelineCursor):
+    # Rows strictly after the cursor in (created_at, rank, id) descending order, phrased so
+    # each source can walk its (patient_id, created_at, id) index backwards
+    if rank < cursor.rank:
+        return model.created_at <= cursor.created_at
+    if rank > cursor.rank:
+        return model.created_at < cursor.created_at
+    return tuple_(model.created_at, model.id) < tuple_(cursor.created_at, cursor.id)
+async def timeline_page(
+    session: AsyncSession,
+    patient_id: int,
+    limit: int,
+    cursor: Optional[TimelineCursor] = None
+) -> Tuple[List[Dict[str, Any]], Optional[TimelineCursor]]:
+    # Newest first. Each source contributes at most limit + 1 rows from its index, and the
+    # sorted runs are merged here, so a page costs O(limit) however deep the cursor is.
+    runs = []
+    for kind, (rank, model, columns) in TIMELINE_SOURCES.items():
+        query = select(model.id, model.created_at, *columns()).where(model.patient_id == patient_id)
+        if cursor is not None:
+            query = query.where(_after_cursor(model, rank, cursor))
+        rows = (await session.exec(
+            query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+        )).all()
+        runs.append([
+            ((row[1], rank, row[0]), {
+                "type": kind,
+                "id": row[0],
+                "occurred_at": row[1],
+                "title": row[2],
+                "status": row[3],
+                "risk_score": row[4],
+                "risk_level": row[5]
+            })
+            for row in rows
+        ])
+    merged = list(heapq.merge(*runs, key=lambda item: item[0], reverse=True))
+    page = merged[:limit]
+    next_cursor = TimelineCursor(*page[-1][0]) if len(merged) > limit else None
+    return [event for _, event in page], next_cursor
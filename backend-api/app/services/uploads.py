@@ -0,0 +1,243 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import contextlib
+import hashlib
+import os
+import uuid
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+from app.core.config import settings
+from app.services.mri_processing import mri_file_extension
+# Upper bound for the non-file form fields sent alongside an upload
+MAX_FORM_FIELD_SIZE = 64 * 1024
+MAX_FORM_OVERHEAD = 1024 * 1024
+@dataclass
+class StoredUpload:
+    original_filename: str
+    stored_filename: str
+    file_path: str
+    file_size: int
+    sha256: str
+    fields: Dict[str, str] = field(default_factory=dict)
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE // (1024*1024)}MB"
+    )
+class HashingFileWriter:
+    # Buffers at most chunk_size bytes, writes them with aiofiles and hashes on the way.
+    # Data lands in a .part file that is renamed into place by commit() or removed on error.
+    def __init__(self, path: str, max_bytes: int, chunk_size: int):
+        self.path = path
+        self.partial_path = path + ".part"
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = None
+    async def __aenter__(self) -> "HashingFileWriter":
+        self._file = await aiofiles.open(self.partial_path, "wb")
+        return self
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+        if exc_type is not None:
+            with contextlib.suppress(FileNotFoundError):
+                await aiofiles.os.remove(self.partial_path)
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise file_too_large()
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_size:
+            await self._flush()
+    async def _flush(self) -> None:
+        if self._buffer:
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            self._sha256.update(chunk)
+            await self._file.write(chunk)
+    async def commit(self) -> str:
+        await self._flush()
+        await self._file.close()
+        self._file = None
+        await aiofiles.os.replace(self.partial_path, self.path)
+        return self._sha256.hexdigest()
+def _header_params(value: bytes) -> Dict[str, str]:
+    _, params = parse_options_header(value)
+    return {key.decode("latin-1"): param.decode("utf-8", "replace") for key, param in params.items()}
+async def stream_multipart_upload(
+    request: Request,
+    allowed_extensions: List[str],
+    file_field: str = "file",
+    upload_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> StoredUpload:
+    # Parses the multipart body as it arrives instead of letting Starlette spool it first,
+    # so memory per upload is bounded by chunk_size whatever the size of the scan
+    upload_dir = upload_dir or settings.UPLOAD_DIR
+    max_bytes = settings.MAX_FILE_SIZE if max_bytes is None else max_bytes
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a multipart/form-data body"
+        )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MAX_FORM_OVERHEAD:
+        raise file_too_large()
+    events = []
+    headers = {}
+    header = {"field": b"", "value": b""}
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+    def on_header_end():
+        headers[header["field"].decode("latin-1").lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+        headers.clear()
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+    def on_part_end():
+        events.append(("end", None))
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    fields: Dict[str, str] = {}
+    upload: Optional[StoredUpload] = None
+    async with contextlib.AsyncExitStack() as stack:
+        writer = None
+        field_name, field_value = None, bytearray()
+        try:
+            async for body_chunk in request.stream():
+                parser.write(body_chunk)
+                for kind, payload in events:
+                    if kind == "headers":
+                        disposition = _header_params(payload.get("content-disposition", b""))
+                        field_name = disposition.get("name")
+                        filename = disposition.get("filename")
+                        if field_name == file_field and filename:
+                            if upload is not None:
+                                raise HTTPException(
+                                    status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail="Only one file may be uploaded per request"
+                                )
+                            file_ext = mri_file_extension(filename)
+                            if file_ext not in allowed_extensions:
+                                raise HTTPException(
+                                    status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"File type {file_ext} not allowed. Supported: {allowed_extensions}"
+                                )
+                            original_filename = os.path.basename(filename.replace("\\", "/"))
+                            stored_filename = f"{uuid.uuid4()}_{original_filename}"
+                            os.makedirs(upload_dir, exist_ok=True)
+                            writer = await stack.enter_async_context(
+                                HashingFileWriter(os.path.join(upload_dir, stored_filename), max_bytes, chunk_size)
+                            )
+                    elif kind == "data":
+                        if writer is not None:
+                            await writer.write(payload)
+                        elif field_name is not None:
+                            field_value += payload
+                            if len(field_value) > MAX_FORM_FIELD_SIZE:
+                                raise HTTPException(
+                                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                    detail=f"Form field {field_name} is too large"
+                                )
+                    elif writer is not None:
+                        sha256 = await writer.commit()
+                        upload = StoredUpload(
+                            original_filename=original_filename,
+                            stored_filename=stored_filename,
+                            file_path=writer.path,
+                            file_size=writer.size,
+                            sha256=sha256
+                        )
+                        writer, field_name = None, None
+                    elif field_name is not None:
+                        fields[field_name] = field_value.decode("utf-8")
+                        field_name, field_value = None, bytearray()
+                events.clear()
+            parser.finalize()
+            if writer is not None or field_name is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Upload ended before the multipart body was complete"
+                )
+        except BaseException:
+            if upload is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    await aiofiles.os.remove(upload.file_path)
+            raise
+    if upload is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Missing file field '{file_field}'"
+        )
+    upload.fields = fields
+    return upload
+async def discard_upload(upload: StoredUpload) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        await aiofiles.os.remove(upload.file_path)
+def merge_range(ranges: Optional[List[List[int]]], start: int, end: int) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for range_start, range_end in sorted([*(tuple(r) for r in ranges or []), (start, end)]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+def contiguous_offset(ranges: Optional[List[List[int]]]) -> int:
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+def missing_ranges(ranges: Optional[List[List[int]]], total: int) -> List[List[int]]:
+    missing, position = [], 0
+    for start, end in ranges or []:
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < total:
+        missing.append([position, total])
+    return missing
+async def write_stream_at(request: Request, path: str, offset: int, max_bytes: int, chunk_size: Optional[int] = None) -> int:
+    # Writes the raw request body into an existing file at offset. Chunks of one upload
+    # session may arrive in parallel; each request writes its own byte range in place.
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    written = 0
+    buffer = bytearray()
+    async with aiofiles.open(path, "r+b") as target:
+        await target.seek(offset)
+        async for body_chunk in request.stream():
+            written += len(body_chunk)
+            if written > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Chunk runs past the end of the upload ({max_bytes} bytes left from offset {offset})"
+                )
+            buffer += body_chunk
+            if len(buffer) >= chunk_size:
+                await target.write(bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await target.write(bytes(buffer))
+    return written
+def sha256_file(path: str, chunk_size: Optional[int] = None) -> str:
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
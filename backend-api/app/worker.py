@@ -0,0 +1,6 @@
+from app.core.jobs import JOB_HANDLERS, create_celery_app
+from app.services import analytics, blob_store, lifestyle_scoring, mri_processing  # noqa: F401  (registers the jobs)
+# Celery worker entry point: celery -A app.worker.celery_app worker
+celery_app = create_celery_app()
+for name, handler in JOB_HANDLERS.items():
+    celery_app.task(name=name)(handler)
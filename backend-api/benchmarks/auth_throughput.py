@@ -0,0 +1,66 @@
+# Login and authenticated-request throughput, measured in-process against the ASGI app.
+#
+# "inline" reproduces the original login path (bcrypt called directly in the handler) and
+# "offloaded" uses the bcrypt worker pool; the max event-loop stall shows how long other
+# requests were frozen. /auth/me is measured with the verified-token cache disabled and
+# enabled. Run from the backend-api directory:
+#
+#     python -m benchmarks.auth_throughput
+#     python -m benchmarks.auth_throughput --logins 64 --requests 5000 --concurrency 32
+import argparse
+import asyncio
+import time
+import httpx
+from app.core import security
+from app.core.security import verify_password
+from app.routes import auth
+from main import app
+CREDENTIALS = {"email": "clinician@example.com", "password": "secret"}
+async def inline_verify(plain_password: str, hashed_password: str) -> bool:
+    return verify_password(plain_password, hashed_password)
+async def watch_loop(stalls: list, stop: asyncio.Event, tick: float = 0.005) -> None:
+    # Records how late each tick fires; a blocked loop shows up as a large delay
+    while not stop.is_set():
+        expected = time.perf_counter() + tick
+        await asyncio.sleep(tick)
+        stalls.append(max(0.0, time.perf_counter() - expected))
+async def run_concurrently(total: int, concurrency: int, request) -> float:
+    remaining = iter(range(total))
+    async def worker():
+        for _ in remaining:
+            response = await request()
+            response.raise_for_status()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+async def bench_login(client: httpx.AsyncClient, total: int, concurrency: int) -> dict:
+    stalls, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stalls, stop))
+    elapsed = await run_concurrently(total, concurrency, lambda: client.post("/auth/login", json=CREDENTIALS))
+    stop.set()
+    await watcher
+    return {"per_second": total / elapsed, "max_stall_ms": max(stalls, default=0.0) * 1000}
+async def bench_me(client: httpx.AsyncClient, total: int, concurrency: int, headers: dict) -> dict:
+    elapsed = await run_concurrently(total, concurrency, lambda: client.get("/auth/me", headers=headers))
+    return {"per_second": total / elapsed}
+async def main(args) -> None:
+    cache_size = security.token_cache.maxsize
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for mode, verify in (("inline", inline_verify), ("offloaded", security.verify_password_async)):
+            auth.verify_password_async = verify
+            result = await bench_login(client, args.logins, args.concurrency)
+            print(f"login {mode:>10}: {result['per_second']:8.1f} req/s, max loop stall {result['max_stall_ms']:7.1f} ms")
+        auth.verify_password_async = security.verify_password_async
+        token = (await client.post("/auth/login", json=CREDENTIALS)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        for mode, size in (("no cache", 0), ("cached", cache_size)):
+            security.token_cache.clear()
+            security.token_cache.maxsize = size
+            result = await bench_me(client, args.requests, args.concurrency, headers)
+            print(f"/auth/me {mode:>8}: {result['per_second']:8.1f} req/s")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auth hot-path throughput benchmark")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -1,10 +1,14 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
+import asyncio
 import uvicorn
 from app.core.config import settings
 from app.core.database import engine, create_db_and_tables
-from app.routes import auth, health, mri, lifestyle
+from app.routes import analytics, auth, health, mri, lifestyle, patients
+from app.services.blob_store import schedule_blob_gc
+from app.services.health_probe import get_health_prober
+from app.services.mri_processing import requeue_interrupted_studies
 security = HTTPBearer()
 def create_application() -> FastAPI:
     app = FastAPI(
@@ -26,11 +30,33 @@ def create_application() -> FastAPI:
     app.include_router(auth.router, prefix="/auth", tags=["authentication"])
     app.include_router(mri.router, prefix="/mri", tags=["mri-processing"])
     app.include_router(lifestyle.router, prefix="/lifestyle", tags=["lifestyle-assessment"])
+    app.include_router(patients.router, prefix="/patients", tags=["patients"])
+    app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
     return app
 app = create_application()
 @app.on_event("startup")
 async def startup_event():
     create_db_and_tables()
+    # Jobs of the in-process queue did not survive the restart; a broker still holds its own
+    requeue_interrupted_studies(stale_only=settings.JOB_BACKEND != "inprocess")
+    prober = get_health_prober()
+    await prober.run_once()
+    prober.start()
+    # Held on app.state so the loop is not garbage-collected and can be cancelled on shutdown
+    app.state.blob_gc_task = None
+    if settings.BLOB_GC_INTERVAL_SECONDS > 0:
+        app.state.blob_gc_task = asyncio.create_task(schedule_blob_gc(settings.BLOB_GC_INTERVAL_SECONDS))
+@app.on_event("shutdown")
+async def shutdown_event():
+    await get_health_prober().stop()
+    blob_gc_task = getattr(app.state, "blob_gc_task", None)
+    if blob_gc_task is not None:
+        blob_gc_task.cancel()
+        try:
+            await blob_gc_task
+        except asyncio.CancelledError:
+            pass
+        app.state.blob_gc_task = None
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
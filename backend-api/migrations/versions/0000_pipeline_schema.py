@@ -0,0 +1,123 @@
+"""Add upload, processing, scoring and analytics schema
+
+Revision ID: 0000_pipeline_schema
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision = "0000_pipeline_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+JSONType = JSONB().with_variant(sa.JSON(), "sqlite")
+
+# Columns added to tables that predate migrations. A database built by create_all already
+# has them, so each is added only if missing (everything is emitted in --sql mode).
+COLUMNS = {
+    "mristudy": lambda: [
+        sa.Column("file_sha256", sa.String(), nullable=True),
+        sa.Column("processing_job_id", sa.String(), nullable=True),
+        sa.Column("processing_error", sa.String(), nullable=True),
+        sa.Column("processing_time_seconds", sa.Float(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.Column("source_id", sa.String(), nullable=True),
+    ],
+    "lifestyleassessment": lambda: [
+        sa.Column("source_id", sa.String(), nullable=True),
+    ],
+    "assessment": lambda: [
+        sa.Column("mri_risk_score", sa.Float(), nullable=True),
+        sa.Column("lifestyle_risk_score", sa.Float(), nullable=True),
+        sa.Column("combined_risk_updated_at", sa.DateTime(), nullable=True),
+        sa.Column("recommendation", sa.String(), nullable=True),
+    ],
+}
+# Declared on the model before this series; added if missing but kept on downgrade
+BASELINE_COLUMNS = {("assessment", "recommendation")}
+# Bulk imports upsert ON CONFLICT (source_id); a unique index serves that on every dialect
+UNIQUE_INDEXES = (
+    ("ix_mristudy_source_id", "mristudy", ["source_id"]),
+    ("ix_lifestyleassessment_source_id", "lifestyleassessment", ["source_id"]),
+)
+
+
+def _inspector():
+    return None if op.get_context().as_sql else sa.inspect(op.get_bind())
+
+
+def _has_table(inspector, table):
+    return inspector is not None and inspector.has_table(table)
+
+
+def _columns(inspector, table):
+    return set() if inspector is None else {column["name"] for column in inspector.get_columns(table)}
+
+
+def _unique_column_sets(inspector, table):
+    # create_all declares these as unnamed unique constraints, so match on columns, not name
+    if inspector is None:
+        return []
+    indexes = [index["column_names"] for index in inspector.get_indexes(table) if index["unique"]]
+    return indexes + [constraint["column_names"] for constraint in inspector.get_unique_constraints(table)]
+
+
+def upgrade() -> None:
+    inspector = _inspector()
+    for table, columns in COLUMNS.items():
+        existing = _columns(inspector, table)
+        for column in columns():
+            if column.name not in existing:
+                op.add_column(table, column)
+    for name, table, columns in UNIQUE_INDEXES:
+        if columns not in _unique_column_sets(inspector, table):
+            op.create_index(name, table, columns, unique=True)
+    if not _has_table(inspector, "mriuploadsession"):
+        op.create_table(
+            "mriuploadsession",
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("study_name", sa.String(), nullable=False),
+            sa.Column("acquisition_date", sa.DateTime(), nullable=True),
+            sa.Column("scanner_type", sa.String(), nullable=True),
+            sa.Column("study_description", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("patient.id"), nullable=False),
+            sa.Column("filename", sa.String(), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column("sha256", sa.String(), nullable=True),
+            sa.Column("partial_path", sa.String(), nullable=False),
+            sa.Column("deduplicated", sa.Boolean(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("received_ranges", JSONType, nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    if not _has_table(inspector, "analyticsaggregate"):
+        op.create_table(
+            "analyticsaggregate",
+            sa.Column("metric", sa.String(), nullable=False),
+            sa.Column("bucket", sa.String(), nullable=False),
+            sa.Column("series", sa.String(), nullable=False),
+            sa.Column("sort_key", sa.Float(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("metric", "bucket", "series"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("analyticsaggregate")
+    op.drop_table("mriuploadsession")
+    for name, table, _ in reversed(UNIQUE_INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    for table, columns in reversed(list(COLUMNS.items())):
+        with op.batch_alter_table(table) as batch:
+            for column in reversed(columns()):
+                if (table, column.name) not in BASELINE_COLUMNS:
+                    batch.drop_column(column.name)
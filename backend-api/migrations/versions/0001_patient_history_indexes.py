@@ -0,0 +1,44 @@
+"""Index foreign keys and per-patient history
+
+Revision ID: 0001_patient_history_indexes
+Revises: 0000_pipeline_schema
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0001_patient_history_indexes"
+down_revision = "0000_pipeline_schema"
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns). create_all also creates these indexes on a fresh database;
+# on existing ones the tables and columns they cover are added by 0000_pipeline_schema,
+# hence IF NOT EXISTS.
+INDEXES = (
+    ("ix_mristudy_patient_id_created_at", "mristudy", ["patient_id", "created_at", "id"]),
+    ("ix_lifestyleassessment_patient_id_created_at", "lifestyleassessment", ["patient_id", "created_at", "id"]),
+    ("ix_assessment_patient_id_created_at", "assessment", ["patient_id", "created_at", "id"]),
+    ("ix_assessment_clinician_id", "assessment", ["clinician_id"]),
+    ("ix_assessment_mri_study_id", "assessment", ["mri_study_id"]),
+    ("ix_assessment_lifestyle_assessment_id", "assessment", ["lifestyle_assessment_id"]),
+    ("ix_mriuploadsession_patient_id", "mriuploadsession", ["patient_id"]),
+    ("ix_mriuploadsession_expires_at", "mriuploadsession", ["expires_at"]),
+    ("ix_mristudy_file_sha256", "mristudy", ["file_sha256"]),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build; it cannot run
+    # inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
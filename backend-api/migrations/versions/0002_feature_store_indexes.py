@@ -0,0 +1,47 @@
+"""Index MRI feature vectors for cohort queries
+
+Revision ID: 0002_feature_store_indexes
+Revises: 0001_patient_history_indexes
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_feature_store_indexes"
+down_revision = "0001_patient_history_indexes"
+branch_labels = None
+depends_on = None
+
+# Keep in step with INDEXED_FEATURES in app.models: cohort queries only use an expression
+# index when their expression matches it exactly
+INDEXED_FEATURES = ("mmse", "cdr", "nwbv", "etiv", "mild_impairment_probability", "moderate_impairment_probability")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_mristudy_risk_score_mri", "mristudy", ["risk_score_mri"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        if op.get_context().dialect.name != "postgresql":
+            return
+        op.create_index("ix_mristudy_feature_vector", "mristudy", ["feature_vector"],
+                        if_not_exists=True, postgresql_concurrently=True,
+                        postgresql_using="gin", postgresql_ops={"feature_vector": "jsonb_path_ops"})
+        for feature in INDEXED_FEATURES:
+            op.create_index(f"ix_mristudy_feature_{feature}", "mristudy",
+                            [sa.text(f"(CAST(feature_vector ->> '{feature}' AS FLOAT))")],
+                            if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        if op.get_context().dialect.name == "postgresql":
+            for feature in reversed(INDEXED_FEATURES):
+                op.drop_index(f"ix_mristudy_feature_{feature}", table_name="mristudy",
+                              if_exists=True, postgresql_concurrently=True)
+            op.drop_index("ix_mristudy_feature_vector", table_name="mristudy",
+                          if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_mristudy_risk_score_mri", table_name="mristudy",
+                      if_exists=True, postgresql_concurrently=True)
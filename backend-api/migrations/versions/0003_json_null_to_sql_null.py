@@ -0,0 +1,36 @@
+"""Store missing JSON documents as SQL NULL
+
+Revision ID: 0003_json_null_to_sql_null
+Revises: 0002_feature_store_indexes
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_json_null_to_sql_null"
+down_revision = "0002_feature_store_indexes"
+branch_labels = None
+depends_on = None
+
+# JSON columns that used to store Python None as the JSON document 'null'. The models now
+# declare none_as_null, and `feature_vector IS NOT NULL` (cohort queries, analytics) must
+# not match rows that were written before that.
+JSON_COLUMNS = (
+    ("mristudy", "feature_vector"),
+    ("mristudy", "risk_explanation"),
+    ("lifestyleassessment", "risk_factors"),
+    ("mriuploadsession", "received_ranges"),
+)
+
+
+def upgrade() -> None:
+    json_type = "jsonb_typeof" if op.get_context().dialect.name == "postgresql" else "json_type"
+    for table, column in JSON_COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = NULL WHERE {json_type}({column}) = 'null'")
+
+
+def downgrade() -> None:
+    # SQL NULL reads back as None either way
+    pass
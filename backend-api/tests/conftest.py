@@ -3,7 +3,11 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
-from app.core.database import get_session
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app.core.database import get_session, AsyncSessionLocal, SessionLocal
+from app.core.jobs import get_job_queue
+from app.models import Patient
 from main import app
 @pytest.fixture(name="session")
 def session_fixture():
@@ -12,16 +16,28 @@ def session_fixture():
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+    SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    SessionLocal.configure(bind=engine)
     with Session(engine) as session:
         yield session
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(session: Session):
+    # The app talks to the same SQLite file through aiosqlite; NullPool because every
+    # TestClient request runs on a fresh event loop
+    engine = create_async_engine("sqlite+aiosqlite:///test.db", poolclass=NullPool)
+    AsyncSessionLocal.configure(bind=engine)
+    yield engine
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
-    def get_session_override():
-        return session
+def client_fixture(async_engine):
+    async def get_session_override():
+        async with AsyncSessionLocal() as async_session:
+            yield async_session
     app.dependency_overrides[get_session] = get_session_override
     client = TestClient(app)
     yield client
+    # Jobs share the test connection; let them finish before the next test resets the schema
+    get_job_queue().wait_idle(timeout=10)
     app.dependency_overrides.clear()
 @pytest.fixture(name="clinician_token")
 def clinician_token_fixture(client: TestClient):
@@ -37,3 +53,10 @@ def clinician_token_fixture(client: TestClient):
 @pytest.fixture(name="auth_headers")
 def auth_headers_fixture(clinician_token: str):
     return {"Authorization": f"Bearer {clinician_token}"}
+@pytest.fixture(name="patient")
+def patient_fixture(session: Session):
+    patient = Patient(id=1001, first_name="Jane", last_name="Doe", medical_record_number="MRN-1001")
+    session.add(patient)
+    session.commit()
+    session.refresh(patient)
+    return patient
@@ -0,0 +1,58 @@
+from fastapi.testclient import TestClient
+from sqlmodel import select
+from app.models import AnalyticsAggregate, LifestyleAssessment, MRIStudy
+from app.services.analytics import rebuild_analytics
+from app.services.combined_risk import refresh_combined_risk
+from app.services.oasis_import import import_oasis_csv
+from tests.test_import import LONGITUDINAL
+def aggregate_counts(session, metric: str):
+    session.expire_all()
+    rows = session.exec(select(AnalyticsAggregate).where(AnalyticsAggregate.metric == metric)).all()
+    return {(row.bucket, row.series): row.count for row in rows if row.count}
+def test_imported_cohort_aggregates(client: TestClient, auth_headers: dict, session, tmp_path):
+    path = tmp_path / "oasis_longitudinal.csv"
+    path.write_text(LONGITUDINAL)
+    import_oasis_csv(str(path), bind=session.get_bind(), on_progress=lambda progress: None)
+    nwbv = client.get("/analytics/nwbv_distribution", headers=auth_headers).json()
+    assert nwbv["total"] == 3
+    assert [(item["bucket"], item["count"]) for item in nwbv["bins"]] == [("0.68-0.7", 2), ("0.72-0.74", 1)]
+    crosstab = client.get("/analytics/age_band_by_cdr", headers=auth_headers).json()
+    assert crosstab["rows"] == ["70-80", "80-90"]
+    assert crosstab["columns"] == ["0", "0.5"]
+    assert crosstab["counts"] == [[0, 1], [2, 0]]
+    ages = client.get("/analytics/age_distribution", headers=auth_headers).json()
+    assert [(item["lower"], item["count"]) for item in ages["bins"]] == [(75.0, 1), (85.0, 2)]
+def test_risk_level_counts_follow_assessments(client: TestClient, auth_headers: dict, session, patient):
+    mri_study = MRIStudy(patient_id=patient.id, study_name="Baseline", file_path="baseline.dcm", risk_score_mri=0.5)
+    lifestyle_assessment = LifestyleAssessment(patient_id=patient.id, age=50, risk_score_lifestyle=0.4)
+    session.add(mri_study)
+    session.add(lifestyle_assessment)
+    session.commit()
+    payload = {
+        "patient_id": patient.id,
+        "mri_study_id": mri_study.id,
+        "lifestyle_assessment_id": lifestyle_assessment.id,
+        "assessment_name": "Follow-up"
+    }
+    assert client.post("/lifestyle/combined-risk", json=payload, headers=auth_headers).status_code == 200
+    response = client.get("/analytics/risk_level_counts", headers=auth_headers)
+    assert [(item["bucket"], item["count"]) for item in response.json()["bins"]] == [("moderate", 1)]
+    etag = response.headers["ETag"]
+    cached = client.get("/analytics/risk_level_counts", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    mri_study.risk_score_mri = 0.95
+    session.add(mri_study)
+    session.flush()
+    refresh_combined_risk(session, mri_study_ids=[mri_study.id])
+    session.commit()
+    response = client.get("/analytics/risk_level_counts", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [(item["bucket"], item["count"]) for item in response.json()["bins"]] == [("high", 1)]
+    incremental = aggregate_counts(session, "risk_level_counts")
+    rebuild_analytics(session)
+    session.commit()
+    assert aggregate_counts(session, "risk_level_counts") == incremental
+def test_unknown_analytics_metric(client: TestClient, auth_headers: dict):
+    assert client.get("/analytics/unknown", headers=auth_headers).status_code == 404
+    assert "risk_level_counts" in client.get("/analytics", headers=auth_headers).json()["metrics"]
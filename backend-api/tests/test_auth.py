@@ -9,6 +9,10 @@ def test_health_endpoint(client: TestClient):
     assert "timestamp" in data
     assert "database" in data
     assert "version" in data
+def test_health_endpoint_reaches_async_database(client: TestClient):
+    data = client.get("/health").json()
+    assert data["database"] == "connected"
+    assert data["status"] == "healthy"
 def test_login_valid_credentials(client: TestClient):
     response = client.post(
         "/auth/login",
@@ -53,3 +57,46 @@ def test_invalid_token(client: TestClient):
     headers = {"Authorization": "Bearer invalid_token"}
     response = client.get("/auth/me", headers=headers)
     assert response.status_code in [401, 403]
+def test_repeated_requests_reuse_verified_token(client: TestClient, auth_headers: dict, monkeypatch):
+    from app.core import security
+    security.token_cache.clear()
+    decode = security.jwt.decode
+    calls = []
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+    monkeypatch.setattr(security.jwt, "decode", counting_decode)
+    for _ in range(5):
+        assert client.get("/auth/me", headers=auth_headers).status_code == 200
+    assert len(calls) == 1
+def test_token_cache_honors_expiry_and_size():
+    import time
+    from app.core.security import TokenCache
+    cache = TokenCache(maxsize=2)
+    cache.put("expired", {"sub": "1", "exp": time.time() - 1})
+    assert cache.get("expired") is None
+    cache.put("no-exp", {"sub": "1"})
+    assert cache.get("no-exp") is None
+    for token in ("a", "b", "c"):
+        cache.put(token, {"sub": token, "exp": time.time() + 60})
+    assert cache.get("a") is None
+    assert cache.get("c")["sub"] == "c"
+def test_password_hasher_refuses_work_beyond_capacity():
+    import asyncio
+    import threading
+    from fastapi import HTTPException
+    from app.core.security import PasswordHasher
+    hasher = PasswordHasher(workers=1, max_pending=0)
+    release = threading.Event()
+    async def scenario():
+        first = asyncio.create_task(hasher.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as error:
+            await hasher.run(release.wait, 5)
+        release.set()
+        assert await first is True
+        return error.value
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert hasher.in_flight == 0
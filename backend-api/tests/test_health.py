@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.services import health_probe
+from app.services.health_probe import HealthProber
+@pytest.fixture(name="probe_calls")
+def probe_calls_fixture(monkeypatch):
+    calls = {"database": 0, "mri_model_service": 0, "redis": 0}
+    outcomes = {"database": True, "mri_model_service": True, "redis": True}
+    def make_probe(name):
+        async def probe():
+            calls[name] += 1
+            if not outcomes[name]:
+                raise ConnectionError(f"{name} unreachable")
+            return {"warm": True} if name == "mri_model_service" else {}
+        return probe
+    prober = HealthProber({name: make_probe(name) for name in calls}, required=["database"], interval=60, timeout=1)
+    monkeypatch.setattr(health_probe, "_prober", prober)
+    return calls, outcomes
+def test_livez(client: TestClient, probe_calls):
+    response = client.get("/livez")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+    assert probe_calls[0]["database"] == 0
+def test_readyz_reports_dependencies(client: TestClient, probe_calls):
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "ready"
+    assert set(result["dependencies"]) == {"database", "mri_model_service", "redis"}
+    assert result["dependencies"]["mri_model_service"]["detail"]["warm"] is True
+    assert result["dependencies"]["database"]["required"] is True
+    assert result["dependencies"]["redis"]["latency_ms"] >= 0
+def test_readyz_serves_cached_results(client: TestClient, probe_calls):
+    calls, _ = probe_calls
+    for _ in range(5):
+        client.get("/readyz")
+        client.get("/health")
+    assert calls["database"] == 1
+def test_readyz_fails_when_required_dependency_is_down(client: TestClient, probe_calls):
+    _, outcomes = probe_calls
+    outcomes["database"] = False
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert "unreachable" in response.json()["dependencies"]["database"]["error"]
+    assert client.get("/health").json()["database"] == "disconnected"
+def test_readyz_ignores_optional_dependency_failures(client: TestClient, probe_calls):
+    _, outcomes = probe_calls
+    outcomes["redis"] = False
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["dependencies"]["redis"]["healthy"] is False
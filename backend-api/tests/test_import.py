@@ -0,0 +1,47 @@
+import os
+import pytest
+from sqlmodel import Session, func, select
+from app.models import LifestyleAssessment, MRIStudy, Patient
+from app.services.oasis_import import import_oasis_csv
+OASIS_DATA = os.path.join(os.path.dirname(__file__), "..", "..", "ModelTraining", "BIOFM", "data")
+LONGITUDINAL = """Subject ID,MRI ID,Group,Visit,MR Delay,M/F,Hand,Age,EDUC,SES,MMSE,CDR,eTIV,nWBV,ASF
+OAS2_0001,OAS2_0001_MR1,Nondemented,1,0,M,R,87,14,2,27,0,1987,0.696,0.883
+OAS2_0001,OAS2_0001_MR2,Nondemented,2,457,M,R,88,14,2,30,0,2004,0.681,0.876
+OAS2_0002,OAS2_0002_MR1,Demented,1,0,M,R,75,12,,23,0.5,1678,0.736,1.046
+"""
+def count(session: Session, model) -> int:
+    return session.exec(select(func.count()).select_from(model)).one()
+def test_import_longitudinal_csv(session: Session, tmp_path):
+    path = tmp_path / "oasis_longitudinal.csv"
+    path.write_text(LONGITUDINAL)
+    reports = []
+    progress = import_oasis_csv(str(path), bind=session.get_bind(), batch_size=2, on_progress=reports.append)
+    assert progress.rows == 3
+    assert [report.rows for report in reports] == [3, 3] and progress.batches == 2
+    assert (count(session, Patient), count(session, MRIStudy), count(session, LifestyleAssessment)) == (2, 3, 3)
+    study = session.exec(select(MRIStudy).where(MRIStudy.source_id == "OAS2_0002_MR1")).one()
+    assert study.patient.medical_record_number == "OAS2_0002"
+    assert study.processing_status == "imported"
+    assert study.feature_vector == {
+        "group": "Demented", "age": 75, "visit": 1, "mr_delay_days": 0, "hand": "R",
+        "mmse": 23.0, "cdr": 0.5, "etiv": 1678.0, "nwbv": 0.736, "asf": 1.046
+    }
+    visit = session.exec(select(LifestyleAssessment).where(LifestyleAssessment.source_id == "OAS2_0001_MR2")).one()
+    assert (visit.age, visit.education_years) == (88, 14)
+def test_reimport_updates_in_place(session: Session, tmp_path):
+    path = tmp_path / "oasis_longitudinal.csv"
+    path.write_text(LONGITUDINAL)
+    import_oasis_csv(str(path), bind=session.get_bind(), on_progress=lambda progress: None)
+    path.write_text(LONGITUDINAL.replace(",87,14,", ",87,16,"))
+    import_oasis_csv(str(path), bind=session.get_bind(), on_progress=lambda progress: None)
+    assert (count(session, Patient), count(session, MRIStudy), count(session, LifestyleAssessment)) == (2, 3, 3)
+    visit = session.exec(select(LifestyleAssessment).where(LifestyleAssessment.source_id == "OAS2_0001_MR1")).one()
+    assert visit.education_years == 16
+@pytest.mark.skipif(not os.path.isdir(OASIS_DATA), reason="OASIS data not checked out")
+def test_import_oasis_datasets(session: Session):
+    for name in ("oasis_longitudinal.csv", "oasis_cross-sectional.csv"):
+        import_oasis_csv(os.path.join(OASIS_DATA, name), bind=session.get_bind(), on_progress=lambda progress: None)
+    assert count(session, Patient) == 150 + 416
+    assert count(session, MRIStudy) == 373 + 436
+    cross_sectional = session.exec(select(LifestyleAssessment).where(LifestyleAssessment.source_id == "OAS1_0002_MR1")).one()
+    assert (cross_sectional.age, cross_sectional.education_years) == (55, 16)
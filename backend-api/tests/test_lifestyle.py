@@ -1,6 +1,9 @@
 
 import pytest
 from fastapi.testclient import TestClient
+from app.core.jobs import get_job_queue
+from app.models import LifestyleAssessment, MRIStudy
+from sqlmodel import select
 def test_lifestyle_assessment_creation(client: TestClient, auth_headers: dict):
     payload = {
         "patient_id": 1001,
@@ -65,24 +68,58 @@ def test_lifestyle_low_risk_factors(client: TestClient, auth_headers: dict):
     result = response.json()
     assert result["risk_level"] == "low"
     assert len(result["protective_factors"]) > 2
-def test_combined_risk_calculation(client: TestClient, auth_headers: dict):
+@pytest.fixture(name="risk_inputs")
+def risk_inputs_fixture(session, patient):
+    mri_study = MRIStudy(
+        patient_id=patient.id, study_name="Baseline", file_path="baseline.dcm",
+        processing_status="completed", risk_score_mri=0.5
+    )
+    lifestyle_assessment = LifestyleAssessment(
+        patient_id=patient.id, age=50, smoking_status="current", risk_score_lifestyle=0.4
+    )
+    session.add(mri_study)
+    session.add(lifestyle_assessment)
+    session.commit()
+    return mri_study, lifestyle_assessment
+def create_combined_risk(client: TestClient, auth_headers: dict, risk_inputs):
+    mri_study, lifestyle_assessment = risk_inputs
     payload = {
         "patient_id": 1001,
-        "mri_study_id": 12345,
-        "lifestyle_assessment_id": 67890,
+        "mri_study_id": mri_study.id,
+        "lifestyle_assessment_id": lifestyle_assessment.id,
         "assessment_name": "Comprehensive Risk Assessment",
         "notes": "Regular follow-up patient"
     }
-    response = client.post("/lifestyle/combined-risk", json=payload, headers=auth_headers)
+    return client.post("/lifestyle/combined-risk", json=payload, headers=auth_headers)
+def test_combined_risk_calculation(client: TestClient, auth_headers: dict, risk_inputs):
+    response = create_combined_risk(client, auth_headers, risk_inputs)
     assert response.status_code == 200
     result = response.json()
     assert "assessment_id" in result
-    assert "combined_risk_score" in result
-    assert "risk_level" in result
-    assert "mri_contribution" in result
-    assert "lifestyle_contribution" in result
-    assert "explanation" in result
+    assert result["combined_risk_score"] == 0.46
+    assert result["risk_level"] == "moderate"
+    assert result["mri_contribution"] == 0.3
+    assert result["lifestyle_contribution"] == 0.16
+    assert result["explanation"]["mri_risk"] == 0.5
     assert 0 <= result["combined_risk_score"] <= 1
+    stored = client.get(f"/lifestyle/combined-risk/{result['assessment_id']}", headers=auth_headers).json()
+    assert stored["combined_risk_score"] == 0.46
+def test_combined_risk_unknown_inputs(client: TestClient, auth_headers: dict):
+    payload = {
+        "patient_id": 1001,
+        "mri_study_id": 12345,
+        "lifestyle_assessment_id": 67890,
+        "assessment_name": "Comprehensive Risk Assessment"
+    }
+    response = client.post("/lifestyle/combined-risk", json=payload, headers=auth_headers)
+    assert response.status_code == 404
+def test_combined_risk_follows_lifestyle_rescore(client: TestClient, auth_headers: dict, risk_inputs):
+    assessment_id = create_combined_risk(client, auth_headers, risk_inputs).json()["assessment_id"]
+    client.post("/lifestyle/rescore", headers=auth_headers)
+    assert get_job_queue().wait_idle(timeout=10)
+    result = client.get(f"/lifestyle/combined-risk/{assessment_id}", headers=auth_headers).json()
+    assert result["explanation"]["lifestyle_risk"] == 0.5
+    assert result["combined_risk_score"] == 0.5
 def test_get_lifestyle_assessment(client: TestClient, auth_headers: dict):
     assessment_id = 67890
     response = client.get(f"/lifestyle/assessment/{assessment_id}", headers=auth_headers)
@@ -100,6 +137,43 @@ def test_lifestyle_assessment_missing_fields(client: TestClient, auth_headers: d
     assert response.status_code == 200
     result = response.json()
     assert "risk_score_lifestyle" in result
+def test_lifestyle_assessment_is_deterministic(client: TestClient, auth_headers: dict):
+    payload = {"patient_id": 1005, "age": 70, "smoking_status": "current", "diabetes": True}
+    first = client.post("/lifestyle/assess", json=payload, headers=auth_headers).json()
+    second = client.post("/lifestyle/assess", json={**payload, "patient_id": 2005}, headers=auth_headers).json()
+    assert first["confidence_score"] == second["confidence_score"]
+    assert first["risk_factors"] == second["risk_factors"]
+    assert first["risk_factors"]["factor_weights"]["Current smoking"] == 0.2
+def test_lifestyle_batch_assessment(client: TestClient, auth_headers: dict):
+    assessments = [
+        {"patient_id": 1, "age": 80, "smoking_status": "current", "exercise_frequency": "none", "family_history_alzheimer": True},
+        {"patient_id": 2, "age": 45, "smoking_status": "never", "exercise_frequency": "heavy", "diet_quality": "excellent"},
+        {"patient_id": 3, "age": 65}
+    ]
+    response = client.post("/lifestyle/assess/batch", json={"assessments": assessments}, headers=auth_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["count"] == 3
+    assert sum(result["risk_level_counts"].values()) == 3
+    for assessment, item in zip(assessments, result["results"]):
+        single = client.post("/lifestyle/assess", json=assessment, headers=auth_headers).json()
+        assert item["patient_id"] == assessment["patient_id"]
+        assert item["risk_score_lifestyle"] == single["risk_score_lifestyle"]
+        assert item["risk_level"] == single["risk_level"]
+        assert item["recommendations"] == single["recommendations"]
+    assert result["results"][0]["risk_level"] == "high"
+    assert result["results"][1]["risk_level"] == "low"
+def test_lifestyle_rescore_job(client: TestClient, auth_headers: dict, session, patient):
+    for age in (50, 70, 85):
+        session.add(LifestyleAssessment(patient_id=patient.id, age=age, smoking_status="current"))
+    session.commit()
+    response = client.post("/lifestyle/rescore", headers=auth_headers)
+    assert response.status_code == 202
+    assert get_job_queue().wait_idle(timeout=10)
+    session.expire_all()
+    rows = session.exec(select(LifestyleAssessment).order_by(LifestyleAssessment.age)).all()
+    assert [row.risk_score_lifestyle for row in rows] == [0.5, 0.7, 0.7]
+    assert rows[2].risk_factors["all_factors"] == ["Advanced age", "Current smoking"]
 def test_unauthorized_lifestyle_access(client: TestClient):
     payload = {"patient_id": 1001, "age": 65}
     response = client.post("/lifestyle/assess", json=payload)
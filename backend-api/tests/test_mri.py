@@ -1,11 +1,44 @@
-
 import pytest
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
+import hashlib
 import io
-def test_mri_upload_success(client: TestClient, auth_headers: dict):
-    file_content = b"mock_dicom_file_content"
+import json
+import os
+from app.core.config import settings
+from app.core.jobs import get_job_queue
+from app.models import Assessment, LifestyleAssessment, MRIStudy, Patient
+from app.services import mri_processing
+from app.services.blob_store import collect_garbage, incoming_dir, store_blob
+MODEL_SERVICE_RESULT = {
+    "decision_analysis": {
+        "primary_finding": "Mild Impairment",
+        "secondary_finding": "Very Mild Impairment",
+        "decision_confidence": "Moderate",
+        "decision_rationale": "Mild Impairment leads Very Mild Impairment by 30.0%",
+        "clinical_significance": "Early-stage cognitive decline indicators",
+        "full_comparison": [
+            {"label": "Mild Impairment", "probability": 0.6, "percentage": "60.00%", "rank": 1},
+            {"label": "Very Mild Impairment", "probability": 0.3, "percentage": "30.00%", "rank": 2},
+            {"label": "No Impairment", "probability": 0.1, "percentage": "10.00%", "rank": 3},
+            {"label": "Moderate Impairment", "probability": 0.0, "percentage": "0.00%", "rank": 4}
+        ],
+        "recommendations": ["Follow-up scan in 6 months"]
+    },
+    "status": "success"
+}
+@pytest.fixture(name="model_service")
+def model_service_fixture(monkeypatch, tmp_path):
+    calls = []
+    def fake_call_model_service(file_path):
+        calls.append(file_path)
+        return MODEL_SERVICE_RESULT
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(mri_processing, "call_model_service", fake_call_model_service)
+    return calls
+def upload_study(client: TestClient, auth_headers: dict, filename: str = "test.dcm", content: bytes = b"mock_dicom_file_content"):
     files = {
-        "file": ("test.dcm", io.BytesIO(file_content), "application/octet-stream")
+        "file": (filename, io.BytesIO(content), "application/octet-stream")
     }
     data = {
         "patient_id": 1001,
@@ -13,12 +46,49 @@ def test_mri_upload_success(client: TestClient, auth_headers: dict):
         "scanner_type": "Siemens Prisma 3T",
         "study_description": "T1-weighted structural MRI"
     }
-    response = client.post("/mri/upload", files=files, data=data, headers=auth_headers)
+    return client.post("/mri/upload", files=files, data=data, headers=auth_headers)
+def stored_files():
+    return [name for _, _, filenames in os.walk(settings.UPLOAD_DIR) for name in filenames]
+def wait_for_jobs():
+    assert get_job_queue().wait_idle(timeout=10)
+def test_mri_upload_success(client: TestClient, auth_headers: dict, patient, model_service):
+    response = upload_study(client, auth_headers)
     assert response.status_code == 200
     result = response.json()
     assert "study_id" in result
-    assert result["processing_status"] == "uploaded"
+    assert result["processing_status"] == "queued"
+    assert result["job_id"]
     assert "file_info" in result
+def test_mri_upload_streams_and_hashes(client: TestClient, auth_headers: dict, patient, model_service, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1000)
+    content = os.urandom(64 * 1024 + 17)
+    response = upload_study(client, auth_headers, content=content)
+    assert response.status_code == 200
+    file_info = response.json()["file_info"]
+    assert file_info["file_size"] == len(content)
+    assert file_info["sha256"] == hashlib.sha256(content).hexdigest()
+    with open(os.path.join(settings.UPLOAD_DIR, file_info["stored_filename"]), "rb") as stored_file:
+        assert stored_file.read() == content
+    assert not [name for name in stored_files() if name.endswith(".part")]
+def test_mri_upload_too_large(client: TestClient, auth_headers: dict, patient, model_service, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 256)
+    response = upload_study(client, auth_headers, content=b"x" * 4096)
+    assert response.status_code == 413
+    assert stored_files() == []
+def test_mri_upload_missing_fields(client: TestClient, auth_headers: dict, patient, model_service):
+    files = {
+        "file": ("test.dcm", io.BytesIO(b"mock_dicom_file_content"), "application/octet-stream")
+    }
+    response = client.post("/mri/upload", files=files, data={"patient_id": 1001}, headers=auth_headers)
+    assert response.status_code == 422
+    assert stored_files() == []
+def test_mri_upload_nifti_gz_extension(client: TestClient, auth_headers: dict, patient, model_service):
+    response = upload_study(client, auth_headers, filename="brain.nii.gz")
+    assert response.status_code == 200
+    assert response.json()["file_info"]["file_type"] == ".nii.gz"
+    wait_for_jobs()
+    assert mri_processing.model_service_endpoint(model_service[0]) == "/amri/volume"
 def test_mri_upload_invalid_file_type(client: TestClient, auth_headers: dict):
     file_content = b"invalid_file_content"
     files = {
@@ -31,35 +101,274 @@ def test_mri_upload_invalid_file_type(client: TestClient, auth_headers: dict):
     response = client.post("/mri/upload", files=files, data=data, headers=auth_headers)
     assert response.status_code == 400
     assert "File type" in response.json()["detail"]
-def test_mri_process_study(client: TestClient, auth_headers: dict):
+def test_mri_upload_unknown_patient(client: TestClient, auth_headers: dict, model_service):
+    response = upload_study(client, auth_headers)
+    assert response.status_code == 404
+    assert stored_files() == []
+def test_mri_job_writes_results(client: TestClient, auth_headers: dict, patient, model_service):
+    study_id = upload_study(client, auth_headers).json()["study_id"]
+    wait_for_jobs()
+    response = client.get(f"/mri/study/{study_id}/status", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["processing_status"] == "completed"
+    response = client.get(f"/mri/study/{study_id}/features", headers=auth_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["feature_vector"]["mild_impairment_probability"] == 0.6
+    assert result["risk_score_mri"] == pytest.approx(0.6 * 2 / 3 + 0.3 / 3, abs=1e-4)
+    assert result["risk_explanation"]["primary_finding"] == "Mild Impairment"
+def test_mri_job_failure_is_recorded(client: TestClient, auth_headers: dict, patient, model_service, monkeypatch):
+    def unavailable(file_path):
+        raise ConnectionError("model service unavailable")
+    monkeypatch.setattr(mri_processing, "call_model_service", unavailable)
+    study_id = upload_study(client, auth_headers).json()["study_id"]
+    wait_for_jobs()
+    result = client.get(f"/mri/study/{study_id}/status", headers=auth_headers).json()
+    assert result["processing_status"] == "failed"
+    assert "unavailable" in result["error"]
+    response = client.get(f"/mri/study/{study_id}/features", headers=auth_headers)
+    assert response.status_code == 409
+def test_mri_process_study(client: TestClient, auth_headers: dict, patient, model_service):
+    study_id = upload_study(client, auth_headers).json()["study_id"]
+    wait_for_jobs()
     payload = {
-        "study_id": 12345,
+        "study_id": study_id,
         "processing_options": {"preprocessing": True}
     }
     response = client.post("/mri/process", json=payload, headers=auth_headers)
-    assert response.status_code == 200
-    result = response.json()
-    assert result["study_id"] == 12345
-    assert "feature_vector" in result
-    assert "risk_score_mri" in result
-    assert "risk_explanation" in result
+    assert response.status_code == 202
+    assert response.json()["study_id"] == study_id
+    wait_for_jobs()
+    assert len(model_service) == 2
+    result = client.get(f"/mri/study/{study_id}/features", headers=auth_headers).json()
     assert 0 <= result["risk_score_mri"] <= 1
-def test_get_mri_features(client: TestClient, auth_headers: dict):
-    study_id = 12345
-    response = client.get(f"/mri/study/{study_id}/features", headers=auth_headers)
+def test_mri_processing_refreshes_combined_risk(client: TestClient, auth_headers: dict, session, patient, model_service):
+    study_id = upload_study(client, auth_headers).json()["study_id"]
+    wait_for_jobs()
+    lifestyle_assessment = LifestyleAssessment(patient_id=1001, age=50, risk_score_lifestyle=0.4)
+    session.add(lifestyle_assessment)
+    session.commit()
+    assessment = Assessment(
+        assessment_name="Follow-up", patient_id=1001, clinician_id=1,
+        mri_study_id=study_id, lifestyle_assessment_id=lifestyle_assessment.id
+    )
+    session.add(assessment)
+    session.commit()
+    client.post("/mri/process", json={"study_id": study_id}, headers=auth_headers)
+    wait_for_jobs()
+    session.refresh(assessment)
+    mri_risk = client.get(f"/mri/study/{study_id}/features", headers=auth_headers).json()["risk_score_mri"]
+    assert assessment.mri_risk_score == mri_risk
+    assert assessment.combined_risk_score == round(0.6 * mri_risk + 0.4 * 0.4, 2)
+def test_mri_process_unknown_study(client: TestClient, auth_headers: dict):
+    response = client.post("/mri/process", json={"study_id": 12345}, headers=auth_headers)
+    assert response.status_code == 404
+def add_in_flight_study(session, status: str, age: timedelta) -> MRIStudy:
+    study = MRIStudy(
+        patient_id=1001, study_name="Interrupted", file_path="interrupted.dcm",
+        processing_status=status, updated_at=datetime.utcnow() - age
+    )
+    session.add(study)
+    session.commit()
+    session.refresh(study)
+    return study
+def test_mri_process_requeues_stale_study(client: TestClient, auth_headers: dict, session, patient, model_service):
+    recent = add_in_flight_study(session, "processing", timedelta(seconds=5))
+    stale = add_in_flight_study(session, "processing", timedelta(seconds=settings.MRI_PROCESSING_STALE_SECONDS + 60))
+    assert client.post("/mri/process", json={"study_id": recent.id}, headers=auth_headers).json()["processing_status"] == "processing"
+    assert client.post("/mri/process", json={"study_id": stale.id}, headers=auth_headers).json()["processing_status"] == "queued"
+    wait_for_jobs()
+    assert len(model_service) == 1
+    assert client.get(f"/mri/study/{stale.id}/status", headers=auth_headers).json()["processing_status"] == "completed"
+def test_requeue_interrupted_studies(client: TestClient, auth_headers: dict, session, patient, model_service):
+    queued = add_in_flight_study(session, "queued", timedelta(seconds=5))
+    add_in_flight_study(session, "completed", timedelta(days=1))
+    assert mri_processing.requeue_interrupted_studies(stale_only=True) == 0
+    # What startup does with the in-process queue: nothing queued before the restart survived it
+    assert mri_processing.requeue_interrupted_studies(stale_only=False) == 1
+    wait_for_jobs()
+    assert len(model_service) == 1
+    assert client.get(f"/mri/study/{queued.id}/status", headers=auth_headers).json()["processing_status"] == "completed"
+def test_mri_status_events(client: TestClient, auth_headers: dict, patient, model_service):
+    study_id = upload_study(client, auth_headers).json()["study_id"]
+    wait_for_jobs()
+    response = client.get(f"/mri/study/{study_id}/events", headers=auth_headers)
     assert response.status_code == 200
-    result = response.json()
-    assert result["study_id"] == study_id
-    assert "feature_vector" in result
-    assert "risk_score_mri" in result
-def test_get_mri_study(client: TestClient, auth_headers: dict):
-    study_id = 12345
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: status" in response.text
+    assert '"processing_status":"completed"' in response.text
+def test_get_mri_study(client: TestClient, auth_headers: dict, patient, model_service):
+    study_id = upload_study(client, auth_headers).json()["study_id"]
+    wait_for_jobs()
     response = client.get(f"/mri/study/{study_id}", headers=auth_headers)
     assert response.status_code == 200
     result = response.json()
     assert result["id"] == study_id
-    assert "patient_id" in result
+    assert result["patient_id"] == 1001
     assert "processing_status" in result
+def create_upload_session(client: TestClient, auth_headers: dict, content: bytes, **extra):
+    payload = {
+        "patient_id": 1001,
+        "study_name": "Resumable Study",
+        "filename": "brain.nii.gz",
+        "file_size": len(content),
+        **extra
+    }
+    return client.post("/mri/uploads", json=payload, headers=auth_headers)
+def send_chunk(client: TestClient, auth_headers: dict, upload_id: str, offset: int, data: bytes):
+    headers = {**auth_headers, "Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"}
+    return client.patch(f"/mri/uploads/{upload_id}", content=data, headers=headers)
+def test_resumable_upload_out_of_order(client: TestClient, auth_headers: dict, patient, model_service):
+    content = os.urandom(10_000)
+    response = create_upload_session(client, auth_headers, content, sha256=hashlib.sha256(content).hexdigest())
+    assert response.status_code == 201
+    upload_id = response.json()["upload_id"]
+    assert response.json()["missing_ranges"] == [[0, 10_000]]
+    response = send_chunk(client, auth_headers, upload_id, 4000, content[4000:8000])
+    assert response.status_code == 200
+    assert response.json()["offset"] == 0
+    assert response.json()["missing_ranges"] == [[0, 4000], [8000, 10_000]]
+    send_chunk(client, auth_headers, upload_id, 0, content[:4000])
+    response = client.get(f"/mri/uploads/{upload_id}", headers=auth_headers)
+    assert response.json()["offset"] == 8000
+    assert response.headers["Upload-Offset"] == "8000"
+    response = client.post(f"/mri/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 409
+    send_chunk(client, auth_headers, upload_id, 8000, content[8000:])
+    response = client.post(f"/mri/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["processing_status"] == "queued"
+    assert result["file_info"]["sha256"] == hashlib.sha256(content).hexdigest()
+    with open(os.path.join(settings.UPLOAD_DIR, result["file_info"]["stored_filename"]), "rb") as stored_file:
+        assert stored_file.read() == content
+    assert client.get(f"/mri/uploads/{upload_id}", headers=auth_headers).status_code == 404
+def test_resumable_upload_checksum_mismatch(client: TestClient, auth_headers: dict, patient, model_service):
+    content = os.urandom(1000)
+    upload_id = create_upload_session(client, auth_headers, content).json()["upload_id"]
+    send_chunk(client, auth_headers, upload_id, 0, content)
+    response = client.post(f"/mri/uploads/{upload_id}/complete", json={"sha256": "0" * 64}, headers=auth_headers)
+    assert response.status_code == 422
+    assert "Checksum mismatch" in response.json()["detail"]
+    response = client.post(
+        f"/mri/uploads/{upload_id}/complete", json={"sha256": hashlib.sha256(content).hexdigest()}, headers=auth_headers
+    )
+    assert response.status_code == 200
+def test_resumable_upload_rejects_overflowing_chunk(client: TestClient, auth_headers: dict, patient, model_service):
+    content = os.urandom(1000)
+    upload_id = create_upload_session(client, auth_headers, content).json()["upload_id"]
+    response = send_chunk(client, auth_headers, upload_id, 900, content[:200])
+    assert response.status_code == 413
+    response = client.delete(f"/mri/uploads/{upload_id}", headers=auth_headers)
+    assert response.status_code == 204
+    assert stored_files() == []
+def test_duplicate_upload_reuses_blob_and_results(client: TestClient, auth_headers: dict, patient, model_service):
+    first = upload_study(client, auth_headers).json()
+    wait_for_jobs()
+    second = upload_study(client, auth_headers).json()
+    assert second["file_info"]["deduplicated"] is True
+    assert second["file_info"]["stored_filename"] == first["file_info"]["stored_filename"]
+    assert second["processing_status"] == "completed"
+    assert second["job_id"] is None
+    assert len(model_service) == 1
+    assert len(stored_files()) == 1
+    features = client.get(f"/mri/study/{second['study_id']}/features", headers=auth_headers).json()
+    assert features["feature_vector"]["mild_impairment_probability"] == 0.6
+def test_resumable_upload_of_stored_file(client: TestClient, auth_headers: dict, patient, model_service):
+    content = b"mock_dicom_file_content"
+    upload_study(client, auth_headers, filename="brain.nii.gz", content=content)
+    wait_for_jobs()
+    response = create_upload_session(client, auth_headers, content, sha256=hashlib.sha256(content).hexdigest())
+    assert response.json()["missing_ranges"] == []
+    upload_id = response.json()["upload_id"]
+    assert send_chunk(client, auth_headers, upload_id, 0, content).status_code == 409
+    response = client.post(f"/mri/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["file_info"]["deduplicated"] is True
+    assert len(stored_files()) == 1
+def test_resumable_upload_dedup_is_limited_to_the_same_patient(client: TestClient, auth_headers: dict, session, patient, model_service):
+    content = b"mock_dicom_file_content"
+    upload_study(client, auth_headers, filename="brain.nii.gz", content=content)
+    wait_for_jobs()
+    session.add(Patient(id=1002, first_name="John", last_name="Roe", medical_record_number="MRN-1002"))
+    session.commit()
+    sha256 = hashlib.sha256(content).hexdigest()
+    response = create_upload_session(client, auth_headers, content, patient_id=1002, sha256=sha256)
+    assert response.json()["missing_ranges"] == [[0, len(content)]]
+    upload_id = response.json()["upload_id"]
+    assert client.post(f"/mri/uploads/{upload_id}/complete", headers=auth_headers).status_code == 409
+    send_chunk(client, auth_headers, upload_id, 0, content)
+    response = client.post(f"/mri/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["file_info"]["deduplicated"] is True
+    assert len([name for name in stored_files() if name.startswith(sha256)]) == 1
+def test_blob_garbage_collection(session, patient, model_service):
+    referenced, _ = store_blob(write_incoming(b"referenced"), hashlib.sha256(b"referenced").hexdigest(), ".dcm")
+    orphan, _ = store_blob(write_incoming(b"orphan"), hashlib.sha256(b"orphan").hexdigest(), ".dcm")
+    # Matched by hash: the stored path may predate a change in how UPLOAD_DIR is spelled
+    session.add(MRIStudy(
+        patient_id=1001, study_name="Kept", file_path=os.path.join("/old-mount", os.path.basename(referenced)),
+        file_sha256=hashlib.sha256(b"referenced").hexdigest()
+    ))
+    session.commit()
+    assert collect_garbage(session)["blobs_removed"] == 0
+    stats = collect_garbage(session, grace_seconds=0)
+    assert stats["blobs_removed"] == 1
+    assert os.path.exists(referenced)
+    assert not os.path.exists(orphan)
+def write_incoming(content: bytes) -> str:
+    os.makedirs(incoming_dir(), exist_ok=True)
+    path = os.path.join(incoming_dir(), hashlib.md5(content).hexdigest())
+    with open(path, "wb") as incoming_file:
+        incoming_file.write(content)
+    return path
+@pytest.fixture(name="cohort")
+def cohort_fixture(session, patient):
+    features = [
+        {"nwbv": 0.66, "cdr": 1.0, "group": "Demented", "mmse": 20},
+        {"nwbv": 0.69, "cdr": 0.5, "group": "Converted"},
+        {"nwbv": 0.75, "cdr": 0.0, "group": "Nondemented", "mmse": 30},
+        None
+    ]
+    for i, feature_vector in enumerate(features):
+        session.add(MRIStudy(
+            patient_id=patient.id, study_name=f"Visit {i}", file_path="visit.dcm",
+            feature_vector=feature_vector, risk_score_mri=0.2 * i,
+            risk_explanation={"primary_finding": "Mild Impairment" if i == 1 else "No Impairment"}
+        ))
+    session.commit()
+def query_cohort(client: TestClient, auth_headers: dict, **payload):
+    response = client.post("/mri/cohort", json=payload, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+def test_cohort_query_filters_features(client: TestClient, auth_headers: dict, cohort):
+    rows = query_cohort(client, auth_headers, where="nwbv < 0.7 AND cdr >= 0.5")
+    assert [row["features"]["group"] for row in rows] == ["Demented", "Converted"]
+    rows = query_cohort(client, auth_headers, where="group = 'Nondemented' OR explanation.primary_finding = 'Mild Impairment'")
+    assert [row["features"]["group"] for row in rows] == ["Converted", "Nondemented"]
+    rows = query_cohort(client, auth_headers, where="NOT (mmse IS NULL) AND risk_score_mri > 0.1", fields=["mmse"])
+    assert [row["features"] for row in rows] == [{"mmse": 30}]
+def test_cohort_query_pages_by_id(client: TestClient, auth_headers: dict, cohort):
+    first = query_cohort(client, auth_headers, where="cdr >= 0", limit=2)
+    rest = query_cohort(client, auth_headers, where="cdr >= 0", after_id=first[-1]["study_id"])
+    assert [row["features"]["cdr"] for row in first + rest] == [1.0, 0.5, 0.0]
+def test_cohort_query_skips_unprocessed_studies(client: TestClient, auth_headers: dict, session, patient):
+    # An uploaded study has no feature vector until its processing job completes
+    session.add(MRIStudy(patient_id=patient.id, study_name="Pending", file_path="pending.dcm", processing_status="queued"))
+    session.add(MRIStudy(
+        patient_id=patient.id, study_name="Processed", file_path="processed.dcm", processing_status="completed",
+        feature_vector={"mmse": 27, "cdr": 0.5}
+    ))
+    session.commit()
+    rows = query_cohort(client, auth_headers, where=f"patient_id = {patient.id}")
+    assert [row["features"] for row in rows] == [{"mmse": 27, "cdr": 0.5}]
+    rows = query_cohort(client, auth_headers, where=f"patient_id = {patient.id}", fields=["mmse"])
+    assert [row["features"] for row in rows] == [{"mmse": 27}]
+@pytest.mark.parametrize("where", ["nwbv <", "group < 'Demented'", "(cdr > 1", "nwbv > 1; DROP TABLE mristudy"])
+def test_cohort_query_rejects_invalid_expressions(client: TestClient, auth_headers: dict, where):
+    response = client.post("/mri/cohort", json={"where": where}, headers=auth_headers)
+    assert response.status_code == 400
 def test_unauthorized_mri_access(client: TestClient):
     response = client.get("/mri/study/12345")
     assert response.status_code in [401, 403]
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app.models import Assessment, LifestyleAssessment, MRIStudy, Patient
+@pytest.fixture(name="patient_history")
+def patient_history_fixture(session, patient):
+    start = datetime(2020, 1, 1)
+    for day in range(6):
+        # Days 0 and 3 have one event of each kind at the same instant
+        created_at = start + timedelta(days=day)
+        session.add(MRIStudy(patient_id=patient.id, study_name=f"Scan {day}", file_path="scan.dcm", created_at=created_at))
+        if day % 3 == 0:
+            session.add(LifestyleAssessment(patient_id=patient.id, age=70, created_at=created_at))
+            session.add(Assessment(
+                patient_id=patient.id, clinician_id=1, assessment_name=f"Review {day}",
+                combined_risk_score=0.5, risk_level="moderate", created_at=created_at
+            ))
+    other = Patient(id=2002, first_name="John", last_name="Roe", medical_record_number="MRN-2002")
+    session.add(other)
+    session.add(MRIStudy(patient_id=other.id, study_name="Other", file_path="other.dcm", created_at=start))
+    session.commit()
+    return patient
+def read_timeline(client: TestClient, auth_headers: dict, patient_id: int, limit: int):
+    events, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/patients/{patient_id}/timeline", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= limit
+        events.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return events
+def test_patient_timeline_is_newest_first(client: TestClient, auth_headers: dict, patient_history):
+    events = read_timeline(client, auth_headers, patient_history.id, limit=50)
+    assert len(events) == 10
+    assert [event["occurred_at"] for event in events] == sorted((event["occurred_at"] for event in events), reverse=True)
+    assert [event["type"] for event in events[-3:]] == ["assessment", "lifestyle_assessment", "mri_study"]
+    assert events[-3]["title"] == "Review 0" and events[-3]["risk_level"] == "moderate"
+    assert all(event["title"] != "Other" for event in events)
+def test_patient_timeline_keyset_pages(client: TestClient, auth_headers: dict, patient_history):
+    everything = read_timeline(client, auth_headers, patient_history.id, limit=50)
+    for limit in (1, 2, 3, 4):
+        paged = read_timeline(client, auth_headers, patient_history.id, limit=limit)
+        assert [(e["type"], e["id"]) for e in paged] == [(e["type"], e["id"]) for e in everything]
+def test_patient_timeline_errors(client: TestClient, auth_headers: dict, patient):
+    assert client.get("/patients/9999/timeline", headers=auth_headers).status_code == 404
+    response = client.get(f"/patients/{patient.id}/timeline", params={"cursor": "not-a-cursor"}, headers=auth_headers)
+    assert response.status_code == 400
+    assert client.get(f"/patients/{patient.id}/timeline").status_code in [401, 403]